@@ -2,8 +2,23 @@ import os
 import logging
 from flask import Flask, redirect, url_for, request, flash
 from flask_login import LoginManager, current_user
-from .models import db, Setting, User
+from .models import db
 from .controllers.main_controller import main_bp
+from .poller import poller
+from .cache import api_cache
+from .http_client import http_client
+from .async_client import async_client
+from .ratelimit import rate_limiter
+from .config_cache import config_cache
+from .app_state import app_state
+from .history import status_history
+from .events import runner_event_log
+from .analytics import runner_analytics
+from .exporter import metrics_exporter
+from .tracing import request_tracer
+from .profiler import profiler
+from .webhooks import webhook_ingestor
+from .runner_store import runner_stores
 
 login_manager = LoginManager()
 login_manager.login_view = 'main.login'
@@ -12,7 +27,7 @@ login_manager.login_message = 'Please log in to access this page.'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    return app_state.load_user(int(user_id))
 
 
 def create_app(test_config=None):
@@ -27,8 +42,66 @@ def create_app(test_config=None):
     if test_config is None:
         app.config.from_mapping(
             SECRET_KEY=os.getenv('SECRET_KEY', 'dev'),
-            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(app.instance_path, 'database.db')}",
+            SQLALCHEMY_DATABASE_URI=os.getenv('DATABASE_URL') or f"sqlite:///{os.path.join(app.instance_path, 'database.db')}",
             SQLALCHEMY_TRACK_MODIFICATIONS=False,
+            ADO_CONCURRENCY_PER_ORG=int(os.getenv('ADO_CONCURRENCY_PER_ORG', 8)),
+            ADO_FETCH_DEADLINE_SECONDS=float(os.getenv('ADO_FETCH_DEADLINE_SECONDS', 30)),
+            API_CACHE_SECONDS=int(os.getenv('API_CACHE_SECONDS', 30)),
+            API_CACHE_BACKEND=os.getenv('API_CACHE_BACKEND', 'sqlite'),
+            API_CACHE_MAX_ENTRIES=int(os.getenv('API_CACHE_MAX_ENTRIES', 1000)),
+            API_CACHE_STALE_SECONDS=int(os.getenv('API_CACHE_STALE_SECONDS', 0)),
+            GITHUB_CONCURRENCY_PER_ORG=int(os.getenv('GITHUB_CONCURRENCY_PER_ORG', 4)),
+            GITHUB_FETCH_DEADLINE_SECONDS=float(os.getenv('GITHUB_FETCH_DEADLINE_SECONDS', 30)),
+            GITHUB_ETAG_TTL_SECONDS=int(os.getenv('GITHUB_ETAG_TTL_SECONDS', 86400)),
+            GITHUB_RATE_LIMIT_BURST=int(os.getenv('GITHUB_RATE_LIMIT_BURST', 20)),
+            GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS=float(os.getenv('GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS', 5)),
+            GITHUB_RATE_LIMIT_HEALTH_RESERVE=float(os.getenv('GITHUB_RATE_LIMIT_HEALTH_RESERVE', 0.1)),
+            GITHUB_RATE_LIMIT_SETTINGS_RESERVE=float(os.getenv('GITHUB_RATE_LIMIT_SETTINGS_RESERVE', 0.2)),
+            HTTP_POOL_MAXSIZE=int(os.getenv('HTTP_POOL_MAXSIZE', 10)),
+            HTTP_RETRIES=int(os.getenv('HTTP_RETRIES', 2)),
+            HTTP_RETRY_BACKOFF=float(os.getenv('HTTP_RETRY_BACKOFF', 0.5)),
+            HTTP_CONNECT_TIMEOUT=float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),
+            HTTP_READ_TIMEOUT=float(os.getenv('HTTP_READ_TIMEOUT', 10)),
+            ASYNC_UPSTREAM_ENABLED=os.getenv('ASYNC_UPSTREAM_ENABLED', 'false').lower() in ['true', '1', 't'],
+            ASYNC_HTTP_MAX_CONNECTIONS=int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 100)),
+            GITHUB_API_URL=os.getenv('GITHUB_API_URL', 'https://api.github.com'),
+            ADO_API_URL=os.getenv('ADO_API_URL', 'https://dev.azure.com'),
+            HEALTH_MAX_AGE_SECONDS=int(os.getenv('HEALTH_MAX_AGE_SECONDS', 60)),
+            HEALTH_CHECK_INTERVAL_SECONDS=int(os.getenv('HEALTH_CHECK_INTERVAL_SECONDS', 60)),
+            HEALTH_CHECK_TIMEOUT_SECONDS=float(os.getenv('HEALTH_CHECK_TIMEOUT_SECONDS', 5)),
+            HEALTH_DEADLINE_SECONDS=float(os.getenv('HEALTH_DEADLINE_SECONDS', 15)),
+            SNAPSHOT_HISTORY_SIZE=int(os.getenv('SNAPSHOT_HISTORY_SIZE', 20)),
+            SSE_KEEPALIVE_SECONDS=float(os.getenv('SSE_KEEPALIVE_SECONDS', 15)),
+            SSE_LONG_POLL_SECONDS=float(os.getenv('SSE_LONG_POLL_SECONDS', 20)),
+            SSE_RETRY_SECONDS=float(os.getenv('SSE_RETRY_SECONDS', 10)),
+            CONFIG_CACHE_CHECK_SECONDS=float(os.getenv('CONFIG_CACHE_CHECK_SECONDS', 5)),
+            HISTORY_ENABLED=os.getenv('HISTORY_ENABLED', 'true').lower() in ['true', '1', 't'],
+            HISTORY_RETENTION_MINUTE_DAYS=float(os.getenv('HISTORY_RETENTION_MINUTE_DAYS', 2)),
+            HISTORY_RETENTION_HOUR_DAYS=float(os.getenv('HISTORY_RETENTION_HOUR_DAYS', 90)),
+            HISTORY_RETENTION_DAY_DAYS=float(os.getenv('HISTORY_RETENTION_DAY_DAYS', 730)),
+            ANALYTICS_WINDOWS=os.getenv('ANALYTICS_WINDOWS', '1d,7d,30d,90d'),
+            ANALYTICS_CACHE_SECONDS=int(os.getenv('ANALYTICS_CACHE_SECONDS', 60)),
+            TRACING_ENABLED=os.getenv('TRACING_ENABLED', 'true').lower() in ['true', '1', 't'],
+            TRACING_SLOW_MS=float(os.getenv('TRACING_SLOW_MS', 500)),
+            PROFILER_ENABLED=os.getenv('PROFILER_ENABLED', 'false').lower() in ['true', '1', 't'],
+            PROFILER_INTERVAL_MS=float(os.getenv('PROFILER_INTERVAL_MS', 10)),
+            METRICS_BACKEND=os.getenv('METRICS_BACKEND', 'sqlite'),
+            METRICS_FLUSH_SECONDS=float(os.getenv('METRICS_FLUSH_SECONDS', 5)),
+            EVENTS_ENABLED=os.getenv('EVENTS_ENABLED', 'true').lower() in ['true', '1', 't'],
+            POLLER_ENABLED=os.getenv('POLLER_ENABLED', 'true').lower() in ['true', '1', 't'],
+            POLLER_LEADER_ELECTION=os.getenv('POLLER_LEADER_ELECTION', 'true').lower() in ['true', '1', 't'],
+            POLLER_LEASE_SECONDS=float(os.getenv('POLLER_LEASE_SECONDS', 30)),
+            POLLER_FOLLOW_SECONDS=float(os.getenv('POLLER_FOLLOW_SECONDS', 2)),
+            RUNNER_PAGE_SIZE=int(os.getenv('RUNNER_PAGE_SIZE', 50)),
+            RUNNER_MAX_PAGE_SIZE=int(os.getenv('RUNNER_MAX_PAGE_SIZE', 500)),
+            GITHUB_WEBHOOK_SECRET=os.getenv('GITHUB_WEBHOOK_SECRET'),
+            ADO_WEBHOOK_SECRET=os.getenv('ADO_WEBHOOK_SECRET'),
+            WEBHOOK_QUEUE_SIZE=int(os.getenv('WEBHOOK_QUEUE_SIZE', 10000)),
+            WEBHOOK_BATCH_SIZE=int(os.getenv('WEBHOOK_BATCH_SIZE', 500)),
+            WEBHOOK_BATCH_SECONDS=float(os.getenv('WEBHOOK_BATCH_SECONDS', 1)),
+            WEBHOOK_RECONCILE_SECONDS=float(os.getenv('WEBHOOK_RECONCILE_SECONDS', 300)),
+            WEBHOOK_RETENTION_SECONDS=float(os.getenv('WEBHOOK_RETENTION_SECONDS', 3600)),
+            POLL_INTERVAL_SECONDS=float(os.getenv('POLL_INTERVAL_SECONDS') or os.getenv('REFRESH_INTERVAL_SECONDS') or 30),
         )
     else:
         app.config.from_mapping(test_config)
@@ -40,29 +113,45 @@ def create_app(test_config=None):
 
     db.init_app(app)
     login_manager.init_app(app)
+    poller.init_app(app)
+    api_cache.init_app(app)
+    http_client.init_app(app)
+    async_client.init_app(app)
+    rate_limiter.init_app(app)
+    config_cache.init_app(app)
+    app_state.init_app(app)
+    status_history.init_app(app)
+    runner_event_log.init_app(app)
+    runner_analytics.init_app(app)
+    metrics_exporter.init_app(app)
+    request_tracer.init_app(app)
+    profiler.init_app(app)
+    webhook_ingestor.init_app(app)
+    runner_stores.init_app(app)
 
     app.register_blueprint(main_bp)
 
     @app.before_request
     def before_request_handler():
-        if request.endpoint and request.endpoint in ['static', 'main.get_version']:
-            return
-
-        with app.app_context():
-            user_exists = User.query.first()
+        poller.ensure_started()
+        metrics_exporter.ensure_started()
+        profiler.ensure_started()
+        webhook_ingestor.ensure_started()
 
-            if not user_exists:
-                if request.endpoint != 'main.setup':
-                    return redirect(url_for('main.setup'))
-                return
+        if request.endpoint and request.endpoint in ['static', 'main.get_version', 'main.livez', 'main.readyz',
+                                                     'main.metrics', 'main.github_webhook', 'main.ado_webhook']:
+            return
 
-            if current_user.is_authenticated:
-                token_exists = Setting.query.filter_by(key='API_GITHUB_TOKEN').first()
+        if not app_state.setup_done():
+            if request.endpoint != 'main.setup':
+                return redirect(url_for('main.setup'))
+            return
 
-                if not token_exists:
-                    allowed_endpoints = ['main.settings', 'main.logout']
-                    if request.endpoint not in allowed_endpoints:
-                        flash('Please configure the GitHub API Token in the settings.', 'warning')
-                        return redirect(url_for('main.settings'))
+        if current_user.is_authenticated:
+            if not app_state.token_configured():
+                allowed_endpoints = ['main.settings', 'main.logout']
+                if request.endpoint not in allowed_endpoints:
+                    flash('Please configure the GitHub API Token in the settings.', 'warning')
+                    return redirect(url_for('main.settings'))
 
     return app
\ No newline at end of file
@@ -0,0 +1,196 @@
+import math
+from collections import Counter
+
+from sqlalchemy import case, func, select
+
+from .history import status_history, dialect_insert, RESOLUTION_HOUR, RESOLUTION_DAY, SOURCE_GITHUB, SOURCE_ADO
+from .models import db, StatusSample, TimeToIdleBin, MonitoredGroup, GitHubConfig, MonitoredADOPool, AzureDevOpsConfig
+
+# Eight logarithmic bins per doubling keep a percentile within ~9% of the exact value
+BINS_PER_DOUBLING = 8
+PERCENTILES = (50, 95)
+
+
+def duration_bin(seconds):
+    return int(math.floor(math.log2(max(seconds, 1.0)) * BINS_PER_DOUBLING))
+
+
+def bin_seconds(duration_bin):
+    """Geometric middle of a duration bin."""
+    return round(2 ** ((duration_bin + 0.5) / BINS_PER_DOUBLING), 1)
+
+
+class RunnerAnalytics:
+    """
+    Utilisation reports per GitHub runner group and ADO agent pool.
+
+    Busy ratio and saturation are aggregated in SQL from the status_sample
+    rollups. Time-to-idle percentiles come from busy-period histograms
+    (time_to_idle_bin) filled from the runner event log, so a report reads a
+    few rows per group and bucket however many runners and jobs it covers.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('HISTORY_ENABLED', True))
+        app.extensions['runner_analytics'] = self
+
+    def record_time_to_idle(self, source, events):
+        """Adds the busy periods ended by `events` (runner event log rows) to the histograms."""
+        if not self.enabled:
+            return
+        counts = Counter()
+        for event in events:
+            if event['old_state'] != 'busy' or event['new_state'] != 'idle' or event.get('state_seconds') is None:
+                continue
+            at = int(event['occurred_at'])
+            for resolution in (RESOLUTION_HOUR, RESOLUTION_DAY):
+                counts[(event['org_id'], event['group_id'], resolution, at - at % resolution,
+                        duration_bin(event['state_seconds']))] += 1
+        if not counts:
+            return
+
+        rows = [
+            {'source': source, 'org_id': org_id, 'group_id': group_id, 'resolution': resolution,
+             'bucket': bucket, 'bin': bin_, 'count': count}
+            for (org_id, group_id, resolution, bucket, bin_), count in counts.items()
+        ]
+        stmt = dialect_insert()(TimeToIdleBin).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['source', 'org_id', 'group_id', 'resolution', 'bucket', 'bin'],
+            set_={'count': TimeToIdleBin.count + stmt.excluded.count},
+        ))
+        db.session.commit()
+
+    def report(self, source, start, end):
+        """Utilisation of every group/pool of `source` over [start, end)."""
+        groups = self._utilisation(source, start, end)
+        time_to_idle = self._time_to_idle(source, start, end)
+        names = self._names(source)
+
+        for key, entry in time_to_idle.items():
+            groups.setdefault(key, self._empty(*key))['time_to_idle'] = entry
+        for (org_id, group_id), entry in groups.items():
+            entry['name'] = names.get((org_id, group_id))
+            entry.setdefault('time_to_idle', {'count': 0, **{f'p{p}': None for p in PERCENTILES}})
+
+        return {
+            'source': source,
+            'from': int(start),
+            'to': int(end),
+            'groups': sorted(groups.values(), key=lambda entry: (entry['org_id'], entry['group_id'])),
+        }
+
+    @staticmethod
+    def _empty(org_id, group_id):
+        return {'org_id': org_id, 'group_id': group_id, 'samples': 0, 'busy_ratio': None,
+                'saturation_ratio': None, 'saturated_seconds': 0, 'avg_online': None,
+                'avg_busy': None, 'peak_busy': None}
+
+    def _utilisation(self, source, start, end):
+        # Everything is summed into one row per group, so a rollup only needs to be fine
+        # enough for the window edges; about 24 buckets per window is plenty.
+        resolution = status_history.choose_resolution(start, end, step=(end - start) / 24, now=end)
+        first = int(start) - int(start) % resolution
+        rows = db.session.execute(
+            select(
+                StatusSample.org_id,
+                StatusSample.group_id,
+                func.sum(StatusSample.samples),
+                func.sum(StatusSample.online_sum),
+                func.sum(StatusSample.busy_sum),
+                func.sum(StatusSample.saturated_sum),
+                func.max(StatusSample.busy_max),
+                func.min(StatusSample.bucket),
+                func.max(StatusSample.bucket),
+            )
+            .where(
+                StatusSample.source == source,
+                StatusSample.resolution == resolution,
+                StatusSample.bucket >= first,
+                StatusSample.bucket < end,
+            )
+            .group_by(StatusSample.org_id, StatusSample.group_id)
+        ).all()
+
+        groups = {}
+        for org_id, group_id, samples, online, busy, saturated, busy_max, first_bucket, last_bucket in rows:
+            # Saturation time is the saturated share of samples over the span history covers
+            span = min(end, last_bucket + resolution) - max(start, first_bucket)
+            groups[(org_id, group_id)] = {
+                'org_id': org_id,
+                'group_id': group_id,
+                'samples': samples,
+                'busy_ratio': round(busy / online, 4) if online else None,
+                'saturation_ratio': round(saturated / samples, 4),
+                'saturated_seconds': int(saturated / samples * max(span, 0)),
+                'avg_online': round(online / samples, 2),
+                'avg_busy': round(busy / samples, 2),
+                'peak_busy': busy_max,
+            }
+        return groups
+
+    def _time_to_idle(self, source, start, end):
+        hourly = end - start <= 7 * 86400 and start >= end - status_history.retention[RESOLUTION_HOUR]
+        resolution = RESOLUTION_HOUR if hourly else RESOLUTION_DAY
+
+        per_bin = (
+            select(TimeToIdleBin.org_id, TimeToIdleBin.group_id, TimeToIdleBin.bin,
+                   func.sum(TimeToIdleBin.count).label('n'))
+            .where(
+                TimeToIdleBin.source == source,
+                TimeToIdleBin.resolution == resolution,
+                TimeToIdleBin.bucket >= int(start) - int(start) % resolution,
+                TimeToIdleBin.bucket < end,
+            )
+            .group_by(TimeToIdleBin.org_id, TimeToIdleBin.group_id, TimeToIdleBin.bin)
+            .subquery()
+        )
+        partition = (per_bin.c.org_id, per_bin.c.group_id)
+        cumulative = select(
+            per_bin.c.org_id,
+            per_bin.c.group_id,
+            per_bin.c.bin,
+            func.sum(per_bin.c.n).over(partition_by=partition, order_by=per_bin.c.bin).label('cumulative'),
+            func.sum(per_bin.c.n).over(partition_by=partition).label('total'),
+        ).subquery()
+        # A percentile is the first bin whose running count reaches its share of the total
+        rows = db.session.execute(
+            select(
+                cumulative.c.org_id,
+                cumulative.c.group_id,
+                func.max(cumulative.c.total),
+                *[func.min(case((cumulative.c.cumulative >= cumulative.c.total * p / 100.0, cumulative.c.bin)))
+                  for p in PERCENTILES],
+            ).group_by(cumulative.c.org_id, cumulative.c.group_id)
+        ).all()
+
+        return {
+            (org_id, group_id): {
+                'count': total,
+                **{f'p{p}': bin_seconds(bin_) for p, bin_ in zip(PERCENTILES, bins)},
+            }
+            for org_id, group_id, total, *bins in rows
+        }
+
+    @staticmethod
+    def _names(source):
+        if source == SOURCE_GITHUB:
+            # Groups of the organization in Settings keep their plain names
+            org_names = dict(db.session.query(GitHubConfig.id, GitHubConfig.organization_name))
+            return {(group.org_id, group.id): f"{org_names[group.org_id]} / {group.name}"
+                    if group.org_id in org_names else group.name
+                    for group in MonitoredGroup.query.all()}
+        if source == SOURCE_ADO:
+            rows = db.session.query(MonitoredADOPool.ado_config_id, MonitoredADOPool.pool_id,
+                                    MonitoredADOPool.pool_name, AzureDevOpsConfig.organization_name).join(
+                AzureDevOpsConfig, MonitoredADOPool.ado_config_id == AzureDevOpsConfig.id)
+            return {(org_id, pool_id): f"{org_name} / {pool_name}" for org_id, pool_id, pool_name, org_name in rows}
+        return {}
+
+
+runner_analytics = RunnerAnalytics()
@@ -0,0 +1,64 @@
+import threading
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from .config_cache import config_cache
+from .models import db, User
+
+
+class AppState:
+    """
+    Process-level bootstrap state for the before_request auth gate.
+
+    "Setup done", "token configured" and the logged-in user are answered from
+    memory, so steady-state requests (e.g. dashboard JSON polls) make no DB
+    queries. Writes to users and settings bump the config version (see
+    config_cache), which drops this state in the writing worker on commit and
+    in the other workers at their next version check.
+    """
+
+    def __init__(self, app=None):
+        self._setup_done = False
+        self._users = {}
+        self._lock = threading.Lock()
+        config_cache.on_invalidate(self.invalidate)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.invalidate()
+        app.extensions['app_state'] = self
+
+    def setup_done(self):
+        # Only the positive answer is kept: setup is a one-way transition, and a
+        # stale "not done" would keep redirecting to /setup after it happened.
+        if not self._setup_done:
+            self._setup_done = db.session.query(User.id).first() is not None
+        return self._setup_done
+
+    def token_configured(self):
+        return 'API_GITHUB_TOKEN' in config_cache.get()
+
+    def load_user(self, user_id):
+        """Returns the user attached to the current session without a query once it has been seen."""
+        config_cache.get()  # Revalidates the version, dropping stale users changed by another worker
+        cached = self._users.get(user_id)
+        if cached is None:
+            user = db.session.get(User, user_id)
+            if user is None:
+                return None
+            with self._lock:
+                self._users[user_id] = (user.username, user.password_hash)
+            return user
+        username, password_hash = cached
+        user = User(id=user_id, username=username, password_hash=password_hash)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._setup_done = False
+            self._users.clear()
+
+
+app_state = AppState()
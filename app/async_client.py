@@ -0,0 +1,181 @@
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from requests.auth import HTTPBasicAuth
+
+from .http_client import record_upstream_call
+from .tracing import span
+
+logger = logging.getLogger('gunicorn.error')
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def _gevent_patched():
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+class AsyncUpstreamClient:
+    """
+    asyncio counterpart of UpstreamHttpClient, built on httpx.
+
+    One event loop per process runs on a background thread and drives a
+    single pooled httpx.AsyncClient. Synchronous code (poller threads, Flask
+    views) submits coroutines with run() and blocks only its own thread, while
+    the loop keeps hundreds of upstream requests in flight at once. GET calls
+    are retried with backoff on connection errors and 5xx like the sync client.
+
+    asyncio does not run on gevent-patched sockets; under the gevent worker the
+    threaded path is already cooperative, so the client stays disabled there.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.max_connections = 100
+        self.retries = 2
+        self.backoff_factor = 0.5
+        self.timeout = (5, 10)
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._pid = None
+        self._requests = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('ASYNC_UPSTREAM_ENABLED', False))
+        if self.enabled and _gevent_patched():
+            logger.info("ASYNC_UPSTREAM_ENABLED is ignored under gevent, upstream calls already run on greenlets")
+            self.enabled = False
+        self.max_connections = app.config.get('ASYNC_HTTP_MAX_CONNECTIONS', 100)
+        self.retries = app.config.get('HTTP_RETRIES', 2)
+        self.backoff_factor = app.config.get('HTTP_RETRY_BACKOFF', 0.5)
+        self.timeout = (app.config.get('HTTP_CONNECT_TIMEOUT', 5), app.config.get('HTTP_READ_TIMEOUT', 10))
+        self.close()
+        app.extensions['async_upstream_client'] = self
+
+    def _ensure_loop(self):
+        # A forked gunicorn worker inherits the object but not the loop thread.
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='async-upstream', daemon=True)
+                thread.start()
+                self._loop, self._thread, self._client, self._pid = loop, thread, None, os.getpid()
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """
+        Runs a coroutine on the background loop and waits for its result from the
+        calling thread. The coroutine runs in a copy of the caller's context, so
+        its app context and trace (app.tracing) stay active on the loop.
+        """
+        loop = self._ensure_loop()
+        # The task scheduled here copies the context it is created in
+        future = contextvars.copy_context().run(asyncio.run_coroutine_threadsafe, coro, loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _get_client(self):
+        if self._client is None:
+            connect_timeout, read_timeout = self.timeout
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def request(self, method, url, timeout=None, auth=None, **kwargs):
+        if isinstance(auth, HTTPBasicAuth):
+            auth = (auth.username, auth.password)
+        if timeout is not None and not isinstance(timeout, httpx.Timeout):
+            timeout = httpx.Timeout(timeout)
+        request_kwargs = dict(kwargs, auth=auth)
+        if timeout is not None:
+            request_kwargs['timeout'] = timeout
+
+        client = self._get_client()
+        attempts = 1 + (self.retries if method in ('GET', 'HEAD') else 0)
+        started = time.perf_counter()
+        status = 'error'
+        self._track(1)
+        try:
+            with span('upstream'):
+                for attempt in range(attempts):
+                    last_attempt = attempt == attempts - 1
+                    try:
+                        response = await client.request(method, url, **request_kwargs)
+                    except httpx.TransportError:
+                        if last_attempt:
+                            raise
+                    else:
+                        if response.status_code not in RETRY_STATUSES or last_attempt:
+                            status = response.status_code
+                            return response
+                    await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+        finally:
+            self._track(-1)
+            record_upstream_call(urlsplit(url).netloc, url, started, status)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def get_json(self, url, auth=None, timeout=None, headers=None):
+        response = await self.get(url, auth=auth, timeout=timeout, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    def _track(self, delta):
+        with self._lock:
+            self._in_flight += delta
+            if delta > 0:
+                self._requests += delta
+                self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'requests': self._requests,
+                'in_flight': self._in_flight,
+                'max_in_flight': self._max_in_flight,
+            }
+
+    def close(self):
+        with self._lock:
+            loop, thread, client = self._loop, self._thread, self._client
+            owned = self._pid == os.getpid()
+            self._loop = self._thread = self._client = self._pid = None
+            self._requests = self._in_flight = self._max_in_flight = 0
+        if loop is None or not owned:
+            return
+        if client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(5)
+            except Exception:
+                pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        if not loop.is_running():
+            loop.close()
+
+
+async_client = AsyncUpstreamClient()
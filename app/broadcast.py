@@ -0,0 +1,94 @@
+import threading
+from collections import deque
+
+EVENT_DELTA = 'delta'
+EVENT_RESYNC = 'resync'
+
+
+class Subscription:
+    """
+    One client's bounded event queue. A client that falls behind by more than
+    `max_pending` events loses them and is told to resync instead.
+    """
+
+    def __init__(self, broadcaster, channel, max_pending):
+        self.broadcaster = broadcaster
+        self.channel = channel
+        self._events = deque()
+        self._max_pending = max_pending
+        self._overflowed = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def push(self, event, data):
+        with self._cond:
+            if len(self._events) >= self._max_pending:
+                self._events.clear()
+                self._overflowed = True
+            else:
+                self._events.append((event, data))
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Returns the next (event, data) pair, or None when nothing arrived within `timeout`."""
+        with self._cond:
+            if not self._events and not self._overflowed and not self._closed:
+                self._cond.wait(timeout)
+            if self._overflowed:
+                self._overflowed = False
+                return EVENT_RESYNC, '{}'
+            if self._events:
+                return self._events.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """In-process fan-out of snapshot events to streaming (SSE) clients, per channel."""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscriptions.get(channel, ()))
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, channel, event, data):
+        """Queues an already serialised JSON `data` for every subscriber of the channel."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        if not subscriptions:
+            return 0
+        for subscription in subscriptions:
+            subscription.push(event, data)
+        return len(subscriptions)
+
+    def reset(self):
+        with self._lock:
+            self._subscriptions.clear()
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,368 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from .singleflight import SingleFlight
+
+logger = logging.getLogger('gunicorn.error')
+
+
+class BaseCache(ABC):
+    """
+    Minimal cache interface used for upstream API responses. Values must be JSON
+    serialisable. Fill locks are kept apart from the entries, so they neither
+    count towards nor get evicted by the entry limit.
+    """
+
+    def get(self, key):
+        value, is_fresh = self.get_entry(key)
+        return value if is_fresh else None
+
+    @abstractmethod
+    def get_entry(self, key, max_stale=0):
+        """Returns (value, is_fresh); expired values are still returned up to max_stale seconds past their TTL."""
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        """Stores value for ttl seconds."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Drops the entry for key, if any."""
+
+    @abstractmethod
+    def acquire_lock(self, key, ttl):
+        """Takes the lock for key unless someone holds it; it expires after ttl seconds. Returns True if taken."""
+
+    @abstractmethod
+    def release_lock(self, key):
+        """Releases a lock taken with acquire_lock."""
+
+    @abstractmethod
+    def is_locked(self, key):
+        """Whether a live lock is held for key."""
+
+    @abstractmethod
+    def clear(self):
+        """Drops every entry and lock."""
+
+
+class MemoryCache(BaseCache):
+    """Process-local LRU cache. Only suitable for a single worker (tests, local development)."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get_entry(self, key, max_stale=0):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            value, expires_at = entry
+            now = time.time()
+            if expires_at + max_stale <= now:
+                return None, False
+            self._entries.move_to_end(key)
+            return value, expires_at > now
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def acquire_lock(self, key, ttl):
+        with self._lock:
+            now = time.time()
+            if self._locks.get(key, (0, None))[0] > now:
+                return False
+            self._locks[key] = (now + ttl, _lock_owner())
+            return True
+
+    def release_lock(self, key):
+        with self._lock:
+            if self._locks.get(key, (0, None))[1] == _lock_owner():
+                del self._locks[key]
+
+    def is_locked(self, key):
+        return self._locks.get(key, (0, None))[0] > time.time()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._locks.clear()
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache shared by all gunicorn workers on the host, stored in a SQLite file in WAL mode.
+
+    Every process/thread uses its own connection; writes run in an IMMEDIATE
+    transaction, so readers in other workers never see a half-written entry.
+    Reads run in autocommit mode, so they never wait for the write lock and see
+    the last committed state. Every tenth of `max_entries` writes, a worker trims the table by evicting
+    expired and then least recently stored entries in the same transaction, so
+    writes between two evictions do not pay for counting the table. Fill locks
+    live in their own table.
+    """
+
+    def __init__(self, path, max_entries=1000, stale_retention=0):
+        self.path = path
+        self.max_entries = max_entries
+        self.stale_retention = stale_retention
+        self._local = threading.local()
+        self._evict_every = max(1, max_entries // 10)
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS api_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_api_cache_stored_at ON api_cache (stored_at)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS api_cache_lock ('
+                'key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        """The connection of this thread inside a write transaction."""
+        return _Transaction(self._connection())
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # A connection must never be shared with a forked child process.
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_entry(self, key, max_stale=0):
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM api_cache WHERE key = ? AND expires_at > ?', (key, now - max_stale)
+        ).fetchone()
+        if row is None:
+            return None, False
+        return json.loads(row[0]), row[1] > now
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        payload = json.dumps(value)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO api_cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)',
+                (key, payload, now, now + ttl),
+            )
+            self._writes += 1
+            if self._writes >= self._evict_every:
+                self._writes = 0
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        # Leave room for the writes until the next eviction
+        keep = self.max_entries - self._evict_every + 1
+        count = conn.execute('SELECT COUNT(*) FROM api_cache').fetchone()[0]
+        if count <= keep:
+            return
+        conn.execute('DELETE FROM api_cache WHERE expires_at <= ?', (now - self.stale_retention,))
+        conn.execute(
+            'DELETE FROM api_cache WHERE key IN '
+            '(SELECT key FROM api_cache ORDER BY stored_at LIMIT max(0, (SELECT COUNT(*) FROM api_cache) - ?))',
+            (keep,),
+        )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM api_cache WHERE key = ?', (key,))
+
+    def acquire_lock(self, key, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            held = conn.execute('SELECT 1 FROM api_cache_lock WHERE key = ? AND expires_at > ?', (key, now)).fetchone()
+            if held:
+                return False
+            conn.execute('INSERT OR REPLACE INTO api_cache_lock (key, owner, expires_at) VALUES (?, ?, ?)',
+                         (key, _lock_owner(), now + ttl))
+        return True
+
+    def release_lock(self, key):
+        # Only our own lock: once it expired, another worker may hold the key
+        with self._connect() as conn:
+            conn.execute('DELETE FROM api_cache_lock WHERE key = ? AND owner = ?', (key, _lock_owner()))
+
+    def is_locked(self, key):
+        return self._connection().execute('SELECT 1 FROM api_cache_lock WHERE key = ? AND expires_at > ?',
+                                          (key, time.time())).fetchone() is not None
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM api_cache')
+            conn.execute('DELETE FROM api_cache_lock')
+
+
+def _lock_owner():
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT around a block, rolled back on error."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class ApiCache:
+    """Flask extension picking the cache backend from API_CACHE_BACKEND ('sqlite' or 'memory')."""
+
+    def __init__(self, app=None):
+        self.backend = MemoryCache()
+        self.stale_seconds = 0
+        self.fill_timeout = 60
+        self._flight = SingleFlight()
+        self._async_fills = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('API_CACHE_BACKEND', 'memory')
+        max_entries = app.config.get('API_CACHE_MAX_ENTRIES', 1000)
+        self.stale_seconds = app.config.get('API_CACHE_STALE_SECONDS', 0)
+        if backend == 'sqlite':
+            path = app.config.get('API_CACHE_PATH') or os.path.join(app.instance_path, 'api_cache.db')
+            self.backend = SQLiteCache(path, max_entries=max_entries, stale_retention=self.stale_seconds)
+        elif backend == 'memory':
+            self.backend = MemoryCache(max_entries=max_entries)
+        else:
+            raise ValueError(f"Unknown API_CACHE_BACKEND: {backend}")
+        app.extensions['api_cache'] = self
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl):
+        self.backend.set(key, value, ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_or_fetch(self, key, fetch, ttl):
+        """
+        Returns (value, error) for key, calling fetch() -> (value, error) on a miss.
+
+        Concurrent misses for the same key are coalesced: inside a worker through
+        single-flight, across workers through a short-lived fill lock in the
+        shared backend. With API_CACHE_STALE_SECONDS set, an expired entry is
+        served immediately while one background call revalidates it.
+        """
+        value, is_fresh = self.backend.get_entry(key, self.stale_seconds)
+        if is_fresh:
+            return value, None
+        if value is not None:
+            self._flight.do_async(key, lambda: self._fill(key, fetch, ttl))
+            return value, None
+        return self._flight.do(key, lambda: self._fill(key, fetch, ttl))
+
+    def _fill(self, key, fetch, ttl):
+        locked = self.backend.acquire_lock(key, self.fill_timeout)
+        if not locked:
+            value = self._wait_for_other_worker(key)
+            if value is not None:
+                return value, None
+            locked = self.backend.acquire_lock(key, self.fill_timeout)
+        try:
+            value, error = fetch()
+            if error is None:
+                self.backend.set(key, value, ttl)
+            return value, error
+        finally:
+            if locked:
+                self.backend.release_lock(key)
+
+    async def get_or_fetch_async(self, key, fetch, ttl):
+        """
+        Coroutine counterpart of get_or_fetch() for the async client's event loop,
+        with `fetch` a coroutine function. Concurrent misses on the loop share one
+        fill task, and waiting for another worker's fill never blocks the loop.
+        """
+        value, is_fresh = self.backend.get_entry(key, self.stale_seconds)
+        if is_fresh:
+            return value, None
+        fill = self._async_fills.get(key)
+        if fill is None:
+            fill = self._async_fills[key] = asyncio.ensure_future(self._fill_async(key, fetch, ttl))
+            fill.add_done_callback(lambda _: self._async_fills.pop(key, None))
+        if value is not None:
+            return value, None
+        # A caller cancelled at its deadline leaves the fill running for the others
+        return await asyncio.shield(fill)
+
+    async def _fill_async(self, key, fetch, ttl):
+        locked = self.backend.acquire_lock(key, self.fill_timeout)
+        if not locked:
+            value = await self._wait_for_other_worker_async(key)
+            if value is not None:
+                return value, None
+            locked = self.backend.acquire_lock(key, self.fill_timeout)
+        try:
+            value, error = await fetch()
+            if error is None:
+                self.backend.set(key, value, ttl)
+            return value, error
+        finally:
+            if locked:
+                self.backend.release_lock(key)
+
+    def _wait_for_other_worker(self, key):
+        deadline = time.monotonic() + self.fill_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = self.backend.get(key)
+            if value is not None:
+                return value
+            if not self.backend.is_locked(key):
+                break
+        logger.warning(f"Gave up waiting for another worker to fill {key}")
+        return None
+
+    async def _wait_for_other_worker_async(self, key):
+        deadline = time.monotonic() + self.fill_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            value = self.backend.get(key)
+            if value is not None:
+                return value
+            if not self.backend.is_locked(key):
+                break
+        logger.warning(f"Gave up waiting for another worker to fill {key}")
+        return None
+
+
+api_cache = ApiCache()
@@ -0,0 +1,129 @@
+import threading
+import time
+from itertools import chain
+
+from sqlalchemy import Integer, String, cast, event, update
+from sqlalchemy.orm import Session
+
+from .models import Setting, User
+from .utils import decrypt_data
+
+CONFIG_VERSION_KEY = 'CONFIG_VERSION'
+
+
+class ConfigCache:
+    """
+    Process-local cache of the Setting table and of decrypted secrets.
+
+    Any flush touching a Setting or a User bumps the CONFIG_VERSION row in the
+    same transaction and invalidates this worker's copy on commit. Other workers
+    compare their version with the DB at most every CONFIG_CACHE_CHECK_SECONDS,
+    so hot paths read the config without any DB query. Callbacks registered with
+    on_invalidate() are run whenever the cached copy is dropped or reloaded.
+    """
+
+    def __init__(self, app=None):
+        self.check_interval = 5
+        self._config = None
+        self._version = None
+        self._checked_at = 0.0
+        self._decrypted = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.check_interval = app.config.get('CONFIG_CACHE_CHECK_SECONDS', 5)
+        self.invalidate()
+        app.extensions['config_cache'] = self
+
+    def get(self):
+        config = self._config
+        if config is None or time.monotonic() - self._checked_at >= self.check_interval:
+            config = self._revalidate()
+        return dict(config)
+
+    def secret(self, key):
+        return self.decrypt(self.get().get(key))
+
+    def decrypt(self, encrypted_value):
+        """Fernet decryption memoised by ciphertext; a changed secret has a different ciphertext."""
+        if not encrypted_value:
+            return ""
+        value = self._decrypted.get(encrypted_value)
+        if value is None:
+            value = decrypt_data(encrypted_value)
+            if len(self._decrypted) > 256:
+                self._decrypted.clear()
+            self._decrypted[encrypted_value] = value
+        return value
+
+    def on_invalidate(self, callback):
+        self._listeners.append(callback)
+
+    def invalidate(self):
+        with self._lock:
+            self._config = None
+            self._version = None
+            self._checked_at = 0.0
+        self._notify()
+
+    def _notify(self):
+        for callback in self._listeners:
+            callback()
+
+    def _revalidate(self):
+        with self._lock:
+            if self._config is not None:
+                version = _read_version()
+                if version == self._version:
+                    self._checked_at = time.monotonic()
+                    return self._config
+            reloaded = self._config is not None
+            config = {setting.key: setting.value for setting in Setting.query.all()}
+            self._version = config.pop(CONFIG_VERSION_KEY, None)
+            self._config = config
+            self._checked_at = time.monotonic()
+        if reloaded:
+            self._notify()
+        return config
+
+
+def _read_version():
+    setting = Setting.query.with_entities(Setting.value).filter_by(key=CONFIG_VERSION_KEY).first()
+    return setting[0] if setting else None
+
+
+config_cache = ConfigCache()
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_config_version(session, flush_context, instances):
+    changed = any(
+        isinstance(obj, User) or (isinstance(obj, Setting) and obj.key != CONFIG_VERSION_KEY)
+        for obj in chain(session.new, session.dirty, session.deleted)
+    )
+    if not changed:
+        return
+    # Incremented in SQL rather than in Python so concurrent writers in other workers never lose a bump.
+    bumped = session.execute(
+        update(Setting)
+        .where(Setting.key == CONFIG_VERSION_KEY)
+        .values(value=cast(cast(Setting.value, Integer) + 1, String))
+        .execution_options(synchronize_session=False)
+    )
+    if bumped.rowcount == 0:
+        session.add(Setting(key=CONFIG_VERSION_KEY, value='1'))
+    session.info['config_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('config_changed', False):
+        config_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_change(session):
+    session.info.pop('config_changed', None)
@@ -1,19 +1,44 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app, session
 from flask_login import login_user, logout_user, current_user, login_required
-from app.models import db, Setting, MonitoredGroup, AzureDevOpsConfig, MonitoredADOPool, User
+from app.models import db, Setting, MonitoredGroup, GitHubConfig, AzureDevOpsConfig, MonitoredADOPool, User
 from app.utils import encrypt_data, decrypt_data
+from app.config_cache import config_cache
+from app.app_state import app_state
 from app.forms import LoginForm, SetupForm
+from app.fanout import fan_out, fan_out_async, remaining_seconds, FANOUT_TIMEOUT
+from app.poller import poller
+from app.cache import api_cache
+from app.singleflight import SingleFlight
+from app.http_client import http_client
+from app.metrics import counters, registry
+from app.profiler import profiler
+from app import tracing
+from app.exporter import metrics_exporter, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.ratelimit import rate_limiter, PRIORITY_DASHBOARD, PRIORITY_HEALTH, PRIORITY_SETTINGS
+from app.broadcast import broadcaster, EVENT_DELTA, EVENT_RESYNC
+from app.async_client import async_client
+from app.history import status_history, github_group_counts, ado_pool_counts, SOURCE_GITHUB, SOURCE_ADO
+from app.analytics import runner_analytics
+from app.events import runner_event_log, transitions as runner_transitions
+from app.webhooks import webhook_ingestor, github_signature_valid, secret_valid
+from app.runner_store import runner_stores, SOURCES as RUNNER_SOURCES
+from app import runner_diff
 import requests
+import httpx
 from requests.auth import HTTPBasicAuth
 from datetime import datetime, timezone
+import asyncio
 import json
 import os
 import time
+import threading
 import logging
-from urllib.parse import urlsplit
+from functools import partial
+from urllib.parse import quote, urlsplit
 
-api_cache = {}
 main_bp = Blueprint('main', __name__)
+# Coalesces concurrent agent-list fetches of the same ADO pool (e.g. poller and a cold-start request).
+ado_flight = SingleFlight()
 
 @main_bp.route('/')
 def index():
@@ -28,7 +53,7 @@ def setup():
     
     logout_user()
     
-    if User.query.first():
+    if app_state.setup_done():
         return redirect(url_for('main.index'))
 
     form = SetupForm()
@@ -43,7 +68,7 @@ def setup():
 
 @main_bp.route('/login', methods=['GET', 'POST'])
 def login():
-    if not User.query.first():
+    if not app_state.setup_done():
         flash('No admin account has been set up yet. Please create one first.', 'warning')
         return redirect(url_for('main.setup'))
 
@@ -101,6 +126,35 @@ def settings():
                 update_or_create_setting('JIRA_API_TOKEN', jira_token)
             flash('Jira & Confluence settings have been saved.', 'success')
 
+        elif form_name == 'add_github_org':
+            org_name = request.form.get('organization_name')
+            api_token = request.form.get('api_token')
+            if org_name and api_token:
+                existing_config = GitHubConfig.query.filter_by(organization_name=org_name).first()
+                if existing_config or org_name == get_config_from_db().get('ORGANIZATION'):
+                    flash(f'GitHub organization "{org_name}" is already configured.', 'warning')
+                else:
+                    new_github_config = GitHubConfig(organization_name=org_name, api_token=encrypt_data(api_token))
+                    db.session.add(new_github_config)
+                    db.session.commit()
+                    flash(f'GitHub organization "{org_name}" has been added successfully.', 'success')
+            else:
+                flash('Both Organization Name and API Token are required.', 'danger')
+
+        elif form_name == 'update_github_org':
+            config_id = request.form.get('config_id')
+            new_api_token = request.form.get('api_token')
+            if new_api_token and config_id:
+                config_to_update = db.session.get(GitHubConfig, int(config_id))
+                if config_to_update:
+                    config_to_update.api_token = encrypt_data(new_api_token)
+                    db.session.commit()
+                    flash(f'API Token for {config_to_update.organization_name} has been updated.', 'success')
+                else:
+                    flash('Configuration not found.', 'danger')
+            else:
+                flash('No new API token was provided to update.', 'info')
+
         elif form_name == 'add_ado_org':
             org_name = request.form.get('organization_name')
             pat_token = request.form.get('pat_token')
@@ -136,13 +190,16 @@ def settings():
             db.session.rollback()
             flash(f'Database error: {e}', 'danger')
         api_cache.clear()
+        poller.invalidate()
         return redirect(url_for('main.settings'))
 
     active_tab = session.pop('active_tab', '#github')
     config = get_config_from_db()
+    github_configs = GitHubConfig.query.order_by(GitHubConfig.organization_name).all()
     ado_configs = AzureDevOpsConfig.query.order_by(AzureDevOpsConfig.organization_name).all()
 
-    return render_template('settings.html', config=config, ado_configs=ado_configs, active_tab=active_tab)
+    return render_template('settings.html', config=config, github_configs=github_configs, ado_configs=ado_configs,
+                           active_tab=active_tab)
 
 @main_bp.route('/jira-confluence')
 def jira_confluence_status():
@@ -151,8 +208,7 @@ def jira_confluence_status():
 
     base_url = config.get('JIRA_BASE_URL')
     email = config.get('JIRA_EMAIL')
-    encrypted_token = config.get('JIRA_API_TOKEN')
-    token = decrypt_data(encrypted_token)
+    token = config_cache.decrypt(config.get('JIRA_API_TOKEN'))
 
     if not all([base_url, email, token]):
         flash('Jira & Confluence integration is not fully configured. Please provide Base URL, Email, and API Token in settings.', 'warning')
@@ -167,7 +223,7 @@ def jira_confluence_status():
     try:
         jira_url = f"{base_url.rstrip('/')}/status"
         logger.info(f"Checking Jira status at: {jira_url}")
-        response = requests.get(jira_url, headers=headers, auth=auth, timeout=10, verify=False)
+        response = http_client.get(jira_url, headers=headers, auth=auth, verify=False)
         response.raise_for_status()
         jira_status = response.json()
     except requests.exceptions.RequestException as e:
@@ -177,7 +233,7 @@ def jira_confluence_status():
     try:
         confluence_url = f"{base_url.rstrip('/')}/wiki/status"
         logger.info(f"Checking Confluence status at: {confluence_url}")
-        response = requests.get(confluence_url, headers=headers, auth=auth, timeout=10, verify=False)
+        response = http_client.get(confluence_url, headers=headers, auth=auth, verify=False)
         response.raise_for_status()
         confluence_status = response.json()
     except requests.exceptions.RequestException as e:
@@ -191,10 +247,10 @@ def verify_ado_connection(config_id):
     config = db.get_or_404(AzureDevOpsConfig, config_id)
     decrypted_pat = decrypt_data(config.pat_token)
     auth = get_ado_api_auth(decrypted_pat)
-    url = f"https://dev.azure.com/{config.organization_name}/_apis/projects?api-version=7.0"
+    url = get_ado_api_url(config.organization_name, "/_apis/projects?api-version=7.0")
 
     try:
-        response = requests.get(url, auth=auth, timeout=10)
+        response = http_client.get(url, auth=auth)
         if response.status_code == 200:
             return jsonify({'status': 'success', 'message': 'Connection successful!'})
         else:
@@ -207,11 +263,11 @@ def handle_ado_pools(config_id):
     config = db.get_or_404(AzureDevOpsConfig, config_id)
     decrypted_pat = decrypt_data(config.pat_token)
     auth = get_ado_api_auth(decrypted_pat)
-    url = f"https://dev.azure.com/{config.organization_name}/_apis/distributedtask/pools?api-version=7.0"
+    url = get_ado_api_url(config.organization_name, "/_apis/distributedtask/pools?api-version=7.0")
 
     if request.method == 'GET':
         try:
-            response = requests.get(url, auth=auth, timeout=10)
+            response = http_client.get(url, auth=auth)
             response.raise_for_status()
             all_pools = response.json().get('value', [])
             monitored_ids = {pool.pool_id for pool in config.monitored_pools}
@@ -234,6 +290,7 @@ def handle_ado_pools(config_id):
             db.session.add(new_monitored_pool)
         
         db.session.commit()
+        poller.invalidate('ado_dashboard')
         return jsonify({'message': 'Monitored agent pools have been updated.'})
 
 @main_bp.route('/api/azure-devops/<int:config_id>', methods=['DELETE'])
@@ -241,16 +298,29 @@ def delete_ado_config(config_id):
     config = db.get_or_404(AzureDevOpsConfig, config_id)
     db.session.delete(config)
     db.session.commit()
+    poller.invalidate()
     return jsonify({'message': 'Configuration deleted.'})
 
 @main_bp.route('/api/azure-devops/dashboard-data')
 def get_ado_dashboard_data():
+    return _snapshot_response('ado_dashboard')
+
+@main_bp.route('/api/azure-devops/dashboard-data/stream')
+def stream_ado_dashboard_data():
+    return _snapshot_stream('ado_dashboard')
+
+def collect_ado_dashboard_data():
     logger = logging.getLogger('gunicorn.error')
     ado_configs = AzureDevOpsConfig.query.all()
+    per_org_limit = current_app.config.get('ADO_CONCURRENCY_PER_ORG', 8)
+    deadline_at = time.monotonic() + current_app.config.get('ADO_FETCH_DEADLINE_SECONDS', 30)
+
     organizations_data = []
+    pools_by_key = {}
+    list_requests = []
 
     for config in ado_configs:
-        decrypted_pat = decrypt_data(config.pat_token)
+        decrypted_pat = config_cache.decrypt(config.pat_token)
         auth = get_ado_api_auth(decrypted_pat)
         org_data = {
             'id': config.id,
@@ -259,100 +329,118 @@ def get_ado_dashboard_data():
         }
 
         for monitored_pool in config.monitored_pools:
-            pool_agents_url = (
-                f"https://dev.azure.com/{config.organization_name}/_apis/distributedtask/"
-                f"pools/{monitored_pool.pool_id}/agents?api-version=7.0"
+            pool_agents_url = get_ado_api_url(
+                config.organization_name,
+                f"/_apis/distributedtask/pools/{monitored_pool.pool_id}/agents"
+                f"?api-version=7.0&includeAssignedRequest=true&includeLastCompletedRequest=true"
             )
             pool_info = { 'id': monitored_pool.pool_id, 'name': monitored_pool.pool_name, 'agents_data': { 'total_count': 0, 'agents': [] } }
-            
-            try:
-                logger.info(f"Fetching ADO agents list for pool: {monitored_pool.pool_name}")
-                list_response = requests.get(pool_agents_url, auth=auth, timeout=10)
-                list_response.raise_for_status()
-                
-                agents_list = list_response.json().get('value', [])
-                enriched_agents_data = []
-
-                for agent_summary in agents_list:
-                    agent_id = agent_summary.get("id")
-                    if not agent_id: continue
-
-                    normalized_agent = _normalize_ado_agent(agent_summary)
-
-                    detail_url = (
-                        f"https://dev.azure.com/{config.organization_name}/_apis/distributedtask/"
-                        f"pools/{monitored_pool.pool_id}/agents/{agent_id}"
-                        f"?api-version=7.1&includeAssignedRequest=true"
-                    )
-                    
-                    try:
-                        detail_response = requests.get(detail_url, auth=auth, timeout=5)
-                        detail_response.raise_for_status()
-                        agent_full_details = detail_response.json()
-                        normalized_agent['busy'] = 'assignedRequest' in agent_full_details
-
-                    except requests.exceptions.RequestException as e:
-                        logger.error(f"Could not fetch details for agent ID {agent_id}: {e}")
-                        normalized_agent['busy'] = False 
-
-                    enriched_agents_data.append(normalized_agent)
-
-                pool_info['agents_data']['agents'] = enriched_agents_data
-                pool_info['agents_data']['total_count'] = len(enriched_agents_data)
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to get agents list for pool {monitored_pool.pool_name}: {e}")
-                pool_info['error'] = 'Failed to fetch agent list'
-            
             org_data['pools'].append(pool_info)
-        
+
+            pool_key = (config.id, monitored_pool.id)
+            pools_by_key[pool_key] = (config.organization_name, monitored_pool, auth, pool_info)
+            list_requests.append((config.organization_name, pool_key, pool_agents_url, auth, None))
+
         organizations_data.append(org_data)
-        
-    return jsonify({"organizations": organizations_data})
+
+    # Phase 1: list the agents of every pool with their assigned and last completed job, all organizations in parallel.
+    logger.info(f"Fetching ADO agents lists for {len(list_requests)} pools")
+    list_results = _fetch_upstream_json_all(list_requests, per_org_limit, remaining_seconds(deadline_at), ado_flight,
+                                            fetch=_get_ado_agent_pages, fetch_async=_get_ado_agent_pages_async)
+
+    agents_by_key = {}
+    detail_requests = []
+    for pool_key, result in list_results.items():
+        org_name, monitored_pool, auth, pool_info = pools_by_key[pool_key]
+        if not result.ok:
+            logger.error(f"Failed to get agents list for pool {monitored_pool.pool_name}: {result.error or result.status}")
+            pool_info['error'] = 'Timed out fetching agent list' if result.status == FANOUT_TIMEOUT else 'Failed to fetch agent list'
+            continue
+
+        enriched_agents_data = []
+        for agent_summary in result.value.get('value', []):
+            agent_id = agent_summary.get("id")
+            if not agent_id: continue
+
+            normalized_agent = _normalize_ado_agent(agent_summary)
+            enriched_agents_data.append(normalized_agent)
+            if _has_ado_request_data(agent_summary):
+                continue
+
+            # Neither a running nor a finished job in the listing: never ran one, or the server
+            # ignored the include options. Only the agent itself can tell.
+            detail_url = get_ado_api_url(
+                org_name,
+                f"/_apis/distributedtask/pools/{monitored_pool.pool_id}/agents/{agent_id}"
+                f"?api-version=7.1&includeAssignedRequest=true&includeLastCompletedRequest=true"
+            )
+            agent_key = (pool_key, agent_id)
+            agents_by_key[agent_key] = normalized_agent
+            detail_requests.append((org_name, agent_key, detail_url, auth, 5))
+
+        pool_info['agents_data']['agents'] = enriched_agents_data
+        pool_info['agents_data']['total_count'] = len(enriched_agents_data)
+
+    # Phase 2: detail calls for the agents the listing left open, bounded per organization and sharing the same deadline.
+    if detail_requests:
+        logger.info(f"Fetching details of {len(detail_requests)} ADO agents without job data")
+    detail_results = _fetch_upstream_json_all(detail_requests, per_org_limit, remaining_seconds(deadline_at))
+
+    partial_result = False
+    for agent_key, result in detail_results.items():
+        normalized_agent = agents_by_key[agent_key]
+        normalized_agent['detail_status'] = result.status
+        if result.ok:
+            normalized_agent.update(_ado_request_fields(result.value))
+            continue
+
+        if result.status == FANOUT_TIMEOUT:
+            partial_result = True
+        else:
+            logger.error(f"Could not fetch details for agent ID {agent_key[1]}: {result.error}")
+
+    if partial_result or any(result.status == FANOUT_TIMEOUT for result in list_results.values()):
+        logger.warning("ADO dashboard deadline reached, returning partial results")
+        partial_result = True
+
+    return {"organizations": organizations_data, "partial": partial_result}, 200
 
 @main_bp.route('/azure-devops')
 def azure_devops_dashboard():
-    ado_configs = AzureDevOpsConfig.query.all()
-    dashboard_data = []
-
-    for config in ado_configs:
-        auth = get_ado_api_auth(config.pat_token)
-        org_data = {
-            'id': config.id,
-            'name': config.organization_name,
-            'pools': []
-        }
-        logger = current_app.logger
-        for monitored_pool in config.monitored_pools:
-            url = f"https://dev.azure.com/{config.organization_name}/_apis/distributedtask/pools/{monitored_pool.pool_id}/agents?includeCapabilities=false&api-version=7.0"
-            logger.info(url)
-            try:
-                response = requests.get(url, auth=auth, timeout=10)
-                response.raise_for_status()
-                agents = response.json().get('value', [])
-                org_data['pools'].append({
-                    'name': monitored_pool.pool_name,
-                    'agents': agents
-                })
-            except requests.RequestException as e:
-                current_app.logger.error(f"Failed to get agents for pool {monitored_pool.pool_name}: {e}")
-                org_data['pools'].append({
-                    'name': monitored_pool.pool_name,
-                    'error': 'Failed to fetch agents'
-                })
-        dashboard_data.append(org_data)
-
-    return render_template('azure_devops_dashboard.html', organizations=dashboard_data)
+    return render_template('azure_devops_dashboard.html')
 
 @main_bp.route('/api/runner-groups', methods=['GET'])
 def get_all_runner_groups():
-    config = get_config_from_db()
-    org_name = config.get('ORGANIZATION')
-    if not org_name:
+    return _get_github_runner_groups(0)
+
+@main_bp.route('/api/runner-groups', methods=['POST'])
+def save_monitored_groups():
+    return _save_github_monitored_groups(0)
+
+@main_bp.route('/api/github/<int:config_id>/runner-groups', methods=['GET', 'POST'])
+def handle_github_runner_groups(config_id):
+    """Runner groups of a GitHub organization; config id 0 is the organization in Settings."""
+    if config_id != 0 and db.session.get(GitHubConfig, config_id) is None:
+        return jsonify({"error": "Configuration not found."}), 404
+    if request.method == 'POST':
+        return _save_github_monitored_groups(config_id)
+    return _get_github_runner_groups(config_id)
+
+@main_bp.route('/api/github/<int:config_id>', methods=['DELETE'])
+def delete_github_config(config_id):
+    config = db.get_or_404(GitHubConfig, config_id)
+    db.session.delete(config)
+    db.session.commit()
+    poller.invalidate('github_dashboard')
+    return jsonify({"message": "Configuration deleted."})
+
+def _get_github_runner_groups(org_id):
+    org = next((org for org in _github_organizations() if org['id'] == org_id), None)
+    if org is None:
         return jsonify({"error": "Organization name is missing."}), 400
 
-    url = f"https://api.github.com/orgs/{org_name}/actions/runner-groups"
-    all_groups, error = make_paginated_github_api_call(url)
+    url = get_github_api_url(f"/orgs/{org['name']}/actions/runner-groups")
+    all_groups, error = make_paginated_github_api_call(url, priority=PRIORITY_SETTINGS, token=org['token'])
 
     if error:
         return jsonify({"error": "Unable to fetch groups from GitHub API", "details": error}), 500
@@ -362,23 +450,23 @@ def get_all_runner_groups():
         github_hosted_group = {"id": 0, "name": "GitHub Hosted Runners"}
         all_groups.append(github_hosted_group)
 
-    monitored_ids = {group.id for group in MonitoredGroup.query.all()}
+    monitored_ids = {group.id for group in MonitoredGroup.query.filter_by(org_id=org_id)}
 
     return jsonify({"available_groups": all_groups or [], "monitored_ids": list(monitored_ids)})
 
-@main_bp.route('/api/runner-groups', methods=['POST'])
-def save_monitored_groups():
+def _save_github_monitored_groups(org_id):
     data = request.get_json()
     group_ids = data.get('group_ids', [])
 
     try:
-        MonitoredGroup.query.delete()
+        MonitoredGroup.query.filter_by(org_id=org_id).delete()
 
         for group_id, group_name in group_ids:
-            new_group = MonitoredGroup(id=group_id, name=group_name)
+            new_group = MonitoredGroup(id=group_id, org_id=org_id, name=group_name)
             db.session.add(new_group)
 
         db.session.commit()
+        poller.invalidate('github_dashboard')
         return jsonify({"message": "Data has been saved"}), 200
     except Exception as e:
         db.session.rollback()
@@ -387,148 +475,333 @@ def save_monitored_groups():
 
 @main_bp.route('/api/dashboard-data')
 def get_dashboard_data():
-    config = get_config_from_db()
-    org_name = config.get('ORGANIZATION')
-    monitored_groups_from_db = MonitoredGroup.query.all()
+    return _snapshot_response('github_dashboard')
 
-    if not org_name:
-        return jsonify({"error": "Organization has not been configured", "groups": []}), 400
+@main_bp.route('/api/dashboard-data/stream')
+def stream_dashboard_data():
+    return _snapshot_stream('github_dashboard')
 
-    if not monitored_groups_from_db:
-        return jsonify({"groups": []})
-
-    dashboard_data = []
+def collect_github_dashboard_data():
+    logger = logging.getLogger('gunicorn.error')
+    organizations = _github_organizations()
+    if not organizations:
+        return {"error": "Organization has not been configured", "organizations": [], "groups": []}, 400
 
-    for group in monitored_groups_from_db:
-        raw_runners, error = (None, None)
+    app = current_app._get_current_object()
+    per_org_limit = current_app.config.get('GITHUB_CONCURRENCY_PER_ORG', 4)
+    deadline = current_app.config.get('GITHUB_FETCH_DEADLINE_SECONDS', 30)
 
-        # Because of the GitHub API we must handle 3 types of requests
-        # 1. For normal self-hosted runners: https://docs.github.com/en/rest/actions/self-hosted-runner-groups?apiVersion=2022-11-28#list-self-hosted-runners-in-a-group-for-an-organization
-        # 2. For github-hosted runners assigned to self-hosted runner group: https://docs.github.com/en/rest/actions/self-hosted-runner-groups?apiVersion=2022-11-28#list-github-hosted-runners-in-a-group-for-an-organization
-        # 3. For github-hosted runners assigned to the organization (we create a fake runner group called: GitHub Hosted Runners: id=0): https://docs.github.com/en/rest/actions/hosted-runners?apiVersion=2022-11-28#list-github-hosted-runners-for-an-organization
-        if group.id == 0:
-            url = f"https://api.github.com/orgs/{org_name}/actions/hosted-runners"
-        elif group.name == "Premium Runners":
-            url = f"https://api.github.com/orgs/{org_name}/actions/runner-groups/{group.id}/hosted-runners"
-        else:
-            url = f"https://api.github.com/orgs/{org_name}/actions/runner-groups/{group.id}/runners"
+    previous = poller.get('github_dashboard')
+    previous_orgs = {(org.get('id'), org.get('name')): org
+                     for org in (previous.data.get('organizations') or [] if previous is not None else [])}
 
-        raw_runners, error = make_paginated_github_api_call(url)
+    organizations_data = []
+    groups_by_key = {}
+    jobs = []
+    for org in organizations:
+        org_data = {'id': org['id'], 'name': org['name'], 'groups': []}
+        headers = get_github_api_headers(org['token']) if async_client.enabled and org['token'] != "" else None
+        if org['token'] == "":
+            logger.error(f"The API token of GitHub organization {org['name']} is missing or could not be decrypted")
+            org_data['error'] = 'API token is missing or could not be decrypted'
+        elif org['id'] != 0 and not rate_limiter.poll_due(_github_token_id(org['token']), poller.interval) \
+                and (org['id'], org['name']) in previous_orgs:
+            # The shared cadence follows the Settings token (_github_poll_delay); an organization whose
+            # own budget is drained or blocked keeps its last data until that budget allows a fetch
+            logger.info(f"Skipping GitHub organization {org['name']} until its rate limit budget recovers")
+            organizations_data.append(previous_orgs[(org['id'], org['name'])])
+            continue
+        organizations_data.append(org_data)
 
-        group_runners_list = []
-        if not error and raw_runners is not None:
-            if group.name == "Premium Runners" or group.id == 0:
-                group_runners_list = [
-                    _map_github_hosted_runner(r) for r in raw_runners]
+        for group in org['groups']:
+            # Because of the GitHub API we must handle 3 types of requests
+            # 1. For normal self-hosted runners: https://docs.github.com/en/rest/actions/self-hosted-runner-groups?apiVersion=2022-11-28#list-self-hosted-runners-in-a-group-for-an-organization
+            # 2. For github-hosted runners assigned to self-hosted runner group: https://docs.github.com/en/rest/actions/self-hosted-runner-groups?apiVersion=2022-11-28#list-github-hosted-runners-in-a-group-for-an-organization
+            # 3. For github-hosted runners assigned to the organization (we create a fake runner group called: GitHub Hosted Runners: id=0): https://docs.github.com/en/rest/actions/hosted-runners?apiVersion=2022-11-28#list-github-hosted-runners-for-an-organization
+            if group.id == 0:
+                url = get_github_api_url(f"/orgs/{org['name']}/actions/hosted-runners")
+            elif group.name == "Premium Runners":
+                url = get_github_api_url(f"/orgs/{org['name']}/actions/runner-groups/{group.id}/hosted-runners")
             else:
-                group_runners_list = [
-                    _map_self_hosted_runner(r) for r in raw_runners]
-
-        dashboard_data.append({
-            "group_id": group.id,
-            "group_name": group.name,
-            "runners_data": {
-                "total_count": len(group_runners_list),
-                "runners": group_runners_list
+                url = get_github_api_url(f"/orgs/{org['name']}/actions/runner-groups/{group.id}/runners")
+
+            group_info = {
+                "group_id": group.id,
+                "group_name": group.name,
+                "runners_data": {
+                    "total_count": 0,
+                    "runners": []
+                }
             }
-        })
+            org_data['groups'].append(group_info)
+            if 'error' in org_data:
+                group_info['error'] = org_data['error']
+                continue
+
+            key = (org['id'], group.id)
+            groups_by_key[key] = (org['name'], group, group_info)
+            if async_client.enabled:
+                jobs.append((org['id'], key, partial(_fetch_github_group_runners_async, url, headers)))
+            else:
+                jobs.append((org['id'], key, partial(_fetch_github_group_runners, app, url, org['token'])))
+
+    # Every organization gets its own threads (or semaphore) and token budget, so a slow or failing one only
+    # costs its own groups. On the async path, all groups of the collection are gathered in one coroutine.
+    logger.info(f"Fetching runners of {len(jobs)} GitHub runner groups in {len(organizations)} organizations")
+    if async_client.enabled:
+        results = async_client.run(fan_out_async(jobs, per_org_limit, deadline))
+    else:
+        results = fan_out(jobs, per_org_limit, deadline)
+
+    partial_result = False
+    for key, result in results.items():
+        org_name, group, group_info = groups_by_key[key]
+        raw_runners, error = result.value if result.ok else (None, result.error)
+        if result.status == FANOUT_TIMEOUT:
+            logger.error(f"Runners of group {group.name} in {org_name} did not arrive within {deadline}s")
+            group_info['error'] = 'Timed out fetching runners'
+            partial_result = True
+            continue
+        if error or raw_runners is None:
+            logger.error(f"Failed to get runners of group {group.name} in {org_name}: {error}")
+            group_info['error'] = 'Failed to fetch runners'
+            continue
+
+        if group.name == "Premium Runners" or group.id == 0:
+            group_runners_list = [
+                _map_github_hosted_runner(r) for r in raw_runners]
+        else:
+            group_runners_list = [
+                _map_self_hosted_runner(r) for r in raw_runners]
+        group_info['runners_data'] = {"total_count": len(group_runners_list), "runners": group_runners_list}
+
+    return {"organizations": organizations_data, "partial": partial_result}, 200
 
-    return jsonify({"groups": dashboard_data})
+def _github_organizations():
+    """
+    Monitored GitHub organizations: the one in Settings (id 0), then every
+    GitHubConfig by name, each with its decrypted token and monitored groups.
+    """
+    config = get_config_from_db()
+    groups_by_org = {}
+    for group in MonitoredGroup.query.order_by(MonitoredGroup.org_id, MonitoredGroup.id):
+        groups_by_org.setdefault(group.org_id, []).append(group)
+
+    organizations = []
+    if config.get('ORGANIZATION'):
+        organizations.append({'id': 0, 'name': config['ORGANIZATION'], 'token': None,
+                              'groups': groups_by_org.get(0, [])})
+    for github_config in GitHubConfig.query.order_by(GitHubConfig.organization_name):
+        organizations.append({'id': github_config.id, 'name': github_config.organization_name,
+                              'token': config_cache.decrypt(github_config.api_token),
+                              'groups': groups_by_org.get(github_config.id, [])})
+    return organizations
+
+def _github_token_id(token=None):
+    """Rate limiter id of an organization's token; None is the token in Settings."""
+    if token is None:
+        token = config_cache.secret('API_GITHUB_TOKEN')
+    return rate_limiter.token_id(f"Bearer {token}")
+
+def _github_poll_delay(interval):
+    with poller.app.app_context():
+        token_id = _github_token_id()
+    return webhook_ingestor.reconcile_delay(SOURCE_GITHUB, rate_limiter.poll_delay(interval, [token_id]))
+
+def _fetch_github_group_runners(app, url, token):
+    # Runs on a fan-out thread, which needs an app context (and DB session) of its own.
+    with app.app_context():
+        return make_paginated_github_api_call(url, token=token)
+
+async def _fetch_github_group_runners_async(url, headers):
+    # Runs on the async client's loop with the caller's context, so current_app is the collecting app.
+    if headers is None:
+        return None, "Token is missing in config"
+    cache_duration = current_app.config.get('API_CACHE_SECONDS', 30)
+    validator_ttl = current_app.config.get('GITHUB_ETAG_TTL_SECONDS', 86400)
+    missed = []
+
+    async def fetch():
+        missed.append(True)
+        logging.getLogger('gunicorn.error').info(f"Cache miss, fetching all pages of: {url}")
+        return await _fetch_github_pages_async(url, headers, PRIORITY_DASHBOARD, validator_ttl)
+
+    result = await api_cache.get_or_fetch_async(f"paginated:{url}", fetch, cache_duration)
+    registry.inc('github_api_cache_requests_total', (('result', 'miss' if missed else 'hit'),))
+    return result
 
 @main_bp.route('/health')
 def get_health():
+    max_age = current_app.config.get('HEALTH_MAX_AGE_SECONDS', 60)
+    snapshot = poller.get_fresh('health', max_age)
+    response = _snapshot_response('health')
+    response.headers['Cache-Control'] = f"max-age={max(0, int(max_age - snapshot.age))}"
+    return response
+
+@main_bp.route('/livez')
+def livez():
+    return jsonify({"status": "ok"})
+
+@main_bp.route('/readyz')
+def readyz():
+    snapshots = {}
+    for name in ('github_dashboard', 'ado_dashboard', 'health'):
+        snapshot = poller.get(name)
+        snapshots[name] = round(snapshot.age, 1) if snapshot else None
+    if not poller.is_ready():
+        return jsonify({"status": "starting", "snapshot_age_seconds": snapshots}), 503
+    return jsonify({"status": "ready", "snapshot_age_seconds": snapshots, "collector": poller.is_leader})
+
+def collect_health_status():
     logger = current_app.logger
     logger.info('Performing comprehensive health check')
 
     config = get_config_from_db()
+    check_timeout = current_app.config.get('HEALTH_CHECK_TIMEOUT_SECONDS', 5)
+    deadline = current_app.config.get('HEALTH_DEADLINE_SECONDS', 15)
     health_status = {}
+    org_statuses = {'github_organizations': [], 'azure_devops': []}
+    checks = []
 
-    logger.info("Checking GitHub Actions status...")
     gh_org_name = config.get('ORGANIZATION')
     gh_token = config.get('API_GITHUB_TOKEN')
-
     if gh_token and gh_org_name:
-        try:
-            headers = get_github_api_headers()
-            request_url = f"https://api.github.com/orgs/{gh_org_name}/actions/runner-groups"
-            response = requests.get(request_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            token_expiration_str = response.headers.get('github-authentication-token-expiration')
-            token_expiration_date = datetime.strptime(token_expiration_str, "%Y-%m-%d %H:%M:%S %z")
-            is_token_valid = token_expiration_date > datetime.now(timezone.utc)
-            
-            health_status['github'] = {
-                "status": "ok",
-                "token_is_valid": is_token_valid,
-                "token_scope": response.headers.get('x-accepted-github-permissions'),
-                "token_expiration_date": token_expiration_str
-            }
-        except Exception as e:
-            logger.error(f"GitHub health check failed: {e}")
-            health_status['github'] = {"status": "error", "reason": str(e)}
+        github_url = get_github_api_url(f"/orgs/{gh_org_name}/actions/runner-groups")
+        checks.append(('github', _check_github_health, _check_github_health_async,
+                       (github_url, get_github_api_headers(), check_timeout)))
     else:
         health_status['github'] = {"status": "not_configured"}
 
-    logger.info("Checking Jira & Confluence status...")
+    for github_config in GitHubConfig.query.all():
+        github_url = get_github_api_url(f"/orgs/{github_config.organization_name}/actions/runner-groups")
+        headers = get_github_api_headers(config_cache.decrypt(github_config.api_token))
+        if headers is None:
+            org_statuses['github_organizations'].append({
+                "organization": github_config.organization_name, "status": "error",
+                "reason": "API token is missing or could not be decrypted"})
+            continue
+        checks.append((('github_organizations', github_config.organization_name), _check_github_health,
+                       _check_github_health_async, (github_url, headers, check_timeout)))
+
     jira_base_url = config.get('JIRA_BASE_URL')
     jira_email = config.get('JIRA_EMAIL')
-    jira_token = config.get('JIRA_API_TOKEN')
-
+    jira_token = config_cache.decrypt(config.get('JIRA_API_TOKEN'))
     if all([jira_base_url, jira_email, jira_token]):
-        auth = HTTPBasicAuth(jira_email, jira_token)
-        headers = {'Accept': 'application/json'}
-
-        try:
-            jira_url = f"{jira_base_url.rstrip('/')}/status"
-            response = requests.get(jira_url, headers=headers, auth=auth, timeout=10)
-            response.raise_for_status()
-            if response.json().get('state') == 'RUNNING':
-                health_status['jira'] = {"status": "ok"}
-            else:
-                health_status['jira'] = {"status": "error", "reason": f"State: {response.json().get('state')}"}
-        except Exception as e:
-            logger.error(f"Jira health check failed: {e}")
-            health_status['jira'] = {"status": "error", "reason": "Connection failed"}
-
-        # try:
-        #     confluence_url = f"{jira_base_url.rstrip('/')}/wiki/status"
-        #     response = requests.get(confluence_url, headers=headers, auth=auth, timeout=10)
-        #     response.raise_for_status()
-        #     if response.json().get('state') == 'RUNNING':
-        #         health_status['confluence'] = {"status": "ok"}
-        #     else:
-        #         health_status['confluence'] = {"status": "error", "reason": f"State: {response.json().get('state')}"}
-        # except Exception as e:
-        #     logger.error(f"Confluence health check failed: {e}")
-        #     health_status['confluence'] = {"status": "error", "reason": "Connection failed"}
+        checks.append(('jira', _check_jira_health, _check_jira_health_async,
+                       (jira_base_url, jira_email, jira_token, check_timeout)))
     else:
         health_status['jira'] = {"status": "not_configured"}
-        # health_status['confluence'] = {"status": "not_configured"}
 
-    logger.info("Checking Azure DevOps status...")
     ado_configs = AzureDevOpsConfig.query.all()
-    
-    if ado_configs:
-        ado_statuses = []
-        for ado_config in ado_configs:
-            org_status = {"organization": ado_config.organization_name}
-            try:
-                auth = get_ado_api_auth(ado_config.pat_token)
-                url = f"https://dev.azure.com/{ado_config.organization_name}/_apis/projects?api-version=7.0"
-                response = requests.get(url, auth=auth, timeout=10)
-                response.raise_for_status()
-                org_status["status"] = "ok"
-            except Exception as e:
-                logger.error(f"Azure DevOps health check for {ado_config.organization_name} failed: {e}")
-                org_status["status"] = "error"
-                org_status["reason"] = "Connection failed or invalid token"
-            ado_statuses.append(org_status)
-        health_status['azure_devops'] = ado_statuses
+    for ado_config in ado_configs:
+        ado_url = get_ado_api_url(ado_config.organization_name, "/_apis/projects?api-version=7.0")
+        checks.append((('azure_devops', ado_config.organization_name), _check_ado_health, _check_ado_health_async,
+                       (ado_config.organization_name, ado_url, config_cache.decrypt(ado_config.pat_token), check_timeout)))
+
+    # Every check runs in its own group, so all of them are in flight at once.
+    logger.info(f"Running {len(checks)} health checks in parallel")
+    if async_client.enabled:
+        jobs = [(key, key, partial(check_async, *args)) for key, _, check_async, args in checks]
+        results = async_client.run(fan_out_async(jobs, per_group_limit=1, timeout=deadline))
     else:
-        health_status['azure_devops'] = []
+        jobs = [(key, key, partial(check, *args)) for key, check, _, args in checks]
+        results = fan_out(jobs, per_group_limit=1, timeout=deadline)
+
+    for key, result in results.items():
+        if result.ok:
+            check_status = result.value
+        elif result.status == FANOUT_TIMEOUT:
+            logger.error(f"Health check {key} did not finish within {deadline}s")
+            check_status = {"status": "timeout", "reason": f"No answer within {deadline}s"}
+        else:
+            logger.error(f"Health check {key} failed: {result.error}")
+            check_status = {"status": "error", "reason": str(result.error)}
+        elapsed = result.elapsed if result.elapsed is not None else deadline
+        check_status["latency_ms"] = round(elapsed * 1000, 1)
+
+        if isinstance(key, tuple):
+            org_statuses[key[0]].append(dict({"organization": key[1]}, **check_status))
+        else:
+            health_status[key] = check_status
+
+    health_status['github_rate_limit'] = rate_limiter.state()
+    for key, statuses in org_statuses.items():
+        health_status[key] = sorted(statuses, key=lambda org_status: org_status['organization'])
+    return health_status, 200
+
+def _check_github_health(url, headers, timeout):
+    token_id = rate_limiter.token_id(headers.get('Authorization'))
+    rate_limiter.acquire(token_id, PRIORITY_HEALTH)
+    response = http_client.get(url, headers=headers, timeout=timeout)
+    rate_limiter.observe(token_id, response)
+    response.raise_for_status()
+    return _github_health_from_response(response)
+
+async def _check_github_health_async(url, headers, timeout):
+    token_id = rate_limiter.token_id(headers.get('Authorization'))
+    await asyncio.sleep(rate_limiter.reserve(token_id, PRIORITY_HEALTH))
+    response = await async_client.get(url, headers=headers, timeout=timeout)
+    rate_limiter.observe(token_id, response)
+    response.raise_for_status()
+    return _github_health_from_response(response)
+
+def _github_health_from_response(response):
+    token_expiration_str = response.headers.get('github-authentication-token-expiration')
+    token_expiration_date = datetime.strptime(token_expiration_str, "%Y-%m-%d %H:%M:%S %z")
+    is_token_valid = token_expiration_date > datetime.now(timezone.utc)
+
+    return {
+        "status": "ok",
+        "token_is_valid": is_token_valid,
+        "token_scope": response.headers.get('x-accepted-github-permissions'),
+        "token_expiration_date": token_expiration_str
+    }
+
+def _check_jira_health(base_url, email, token, timeout):
+    auth = HTTPBasicAuth(email, token)
+    headers = {'Accept': 'application/json'}
+    jira_url = f"{base_url.rstrip('/')}/status"
+    try:
+        response = http_client.get(jira_url, headers=headers, auth=auth, timeout=timeout)
+        response.raise_for_status()
+        state = response.json().get('state')
+    except Exception as e:
+        logging.getLogger('gunicorn.error').error(f"Jira health check failed: {e}")
+        return {"status": "error", "reason": "Connection failed"}
+    return _jira_health_from_state(state)
+
+async def _check_jira_health_async(base_url, email, token, timeout):
+    headers = {'Accept': 'application/json'}
+    jira_url = f"{base_url.rstrip('/')}/status"
+    try:
+        state = (await async_client.get_json(jira_url, auth=(email, token), timeout=timeout, headers=headers)).get('state')
+    except Exception as e:
+        logging.getLogger('gunicorn.error').error(f"Jira health check failed: {e}")
+        return {"status": "error", "reason": "Connection failed"}
+    return _jira_health_from_state(state)
+
+def _jira_health_from_state(state):
+    if state == 'RUNNING':
+        return {"status": "ok"}
+    return {"status": "error", "reason": f"State: {state}"}
 
-    return jsonify(health_status)
+def _check_ado_health(org_name, url, pat_token, timeout):
+    try:
+        response = http_client.get(url, auth=get_ado_api_auth(pat_token), timeout=timeout)
+        response.raise_for_status()
+    except Exception as e:
+        logging.getLogger('gunicorn.error').error(f"Azure DevOps health check for {org_name} failed: {e}")
+        return {"status": "error", "reason": "Connection failed or invalid token"}
+    return {"status": "ok"}
+
+async def _check_ado_health_async(org_name, url, pat_token, timeout):
+    try:
+        response = await async_client.get(url, auth=get_ado_api_auth(pat_token), timeout=timeout)
+        response.raise_for_status()
+    except Exception as e:
+        logging.getLogger('gunicorn.error').error(f"Azure DevOps health check for {org_name} failed: {e}")
+        return {"status": "error", "reason": "Connection failed or invalid token"}
+    return {"status": "ok"}
 
 @main_bp.route('/version')
 def get_version():
@@ -540,11 +813,219 @@ def get_version():
 
 @main_bp.route('/healthcheck')
 def healthcheck_page():
-    with current_app.test_client() as client:
-        response = client.get('/health')
-        health_json = response.get_json()
-        pretty_json = json.dumps(health_json, indent=4)
-        return render_template('healthcheck.html', health_data=pretty_json)
+    snapshot = poller.get_fresh('health', current_app.config.get('HEALTH_MAX_AGE_SECONDS', 60))
+    pretty_json = json.dumps(snapshot.data, indent=4)
+    return render_template('healthcheck.html', health_data=pretty_json, checked_seconds_ago=int(snapshot.age))
+
+@main_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint; reads precomputed state and never calls upstream APIs."""
+    return current_app.response_class(metrics_exporter.render(), mimetype=None,
+                                      headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+@main_bp.route('/api/runners')
+def query_runners():
+    """
+    One page of the GitHub runners (`source=github`) or ADO agents (`source=ado`)
+    of the latest snapshot, with the online/offline/busy counts per runner group
+    or pool. Filters: `org` (name), `group` (id or `<org id>:<group id>`) and
+    `status` (all repeatable), `busy`, `enabled`, and `q` (name prefix).
+    `sort` is name, group, status or busy, `-` first for descending; pass
+    `next_cursor` back as `cursor` for the next page. `limit=0` returns only the counts.
+    """
+    source = request.args.get('source', 'github')
+    if source not in RUNNER_SOURCES:
+        return jsonify({"error": f"Unknown source: {source}"}), 400
+    try:
+        groups = {_parse_group_filter(value) for value in request.args.getlist('group')}
+        limit = min(max(request.args.get('limit', runner_stores.page_size, type=int), 0), runner_stores.max_page_size)
+        sort = request.args.get('sort', 'name')
+        snapshot, store = runner_stores.get(source)
+        if store is None:
+            return current_app.response_class(snapshot.body, status=snapshot.status_code, mimetype='application/json')
+        result = store.query(
+            orgs=request.args.getlist('org'),
+            groups=groups,
+            statuses=set(request.args.getlist('status')),
+            busy=_parse_bool_arg('busy'),
+            enabled=_parse_bool_arg('enabled'),
+            prefix=request.args.get('q'),
+            sort=sort.lstrip('-'),
+            descending=sort.startswith('-'),
+            limit=limit,
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = jsonify(dict(result, snapshot=snapshot.meta()))
+    response.headers['Age'] = str(int(snapshot.age))
+    return response
+
+def _parse_group_filter(value):
+    org_id, _, group_id = value.rpartition(':')
+    try:
+        return (int(org_id), int(group_id)) if org_id else int(group_id)
+    except ValueError:
+        raise ValueError(f"Invalid group: {value}")
+
+def _parse_bool_arg(name):
+    value = request.args.get(name)
+    return None if value is None else value.lower() in ['true', '1', 't']
+
+@main_bp.route('/api/webhooks/github', methods=['POST'])
+def github_webhook():
+    """
+    GitHub organization webhook (`workflow_job` events), signed with
+    GITHUB_WEBHOOK_SECRET. Only verifies and queues; see app/webhooks.py.
+    """
+    secret = current_app.config.get('GITHUB_WEBHOOK_SECRET')
+    if not secret:
+        return jsonify({"error": "GitHub webhooks are not configured"}), 404
+    body = request.get_data()
+    if not github_signature_valid(secret, body, request.headers.get('X-Hub-Signature-256')):
+        return jsonify({"error": "Invalid signature"}), 401
+    event = request.headers.get('X-GitHub-Event', '')
+    if event == 'ping':
+        return jsonify({"message": "pong"})
+    return _queue_webhook(SOURCE_GITHUB, request.headers.get('X-GitHub-Delivery'), event, body)
+
+@main_bp.route('/api/webhooks/azure-devops', methods=['POST'])
+def ado_webhook():
+    """
+    Azure DevOps service hook for agent job request events. ADO cannot sign
+    its requests, so ADO_WEBHOOK_SECRET is expected as the basic auth password
+    or in an X-Webhook-Secret header configured on the subscription.
+    """
+    secret = current_app.config.get('ADO_WEBHOOK_SECRET')
+    if not secret:
+        return jsonify({"error": "Azure DevOps webhooks are not configured"}), 404
+    candidate = request.authorization.password if request.authorization else request.headers.get('X-Webhook-Secret')
+    if not secret_valid(secret, candidate):
+        return jsonify({"error": "Invalid secret"}), 401
+    body = request.get_data()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Invalid JSON"}), 400
+    delivery_id = payload.get('id') or payload.get('notificationId')
+    return _queue_webhook(SOURCE_ADO, delivery_id, payload.get('eventType') or '', body)
+
+def _queue_webhook(source, delivery_id, event, body):
+    if not webhook_ingestor.submit(source, delivery_id, event, body.decode('utf-8', 'replace')):
+        response = jsonify({"error": "Too many queued events"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({"queued": True}), 202
+
+@main_bp.route('/api/profile', methods=['GET', 'DELETE'])
+@login_required
+def get_profile():
+    """
+    Sampling profiler results of this worker (PROFILER_ENABLED=true); DELETE
+    starts a new recording. `?format=collapsed` returns flamegraph input.
+    """
+    if not profiler.enabled:
+        return jsonify({"error": "Profiler is disabled, set PROFILER_ENABLED=true"}), 404
+    if request.method == 'DELETE':
+        profiler.reset()
+        return jsonify({"message": "Profile reset."})
+    report = profiler.report(limit=request.args.get('limit', 30, type=int))
+    if request.args.get('format') == 'collapsed':
+        return current_app.response_class(report['collapsed'], mimetype='text/plain')
+    return jsonify(report)
+
+@main_bp.route('/api/upstream-stats')
+def get_upstream_stats():
+    return jsonify({
+        "http": http_client.stats(),
+        "github_conditional": counters.snapshot('github_'),
+        "github_rate_limit": rate_limiter.state(),
+        "async_http": async_client.stats(),
+    })
+
+@main_bp.route('/api/history')
+def get_status_history():
+    """
+    Runner/agent counts over time for one runner group (`source=github`) or
+    agent pool (`source=ado`, with `org_id` = the ADO organization config id).
+    `from`/`to` are epoch seconds or ISO 8601 timestamps (default: the last
+    24h); `step` is seconds or 1m/1h/1d-style (default: picked from the range).
+    """
+    source = request.args.get('source', SOURCE_GITHUB)
+    if source not in (SOURCE_GITHUB, SOURCE_ADO):
+        return jsonify({"error": f"Unknown source: {source}"}), 400
+    group_id = request.args.get('group_id', type=int)
+    if group_id is None:
+        return jsonify({"error": "group_id is required"}), 400
+    try:
+        end = _parse_history_time(request.args.get('to'), default=time.time())
+        start = _parse_history_time(request.args.get('from'), default=end - 86400)
+        step = _parse_history_step(request.args.get('step'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if start >= end:
+        return jsonify({"error": "'from' must be before 'to'"}), 400
+
+    org_id = request.args.get('org_id', 0, type=int)
+    return jsonify(status_history.query(source, group_id, start, end, step=step, org_id=org_id))
+
+def _parse_history_time(value, default):
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _parse_history_step(value):
+    if not value:
+        return None
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    try:
+        if value[-1] in units:
+            return int(value[:-1]) * units[value[-1]]
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid step: {value}")
+
+@main_bp.route('/api/events')
+def get_runner_events():
+    """
+    State transitions of runners/agents, newest first. Filters: `source`,
+    `runner_id`, `group_id`, `org_id`, `state` (matches either side of the
+    transition), `from`/`to` like /api/history. Pages are `limit` events long
+    (max 500); pass the returned `next_cursor` as `cursor` for the next one.
+    """
+    source = request.args.get('source')
+    if source is not None and source not in (SOURCE_GITHUB, SOURCE_ADO):
+        return jsonify({"error": f"Unknown source: {source}"}), 400
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+    try:
+        end = _parse_history_time(request.args.get('to'), default=None)
+        start = _parse_history_time(request.args.get('from'), default=None)
+        events, next_cursor = runner_event_log.query(
+            source=source,
+            runner_id=request.args.get('runner_id', type=int),
+            group_id=request.args.get('group_id', type=int),
+            org_id=request.args.get('org_id', type=int),
+            state=request.args.get('state'),
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"events": [event.to_dict() for event in events], "next_cursor": next_cursor})
 
 @main_bp.route('/changelog')
 def changelog():
@@ -552,7 +1033,196 @@ def changelog():
 
 @main_bp.route('/runners-queues')
 def runner_queues():
-    return render_template('runners-queues.html')
+    windows = _analytics_windows()
+    window = request.args.get('window', windows[1] if len(windows) > 1 else windows[0])
+    try:
+        report = _analytics_report(window)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        window = windows[0]
+        report = _analytics_report(window)
+    return render_template('runners-queues.html', report=report, windows=windows, window=window)
+
+@main_bp.route('/api/analytics')
+def get_analytics():
+    """
+    Busy ratio, saturation and time-to-idle percentiles per runner group and
+    agent pool over the trailing `window` (seconds or 1h/7d-style, default 7d).
+    """
+    try:
+        return jsonify(_analytics_report(request.args.get('window', '7d')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def _analytics_windows():
+    return [window.strip() for window in current_app.config.get('ANALYTICS_WINDOWS', '1d,7d,30d,90d').split(',')
+            if window.strip()]
+
+def _analytics_report(window):
+    seconds = _parse_history_step(window)
+    if not seconds or seconds <= 0:
+        raise ValueError(f"Invalid window: {window}")
+    app = current_app._get_current_object()
+
+    def fetch():
+        # May run on a background revalidation thread, hence its own app context.
+        with app.app_context():
+            end = time.time()
+            return {
+                'window': window,
+                'seconds': seconds,
+                'sources': [runner_analytics.report(source, end - seconds, end) for source in (SOURCE_GITHUB, SOURCE_ADO)],
+            }, None
+
+    report, _ = api_cache.get_or_fetch(f"analytics:{seconds}", fetch, app.config.get('ANALYTICS_CACHE_SECONDS', 60))
+    return report
+
+def _snapshot_response(name):
+    """
+    Serves the latest snapshot. With `?since=<version>` only the runners/agents
+    changed since that version are returned (`"delta": true`), or the full
+    payload when the cursor is too old to compute a delta. `?org=<name>`
+    (repeatable) keeps only those organizations.
+    """
+    snapshot = poller.get_or_collect(name)
+    since = request.args.get('since', type=int)
+    body = poller.delta_body(name, since) if since is not None else None
+    org_names = request.args.getlist('org')
+    if org_names:
+        body = _organizations_body(snapshot, body, org_names)
+    if body is not None:
+        response = current_app.response_class(body, status=200, mimetype='application/json')
+    else:
+        response = current_app.response_class(_full_body(name, snapshot), status=snapshot.status_code,
+                                              mimetype='application/json')
+    response.headers['Age'] = str(int(snapshot.age))
+    trace = tracing.current()
+    if trace is not None:
+        trace.annotate(snapshot.timings, prefix='collect-')
+    return response
+
+def _organizations_body(snapshot, delta_body, org_names):
+    """The delta, or else the full snapshot payload, restricted to the named organizations."""
+    if 'organizations' not in snapshot.data:
+        return delta_body
+    selected = {org['id'] for org in snapshot.data['organizations'] if org['name'] in org_names}
+    if delta_body is not None:
+        delta = json.loads(delta_body)
+        for change in ('added', 'removed', 'changed'):
+            # Item keys start with the organization id
+            delta[change] = [entry for entry in delta[change] if entry['key'][0] in selected]
+        return json.dumps(delta)
+    if snapshot.status_code != 200:
+        return None
+    organizations = [org for org in snapshot.data['organizations'] if org['id'] in selected]
+    data = dict(snapshot.data, organizations=organizations)
+    if snapshot.name == 'github_dashboard':
+        data = _with_settings_org_groups(data)
+    return json.dumps(dict(data, snapshot=snapshot.meta(include_age=False)))
+
+def _full_body(name, snapshot):
+    """The snapshot body, for GitHub with the top-level `groups` of API clients older than `organizations`."""
+    if name != 'github_dashboard' or snapshot.status_code != 200:
+        return snapshot.body
+    body = snapshot.views.get('groups')
+    if body is None:
+        body = snapshot.views['groups'] = json.dumps(dict(_with_settings_org_groups(snapshot.data),
+                                                          snapshot=snapshot.meta(include_age=False)))
+    return body
+
+def _with_settings_org_groups(data):
+    """
+    Adds the runner groups of the organization in Settings (id 0) as top-level
+    `groups`, the GitHub payload from before several organizations were
+    monitored. It is left out of the snapshot itself, so deltas stay per item.
+    """
+    settings_org = next((org for org in data.get('organizations') or [] if org.get('id') == 0), None)
+    return dict(data, groups=settings_org['groups'] if settings_org is not None else [])
+
+def _snapshot_stream(name):
+    """
+    Server-Sent Events of runner/agent changes for a dashboard snapshot, served
+    as a time-bounded long-poll: a request answers with the next change, or with
+    keep-alives only, and ends after at most SSE_LONG_POLL_SECONDS, so an idle
+    viewer holds a worker thread only part of the time. EventSource reconnects
+    after SSE_RETRY_SECONDS and sends the version it last saw as Last-Event-ID;
+    a change made in between is answered at once. Clients apply `delta` events
+    whose `since` matches the version they hold; `resync` means reload the full
+    payload.
+    """
+    keepalive = current_app.config.get('SSE_KEEPALIVE_SECONDS', 15)
+    retry = current_app.config.get('SSE_RETRY_SECONDS', 10)
+    deadline = time.monotonic() + current_app.config.get('SSE_LONG_POLL_SECONDS', 20)
+    subscription = broadcaster.subscribe(name)
+    snapshot = poller.get(name)
+    version = snapshot.version if snapshot is not None else None
+    last_seen = request.headers.get('Last-Event-ID', type=int)
+
+    def changes_since(since):
+        # Queued events are coalesced into one change from `since` to the latest snapshot
+        latest = poller.get(name)
+        body = poller.delta_body(name, since) if since is not None else None
+        if body is None:
+            return f"event: {EVENT_RESYNC}\nid: {latest.version}\ndata: {json.dumps({'version': latest.version})}\n\n"
+        return f"event: {EVENT_DELTA}\nid: {latest.version}\ndata: {body}\n\n"
+
+    def events():
+        try:
+            yield f"retry: {int(retry * 1000)}\n" + (f"id: {version}\n\n" if version is not None else "\n")
+            if last_seen is not None and version is not None and last_seen != version:
+                yield changes_since(last_seen)
+                return
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if subscription.get(timeout=min(keepalive, remaining)) is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield changes_since(version)
+                    return
+        finally:
+            subscription.close()
+
+    response = current_app.response_class(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _publish_snapshot_changes(name, previous, snapshot):
+    if not broadcaster.subscriber_count(name):
+        return
+    if previous is not None and previous.version == snapshot.version:
+        return
+    body = poller.delta_body(name, previous.version) if previous is not None else None
+    if body is None:
+        broadcaster.publish(name, EVENT_RESYNC, json.dumps({'version': snapshot.version}))
+    else:
+        broadcaster.publish(name, EVENT_DELTA, body)
+
+def _record_status_history(name, previous, snapshot):
+    # Only collections are sampled: webhook patches keep the generated_at of the collection they patch
+    if snapshot.status_code != 200 or (previous is not None and previous.generated_at == snapshot.generated_at):
+        return
+    if name == 'github_dashboard':
+        status_history.record(SOURCE_GITHUB, github_group_counts(snapshot.data), at=snapshot.generated_at)
+    elif name == 'ado_dashboard':
+        status_history.record(SOURCE_ADO, ado_pool_counts(snapshot.data), at=snapshot.generated_at)
+
+def _record_runner_events(name, previous, snapshot):
+    if previous is None or previous.status_code != 200 or snapshot.status_code != 200:
+        return
+    if previous.version == snapshot.version:
+        return
+    if name == 'github_dashboard':
+        source, spec = SOURCE_GITHUB, runner_diff.GITHUB_RUNNERS
+    elif name == 'ado_dashboard':
+        source, spec = SOURCE_ADO, runner_diff.ADO_AGENTS
+    else:
+        return
+    occurred_at = snapshot.patched_at or snapshot.generated_at
+    written = runner_event_log.record(source, runner_transitions(previous.data, snapshot.data, spec, occurred_at))
+    runner_analytics.record_time_to_idle(source, written)
 
 def update_or_create_setting(key, value):
     setting = Setting.query.filter_by(key=key).first()
@@ -569,68 +1239,87 @@ def update_or_create_setting(key, value):
         db.session.add(setting)
     # db.session.commit()
 
+@tracing.traced('config')
 def get_config_from_db():
-    settings = Setting.query.all()
-    return {setting.key: setting.value for setting in settings}
-
-def get_github_api_headers():
-    config = get_config_from_db()
-    encrypted_token = config.get('API_GITHUB_TOKEN')
-    if not encrypted_token:
+    return config_cache.get()
+
+def get_github_api_headers(token=None):
+    """
+    Request headers for the organization in Settings, or with `token` for another
+    organization. An empty `token` (e.g. one that failed to decrypt) never falls
+    back to the Settings token.
+    """
+    if token is None:
+        token = config_cache.secret('API_GITHUB_TOKEN')
+    if not token:
         current_app.logger.error("GitHub API Token not found in DB")
         return None
-    token = decrypt_data(encrypted_token)
     return {
         "Accept": "application/vnd.github+json",
         "Authorization": f"Bearer {token}",
         "X-GitHub-Api-Version": "2022-11-28"
     }
 
-def make_paginated_github_api_call(url):
-    logger = current_app.logger
+def make_paginated_github_api_call(url, priority=PRIORITY_DASHBOARD, token=None):
     cache_duration = current_app.config.get('API_CACHE_SECONDS', 30)
     cache_key = f"paginated:{url}"
-    current_time = time.time()
+    app = current_app._get_current_object()
+
+    caller = threading.get_ident()
+    missed = []
+
+    def fetch():
+        if threading.get_ident() == caller:
+            missed.append(True)
+        # May run on a background revalidation thread, hence its own app context.
+        with app.app_context():
+            return _fetch_github_pages(url, priority, token)
 
-    if cache_key in api_cache and (current_time - api_cache[cache_key]['timestamp']) < cache_duration:
-        logger.info(f"Returning data from cache for: {url}")
-        return api_cache[cache_key]['data'], None
+    result = api_cache.get_or_fetch(cache_key, fetch, cache_duration)
+    registry.inc('github_api_cache_requests_total', (('result', 'miss' if missed else 'hit'),))
+    return result
 
-    headers = get_github_api_headers()
+def _fetch_github_pages(url, priority=PRIORITY_DASHBOARD, token=None):
+    logger = current_app.logger
+    logger.info(f"Cache miss, fetching all pages of: {url}")
+    headers = get_github_api_headers(token)
     if headers is None:
         return None, "Token is missing in config"
 
+    validator_ttl = current_app.config.get('GITHUB_ETAG_TTL_SECONDS', 86400)
+    if async_client.enabled:
+        return async_client.run(_fetch_github_pages_async(url, headers, priority, validator_ttl))
+
     all_results = []
     next_url = f"{url}?per_page=100"
 
     while next_url:
         try:
             logger.info(f"Iterating over page: {next_url}")
-            response = requests.get(next_url, headers=headers)
-            response.raise_for_status()
-            json_response = response.json()
+            items_on_page, next_url = _get_github_page(next_url, headers, priority, validator_ttl)
+            all_results.extend(items_on_page)
+        except requests.exceptions.HTTPError as http_err:
+            error_message = f"HTTP ERROR: {http_err}"
+            logger.error(error_message)
+            return None, error_message
+        except Exception as e:
+            error_message = f"Unexpected error occured: {e}"
+            logger.error(error_message)
+            return None, error_message
 
-            items_on_page = []
-            if isinstance(json_response, list):
-                items_on_page = json_response
-            elif isinstance(json_response, dict) and 'runners' in json_response:
-                items_on_page = json_response['runners']
-            elif isinstance(json_response, dict) and 'runner_groups' in json_response:
-                items_on_page = json_response['runner_groups']
+    return all_results, None
 
-            all_results.extend(items_on_page)
+async def _fetch_github_pages_async(url, headers, priority, validator_ttl):
+    logger = logging.getLogger('gunicorn.error')
+    all_results = []
+    next_url = f"{url}?per_page=100"
 
-            if 'Link' in response.headers:
-                links = requests.utils.parse_header_links(
-                    response.headers['Link'])
-                next_url = None
-                for link in links:
-                    if link.get('rel') == 'next':
-                        next_url = link['url']
-                        break
-            else:
-                next_url = None
-        except requests.exceptions.HTTPError as http_err:
+    while next_url:
+        try:
+            logger.info(f"Iterating over page: {next_url}")
+            items_on_page, next_url = await _get_github_page_async(next_url, headers, priority, validator_ttl)
+            all_results.extend(items_on_page)
+        except httpx.HTTPStatusError as http_err:
             error_message = f"HTTP ERROR: {http_err}"
             logger.error(error_message)
             return None, error_message
@@ -639,9 +1328,80 @@ def make_paginated_github_api_call(url):
             logger.error(error_message)
             return None, error_message
 
-    api_cache[cache_key] = {'data': all_results, 'timestamp': current_time}
     return all_results, None
 
+def _get_github_page(page_url, headers, priority=PRIORITY_DASHBOARD, validator_ttl=86400):
+    """
+    Fetches one page, revalidating it with the stored ETag/Last-Modified. GitHub answers
+    304 for unchanged pages, which costs no primary rate limit and reuses the parsed body.
+    """
+    request_headers, cached_page = _github_conditional_headers(page_url, headers)
+    token_id = rate_limiter.token_id(headers.get('Authorization'))
+    rate_limiter.acquire(token_id, priority)
+    response = http_client.get(page_url, headers=request_headers)
+    rate_limiter.observe(token_id, response)
+    return _github_page_from_response(page_url, response, cached_page, validator_ttl)
+
+async def _get_github_page_async(page_url, headers, priority=PRIORITY_DASHBOARD, validator_ttl=86400):
+    request_headers, cached_page = _github_conditional_headers(page_url, headers)
+    token_id = rate_limiter.token_id(headers.get('Authorization'))
+    await asyncio.sleep(rate_limiter.reserve(token_id, priority))
+    response = await async_client.get(page_url, headers=request_headers)
+    rate_limiter.observe(token_id, response)
+    return _github_page_from_response(page_url, response, cached_page, validator_ttl)
+
+def _github_conditional_headers(page_url, headers):
+    cached_page = api_cache.get(f"page:{page_url}")
+    request_headers = dict(headers)
+    if cached_page:
+        if cached_page.get('etag'):
+            request_headers['If-None-Match'] = cached_page['etag']
+        if cached_page.get('last_modified'):
+            request_headers['If-Modified-Since'] = cached_page['last_modified']
+        counters.inc('github_conditional_requests')
+    return request_headers, cached_page
+
+def _github_page_from_response(page_url, response, cached_page, validator_ttl):
+    """Parses a page from a requests or httpx response and stores its validators for the next revalidation."""
+    if response.status_code == 304 and cached_page:
+        counters.inc('github_not_modified')
+        counters.inc('github_bytes_saved', cached_page.get('bytes', 0))
+        counters.inc('github_rate_limit_units_saved')
+        return cached_page['items'], cached_page['next_url']
+
+    response.raise_for_status()
+    json_response = response.json()
+
+    items_on_page = []
+    if isinstance(json_response, list):
+        items_on_page = json_response
+    elif isinstance(json_response, dict) and 'runners' in json_response:
+        items_on_page = json_response['runners']
+    elif isinstance(json_response, dict) and 'runner_groups' in json_response:
+        items_on_page = json_response['runner_groups']
+
+    next_url = None
+    if 'Link' in response.headers:
+        links = requests.utils.parse_header_links(
+            response.headers['Link'])
+        for link in links:
+            if link.get('rel') == 'next':
+                next_url = link['url']
+                break
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        api_cache.set(f"page:{page_url}", {
+            'etag': etag,
+            'last_modified': last_modified,
+            'items': items_on_page,
+            'next_url': next_url,
+            'bytes': len(response.content),
+        }, validator_ttl)
+
+    return items_on_page, next_url
+
 def _map_self_hosted_runner(api_runner):
     return {"id": api_runner.get("id"), "name": api_runner.get("name"), "status": api_runner.get("status"), "busy": api_runner.get("busy"), "type": "self-hosted"}
 
@@ -651,13 +1411,227 @@ def _map_github_hosted_runner(api_runner):
     is_busy = not is_online
     return {"id": api_runner.get("id"), "name": api_runner.get("name"), "status": "online" if is_online else "offline", "busy": is_busy, "type": "github-hosted"}
 
+def _apply_github_webhook(data, event):
+    """
+    Marks the runner of a `workflow_job` busy when the job starts on it and
+    idle when it completes. A runner the snapshot does not know yet (e.g. a
+    new ephemeral one) is added when its group is monitored.
+    """
+    payload = event.payload
+    job = payload.get('workflow_job') or {}
+    if event.event != 'workflow_job' or payload.get('action') not in ('in_progress', 'completed') or not job.get('runner_id'):
+        return False
+    busy = payload['action'] == 'in_progress'
+    org_name = ((payload.get('organization') or {}).get('login') or '').lower()
+    for org in data.get('organizations', []):
+        if org['name'].lower() != org_name:
+            continue
+        for group in org['groups']:
+            if group['group_id'] != job.get('runner_group_id') or group.get('error'):
+                continue
+            runners = group['runners_data']['runners']
+            runner = next((r for r in runners if r.get('id') == job['runner_id']), None)
+            if runner is None:
+                if not busy:
+                    return False
+                hosted = group['group_name'] == "Premium Runners" or group['group_id'] == 0
+                runners.append({"id": job['runner_id'], "name": job.get('runner_name'), "status": "online", "busy": True,
+                                "type": "github-hosted" if hosted else "self-hosted"})
+                group['runners_data']['total_count'] = len(runners)
+                return True
+            if runner.get('busy') == busy and runner.get('status') == 'online':
+                return False
+            runner.update(busy=busy, status='online')
+            return True
+    return False
+
+def _github_webhook_order(event):
+    job = event.payload.get('workflow_job') or {}
+    timestamp = _webhook_time(job.get('completed_at') if event.payload.get('action') == 'completed' else job.get('started_at'))
+    if not job.get('runner_id') or timestamp is None:
+        return None
+    return ((event.payload.get('organization') or {}).get('login'), job['runner_id']), timestamp
+
+def _apply_ado_webhook(data, event):
+    """
+    Applies an agent job request (the resource of the job request service hook
+    events, or its `request`) to the agent it is reserved for: busy with the
+    request while it runs, idle with it as the last completed one when it ends.
+    """
+    resource = event.payload.get('resource') or {}
+    job_request = resource.get('request') or resource
+    agent_data = resource.get('agent') or job_request.get('reservedAgent') or {}
+    pool_id = job_request.get('poolId') or resource.get('poolId') or (agent_data.get('pool') or {}).get('id')
+    if not agent_data.get('id') or not pool_id or 'requestId' not in job_request:
+        return False
+    org_name = _ado_webhook_organization(event.payload)
+    finished = job_request.get('finishTime') is not None or job_request.get('result') is not None
+    for org in data.get('organizations', []):
+        if org_name is not None and org['name'].lower() != org_name:
+            continue
+        for pool in org['pools']:
+            if pool['id'] != pool_id or pool.get('error'):
+                continue
+            agent = next((a for a in pool['agents_data']['agents'] if a.get('id') == agent_data['id']), None)
+            if agent is None:
+                continue
+            fields = _ado_request_fields(
+                {'lastCompletedRequest': job_request} if finished else {'assignedRequest': job_request})
+            if finished:
+                if agent.get('assigned_request') and agent['assigned_request'].get('id') != fields['last_completed_request']['id']:
+                    # Another job already started on it
+                    fields.pop('busy')
+                    fields.pop('assigned_request')
+            else:
+                fields.pop('last_completed_request')
+            fields['status'] = agent_data.get('status') or agent.get('status')
+            if all(agent.get(key) == value for key, value in fields.items()):
+                return False
+            agent.update(fields)
+            return True
+    return False
+
+def _ado_webhook_order(event):
+    resource = event.payload.get('resource') or {}
+    job_request = resource.get('request') or resource
+    agent_data = resource.get('agent') or job_request.get('reservedAgent') or {}
+    timestamp = _webhook_time(job_request.get('finishTime') or job_request.get('assignTime'))
+    if not agent_data.get('id') or timestamp is None:
+        return None
+    return (_ado_webhook_organization(event.payload), agent_data['id']), timestamp
+
+def _ado_webhook_organization(payload):
+    """Organization name from the service hook's account URL, https://dev.azure.com/<org>/ or https://<org>.visualstudio.com/."""
+    containers = payload.get('resourceContainers') or {}
+    base_url = (containers.get('account') or containers.get('collection') or {}).get('baseUrl')
+    if not base_url:
+        return None
+    parts = urlsplit(base_url)
+    if parts.hostname and parts.hostname.endswith('.visualstudio.com'):
+        return parts.hostname.split('.')[0].lower()
+    path = parts.path.strip('/')
+    return path.split('/')[0].lower() if path else None
+
+def _webhook_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def _get_upstream_json(url, auth, timeout=None):
+    response = http_client.get(url, auth=auth, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
 def get_ado_api_auth(pat_token):
     return HTTPBasicAuth('', pat_token)
 
+def get_github_api_url(path):
+    return current_app.config.get('GITHUB_API_URL', 'https://api.github.com').rstrip('/') + path
+
+def get_ado_api_url(org_name, path):
+    base_url = current_app.config.get('ADO_API_URL', 'https://dev.azure.com').rstrip('/')
+    return f"{base_url}/{org_name}{path}"
+
+def _get_ado_agent_pages(url, auth, timeout=None):
+    """A pool's agent listing with every page, following the continuation token ADO returns in a header."""
+    agents = []
+    page_url = url
+    while True:
+        response = http_client.get(page_url, auth=auth, timeout=timeout)
+        response.raise_for_status()
+        agents.extend(response.json().get('value', []))
+        page_url = _next_ado_page_url(url, page_url, response.headers)
+        if page_url is None:
+            return {'value': agents}
+
+async def _get_ado_agent_pages_async(url, auth, timeout=None):
+    agents = []
+    page_url = url
+    while True:
+        response = await async_client.get(page_url, auth=auth, timeout=timeout)
+        response.raise_for_status()
+        agents.extend(response.json().get('value', []))
+        page_url = _next_ado_page_url(url, page_url, response.headers)
+        if page_url is None:
+            return {'value': agents}
+
+def _next_ado_page_url(url, page_url, headers):
+    token = headers.get('x-ms-continuationtoken')
+    if not token:
+        return None
+    next_url = f"{url}&continuationToken={quote(token, safe='')}"
+    # A server repeating its token would otherwise be paged forever
+    return next_url if next_url != page_url else None
+
+def _fetch_upstream_json_all(upstream_requests, per_group_limit, timeout, flight=None, fetch=None, fetch_async=None):
+    """
+    Fetches (group, key, url, auth, request_timeout) JSON requests in parallel and
+    returns fan_out() results. With ASYNC_UPSTREAM_ENABLED the requests run as
+    coroutines on the shared event loop instead of one thread per request; on
+    the threaded path, `flight` coalesces identical URLs fetched concurrently.
+    `fetch(url, auth, timeout)` and its coroutine twin `fetch_async` replace the
+    single GET, e.g. to follow pagination.
+    """
+    if async_client.enabled:
+        fetch_async = fetch_async or async_client.get_json
+        jobs = [(group, key, partial(fetch_async, url, auth=auth, timeout=request_timeout))
+                for group, key, url, auth, request_timeout in upstream_requests]
+        return async_client.run(fan_out_async(jobs, per_group_limit, timeout))
+
+    jobs = []
+    for group, key, url, auth, request_timeout in upstream_requests:
+        job = partial(fetch or _get_upstream_json, url, auth, request_timeout)
+        if flight is not None:
+            job = partial(flight.do, url, job)
+        jobs.append((group, key, job))
+    return fan_out(jobs, per_group_limit, timeout)
+
 def _normalize_ado_agent(agent_data):
     return {
         "id": agent_data.get("id"),
         "name": agent_data.get("name"),
         "status": agent_data.get("status", "offline"),
-        "enabled": agent_data.get("enabled", False)
+        "enabled": agent_data.get("enabled", False),
+        **_ado_request_fields(agent_data)
     }
+
+def _has_ado_request_data(agent_data):
+    return agent_data.get("assignedRequest") is not None or agent_data.get("lastCompletedRequest") is not None
+
+def _ado_request_fields(agent_data):
+    """Busy flag plus the running and the last finished job of an agent listed or fetched with include*Request."""
+    assigned = agent_data.get("assignedRequest")
+    return {
+        "busy": assigned is not None,
+        "assigned_request": _normalize_ado_job_request(assigned),
+        "last_completed_request": _normalize_ado_job_request(agent_data.get("lastCompletedRequest")),
+    }
+
+def _normalize_ado_job_request(request_data):
+    if request_data is None:
+        return None
+    return {
+        "id": request_data.get("requestId"),
+        "definition": (request_data.get("definition") or {}).get("name"),
+        "assigned_at": request_data.get("assignTime"),
+        "finished_at": request_data.get("finishTime"),
+        "result": request_data.get("result"),
+    }
+
+
+poller.register('github_dashboard', collect_github_dashboard_data,
+                delay=_github_poll_delay,
+                diff_spec=runner_diff.GITHUB_RUNNERS)
+poller.register('ado_dashboard', collect_ado_dashboard_data, delay=partial(webhook_ingestor.reconcile_delay, SOURCE_ADO),
+                diff_spec=runner_diff.ADO_AGENTS)
+poller.register('health', collect_health_status,
+                delay=lambda interval: poller.app.config.get('HEALTH_CHECK_INTERVAL_SECONDS', 60))
+poller.add_listener(_publish_snapshot_changes)
+poller.add_listener(_record_status_history, followers=False)
+poller.add_listener(_record_runner_events, followers=False)
+poller.add_listener(metrics_exporter.on_snapshot)
+webhook_ingestor.register(SOURCE_GITHUB, 'github_dashboard', _apply_github_webhook, ordering=_github_webhook_order)
+webhook_ingestor.register(SOURCE_ADO, 'ado_dashboard', _apply_ado_webhook, ordering=_ado_webhook_order)
@@ -0,0 +1,127 @@
+import logging
+import os
+import socket
+import time
+import uuid
+
+from sqlalchemy import and_, case, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .history import dialect_insert
+from .models import db, PollerLease, SharedSnapshot
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def process_id():
+    """Identifies this worker process across pods: host name (the pod name on Kubernetes), pid and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    """
+    A named lease in the database, held by at most one process at a time.
+
+    acquire() both takes a free or expired lease and renews one already held,
+    each in a single conditional UPDATE (or the INSERT of a lease that never
+    existed), so two processes racing for it cannot both win. Expiry uses the
+    wall clocks of the processes, which only have to agree to well within the
+    lease duration. All methods need an application context.
+    """
+
+    def __init__(self, name, holder, duration):
+        self.name = name
+        self.holder = holder
+        self.duration = duration
+
+    def acquire(self, now=None):
+        """Takes or renews the lease for `duration` seconds; False while another live process holds it."""
+        now = now if now is not None else time.time()
+        taken = db.session.execute(
+            update(PollerLease)
+            .where(PollerLease.name == self.name)
+            .where((PollerLease.holder == self.holder) | (PollerLease.expires_at < now))
+            .values(holder=self.holder, expires_at=now + self.duration,
+                    acquired_at=case((PollerLease.holder == self.holder, PollerLease.acquired_at), else_=now))
+        ).rowcount
+        db.session.commit()
+        if taken:
+            return True
+        try:
+            db.session.add(PollerLease(name=self.name, holder=self.holder, acquired_at=now, expires_at=now + self.duration))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+
+    def release(self):
+        """Lets the next process take over right away instead of after expiry."""
+        db.session.execute(
+            update(PollerLease)
+            .where(PollerLease.name == self.name, PollerLease.holder == self.holder)
+            .values(expires_at=0)
+        )
+        db.session.commit()
+
+    def current_holder(self, now=None):
+        now = now if now is not None else time.time()
+        return db.session.execute(
+            select(PollerLease.holder).where(PollerLease.name == self.name, PollerLease.expires_at >= now)
+        ).scalar()
+
+
+class SharedSnapshots:
+    """
+    The snapshots published by the lease holder; rows are only ever replaced by
+    newer ones, i.e. by a higher version (a changed payload, e.g. a webhook
+    patch) or the same version collected later. Needs an application context.
+    """
+
+    @staticmethod
+    def publish(snapshot, holder):
+        values = {
+            'name': snapshot.name,
+            'version': snapshot.version,
+            'status_code': snapshot.status_code,
+            'generated_at': snapshot.generated_at,
+            'duration': snapshot.duration,
+            'last_error': snapshot.last_error,
+            'last_error_at': snapshot.last_error_at,
+            'body': snapshot.body,
+            'holder': holder,
+        }
+        stmt = dialect_insert()(SharedSnapshot).values(values)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={key: getattr(stmt.excluded, key) for key in values if key != 'name'},
+            # A leader that lost its lease mid-collection must not overwrite its successor's result
+            where=or_(SharedSnapshot.version < stmt.excluded.version,
+                      and_(SharedSnapshot.version == stmt.excluded.version,
+                           SharedSnapshot.generated_at <= stmt.excluded.generated_at)),
+        ))
+        db.session.commit()
+
+    @staticmethod
+    def newer_than(name, snapshot):
+        """The published snapshot if it is newer than the local `snapshot` (None for any), else None."""
+        latest = db.session.execute(
+            select(SharedSnapshot.version, SharedSnapshot.generated_at).where(SharedSnapshot.name == name)
+        ).first()
+        if latest is None or (snapshot is not None and tuple(latest) <= (snapshot.version, snapshot.generated_at)):
+            return None
+        return db.session.execute(
+            select(SharedSnapshot).where(SharedSnapshot.name == name).execution_options(populate_existing=True)
+        ).scalar()
+
+    @staticmethod
+    def names():
+        return set(db.session.execute(select(SharedSnapshot.name)).scalars())
+
+    @staticmethod
+    def drop(name=None):
+        stmt = delete(SharedSnapshot)
+        if name is not None:
+            stmt = stmt.where(SharedSnapshot.name == name)
+        db.session.execute(stmt)
+        db.session.commit()
@@ -0,0 +1,180 @@
+import base64
+import json
+
+from sqlalchemy import func, or_, tuple_
+
+from . import runner_diff
+from .models import db, RunnerStatusEvent
+
+STATE_IDLE = 'idle'
+STATE_BUSY = 'busy'
+STATE_OFFLINE = 'offline'
+STATE_DISABLED = 'disabled'
+STATE_ABSENT = 'absent'
+
+
+def runner_state(item):
+    """Collapses a mapped runner/agent into the state tracked by the event log."""
+    if item is None:
+        return STATE_ABSENT
+    if item.get('enabled') is False:
+        return STATE_DISABLED
+    if item.get('status') != 'online':
+        return STATE_OFFLINE
+    return STATE_BUSY if item.get('busy') else STATE_IDLE
+
+
+def transitions(previous_data, current_data, spec, occurred_at):
+    """
+    State changes between two consecutive dashboard payloads as event rows.
+    Runners that appear or disappear transition from/to STATE_ABSENT; pools
+    that failed to load in either payload are skipped rather than reported
+    as all of their agents going absent.
+    """
+    before = runner_diff.index_items(previous_data, spec)
+    after = runner_diff.index_items(current_data, spec)
+    failed = runner_diff.failed_paths(previous_data, spec) | runner_diff.failed_paths(current_data, spec)
+    events = []
+    for key in after.keys() | before.keys():
+        if key[:-1] in failed:
+            continue
+        old, new = before.get(key), after.get(key)
+        old_state, new_state = runner_state(old), runner_state(new)
+        if old_state == new_state:
+            continue
+        # Keys are (org_id, group_id/pool_id, runner_id/agent_id); the GitHub organization in Settings is org 0
+        org_id, group_id, runner_id = key
+        events.append({
+            'org_id': org_id,
+            'group_id': group_id,
+            'runner_id': runner_id,
+            'runner_name': (new or old).get('name'),
+            'old_state': old_state,
+            'new_state': new_state,
+            'occurred_at': occurred_at,
+        })
+    return events
+
+
+def encode_cursor(event):
+    return base64.urlsafe_b64encode(json.dumps([event.occurred_at, event.id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        occurred_at, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(occurred_at), int(event_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+class RunnerEventLog:
+    """
+    Append-only log of runner/agent state transitions.
+
+    Only changes between consecutive polls are written, so the write volume
+    follows the number of transitions, not the poll rate. With leader election
+    only the leader records, so every transition is written as observed.
+    Without it every gunicorn worker polls on its own; a transition is skipped
+    when the latest one logged for the runner within one poll interval is the
+    same, i.e. when another worker already logged it. A real repeat (e.g.
+    busy -> idle twice on short jobs) always has the opposite transition in
+    between and is kept.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.dedupe_seconds = 30
+        self.deduplicate = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('EVENTS_ENABLED', True))
+        # Workers observe the same transition at most one poll apart.
+        self.dedupe_seconds = app.config.get('POLL_INTERVAL_SECONDS', 30)
+        self.deduplicate = not (app.config.get('POLLER_ENABLED') and app.config.get('POLLER_LEADER_ELECTION'))
+        app.extensions['runner_event_log'] = self
+
+    def record(self, source, events):
+        """
+        Appends transitions not logged yet by another worker and returns the
+        rows written. Needs an application context.
+        """
+        if not self.enabled or not events:
+            return []
+        rows = [dict(event, source=source) for event in events]
+        if self.deduplicate:
+            latest = self._latest_transitions(source, events)
+            rows = [row for row in rows if latest.get((row['org_id'], row['group_id'], row['runner_id']))
+                    != (row['old_state'], row['new_state'])]
+        if rows:
+            self._add_state_seconds(source, rows)
+            db.session.execute(RunnerStatusEvent.__table__.insert(), rows)
+            db.session.commit()
+        return rows
+
+    def _latest_transitions(self, source, events):
+        """(old_state, new_state) of the latest event logged per runner within the dedupe window."""
+        since = min(event['occurred_at'] for event in events) - self.dedupe_seconds
+        latest = {}
+        for row in db.session.query(
+            RunnerStatusEvent.org_id, RunnerStatusEvent.group_id, RunnerStatusEvent.runner_id,
+            RunnerStatusEvent.old_state, RunnerStatusEvent.new_state,
+        ).filter(
+            RunnerStatusEvent.source == source,
+            RunnerStatusEvent.runner_id.in_({event['runner_id'] for event in events}),
+            RunnerStatusEvent.occurred_at >= since,
+        ).order_by(RunnerStatusEvent.occurred_at, RunnerStatusEvent.id):
+            latest[(row.org_id, row.group_id, row.runner_id)] = (row.old_state, row.new_state)
+        return latest
+
+    @staticmethod
+    def _add_state_seconds(source, rows):
+        """Sets how long each runner spent in its old state, from its latest logged event."""
+        before = min(row['occurred_at'] for row in rows)
+        started = {
+            (org_id, group_id, runner_id): occurred_at
+            for org_id, group_id, runner_id, occurred_at in db.session.query(
+                RunnerStatusEvent.org_id, RunnerStatusEvent.group_id, RunnerStatusEvent.runner_id,
+                func.max(RunnerStatusEvent.occurred_at),
+            ).filter(
+                RunnerStatusEvent.source == source,
+                RunnerStatusEvent.runner_id.in_({row['runner_id'] for row in rows}),
+                RunnerStatusEvent.occurred_at < before,
+            ).group_by(RunnerStatusEvent.org_id, RunnerStatusEvent.group_id, RunnerStatusEvent.runner_id)
+        }
+        for row in rows:
+            since = started.get((row['org_id'], row['group_id'], row['runner_id']))
+            row['state_seconds'] = row['occurred_at'] - since if since is not None else None
+
+    def query(self, source=None, runner_id=None, group_id=None, org_id=None, state=None,
+              start=None, end=None, limit=100, cursor=None):
+        """
+        Newest-first page of events plus the cursor of the next page. Keyset
+        pagination on (occurred_at, id) keeps deep pages as cheap as the first.
+        """
+        query = RunnerStatusEvent.query
+        if source is not None:
+            query = query.filter(RunnerStatusEvent.source == source)
+        if runner_id is not None:
+            query = query.filter(RunnerStatusEvent.runner_id == runner_id)
+        if org_id is not None:
+            query = query.filter(RunnerStatusEvent.org_id == org_id)
+        if group_id is not None:
+            query = query.filter(RunnerStatusEvent.group_id == group_id)
+        if state is not None:
+            query = query.filter(or_(RunnerStatusEvent.new_state == state, RunnerStatusEvent.old_state == state))
+        if start is not None:
+            query = query.filter(RunnerStatusEvent.occurred_at >= start)
+        if end is not None:
+            query = query.filter(RunnerStatusEvent.occurred_at < end)
+        if cursor is not None:
+            query = query.filter(tuple_(RunnerStatusEvent.occurred_at, RunnerStatusEvent.id) < decode_cursor(cursor))
+
+        page = query.order_by(RunnerStatusEvent.occurred_at.desc(), RunnerStatusEvent.id.desc()).limit(limit + 1).all()
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        return page[:limit], next_cursor
+
+
+runner_event_log = RunnerEventLog()
@@ -0,0 +1,334 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+
+from .metrics import registry, format_labels
+from .poller import poller
+from .ratelimit import rate_limiter
+
+logger = logging.getLogger('gunicorn.error')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HELP = {
+    'github_runners': 'GitHub runners per runner group, status and busy flag',
+    'ado_agents': 'Azure DevOps agents per pool, status and busy flag',
+    'dashboard_snapshot_age_seconds': 'Seconds since the dashboard snapshot was collected',
+    'github_rate_limit_remaining': 'GitHub API requests left in the current rate limit window',
+    'github_rate_limit_limit': 'GitHub API requests allowed per rate limit window',
+    'upstream_request_duration_seconds': 'Latency of upstream API calls by host and endpoint',
+    'upstream_requests_total': 'Upstream API calls by host, endpoint and status code',
+    'github_api_cache_requests_total': 'Paginated GitHub API reads answered from the cache (hit) or upstream (miss)',
+}
+
+
+def _header(family, kind):
+    return f"# HELP {family} {HELP.get(family, family)}\n# TYPE {family} {kind}\n"
+
+
+def github_runner_gauges(data):
+    lines = []
+    for org in data.get('organizations', []):
+        for group in org.get('groups', []):
+            if group.get('error'):
+                continue
+            counts = Counter((runner.get('status'), bool(runner.get('busy'))) for runner in group['runners_data']['runners'])
+            for status, busy in sorted(set(counts) | {(s, b) for s in ('online', 'offline') for b in (False, True)}):
+                labels = (('organization', org['name']), ('group_id', group['group_id']), ('group', group['group_name']),
+                          ('status', status), ('busy', str(busy).lower()))
+                lines.append(f"github_runners{format_labels(labels)} {counts[(status, busy)]}\n")
+    return _header('github_runners', 'gauge') + ''.join(lines) if lines else ''
+
+
+def ado_agent_gauges(data):
+    lines = []
+    for org in data.get('organizations', []):
+        for pool in org.get('pools', []):
+            if pool.get('error'):
+                continue
+            counts = Counter((agent.get('status'), bool(agent.get('busy'))) for agent in pool['agents_data']['agents'])
+            for status, busy in sorted(set(counts) | {(s, b) for s in ('online', 'offline') for b in (False, True)}):
+                labels = (('organization', org['name']), ('pool_id', pool['id']), ('pool', pool['name']),
+                          ('status', status), ('busy', str(busy).lower()))
+                lines.append(f"ado_agents{format_labels(labels)} {counts[(status, busy)]}\n")
+    return _header('ado_agents', 'gauge') + ''.join(lines) if lines else ''
+
+
+GAUGE_BUILDERS = {
+    'github_dashboard': github_runner_gauges,
+    'ado_dashboard': ado_agent_gauges,
+}
+
+
+class SQLiteMetricsStore:
+    """
+    Counter and histogram samples of every gunicorn worker in one SQLite file.
+
+    Each process writes its own cumulative values under a writer id; a scrape
+    sums them per series. Samples of processes that exited are folded into a
+    'retired' writer, so totals never go backwards when workers are recycled.
+    Gauges are not summed: the most recent observation of a series wins,
+    whichever worker made it.
+    """
+
+    RETIRED = 'retired'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metric_sample ('
+                'writer TEXT NOT NULL, family TEXT NOT NULL, type TEXT NOT NULL, base TEXT NOT NULL, '
+                'ord INTEGER NOT NULL, series TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (writer, series))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metric_gauge ('
+                'series TEXT PRIMARY KEY, family TEXT NOT NULL, value REAL NOT NULL, observed_at REAL NOT NULL)'
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self):
+        """This thread's connection, reused across flushes and scrapes."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def write(self, writer, samples):
+        if not samples:
+            return
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO metric_sample (writer, family, type, base, ord, series, value) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(writer,) + sample for sample in samples],
+            )
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def read(self):
+        """(family, type, series, value) summed over all writers, in exposition order."""
+        return self._conn().execute(
+            'SELECT family, type, series, SUM(value) FROM metric_sample '
+            'GROUP BY family, type, base, ord, series ORDER BY family, base, ord'
+        ).fetchall()
+
+    def write_gauges(self, gauges):
+        """Stores (family, series, value, observed_at) gauges unless a newer observation is already there."""
+        if not gauges:
+            return
+        self._conn().executemany(
+            'INSERT INTO metric_gauge (series, family, value, observed_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (series) DO UPDATE SET value = excluded.value, observed_at = excluded.observed_at '
+            'WHERE excluded.observed_at >= metric_gauge.observed_at',
+            [(series, family, value, observed_at) for family, series, value, observed_at in gauges],
+        )
+
+    def read_gauges(self):
+        """(family, series, value) of the latest observation of every gauge, in exposition order."""
+        return self._conn().execute('SELECT family, series, value FROM metric_gauge ORDER BY family, series').fetchall()
+
+    def retire(self, is_alive):
+        """Folds the samples of writers for which `is_alive(writer)` is false into RETIRED."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            writers = [row[0] for row in conn.execute('SELECT DISTINCT writer FROM metric_sample')]
+            dead = [writer for writer in writers if writer != self.RETIRED and not is_alive(writer)]
+            if dead:
+                merged = [self.RETIRED] + dead
+                marks = ','.join('?' * len(merged))
+                rows = conn.execute(
+                    f'SELECT family, type, base, ord, series, SUM(value) FROM metric_sample '
+                    f'WHERE writer IN ({marks}) GROUP BY series', merged
+                ).fetchall()
+                conn.execute(f'DELETE FROM metric_sample WHERE writer IN ({marks})', merged)
+                conn.executemany(
+                    'INSERT INTO metric_sample (writer, family, type, base, ord, series, value) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(self.RETIRED,) + tuple(row) for row in rows],
+                )
+            conn.execute('COMMIT')
+            return len(dead)
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM metric_sample')
+            conn.execute('DELETE FROM metric_gauge')
+        finally:
+            conn.close()
+
+
+def rate_limit_gauges(budgets):
+    """(family, series, value, observed_at) gauges of the GitHub token budgets seen by this process."""
+    gauges = []
+    for family, field in (('github_rate_limit_remaining', 'remaining'), ('github_rate_limit_limit', 'limit')):
+        for token_id, budget in budgets.items():
+            if budget[field] is not None and budget['observed_at'] is not None:
+                gauges.append((family, f'{family}{format_labels((("token", token_id),))}', budget[field],
+                               budget['observed_at']))
+    return gauges
+
+
+def _writer_alive(writer):
+    try:
+        os.kill(int(writer.split(':', 1)[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsExporter:
+    """
+    Prometheus text exposition for /metrics, built from precomputed state only.
+
+    Runner and agent gauges are rendered once per snapshot version by a poller
+    listener, so a scrape concatenates cached text plus a few cheap gauges.
+    Upstream latency histograms and cache counters live in the process-local
+    registry; with METRICS_BACKEND=sqlite every worker flushes them to a shared
+    file every METRICS_FLUSH_SECONDS and a scrape returns the sum over workers.
+    The GitHub rate limit gauges go to the same file, so a worker that never
+    calls GitHub (e.g. a follower of the elected poller) still exports them.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        self.flush_interval = 5
+        self._gauges = {}
+        self._writer = None
+        self._written = False
+        self._pid = None
+        self._flusher = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('METRICS_BACKEND', 'memory')
+        if backend == 'sqlite':
+            path = app.config.get('METRICS_PATH') or os.path.join(app.instance_path, 'metrics.db')
+            self.store = SQLiteMetricsStore(path)
+        elif backend == 'memory':
+            self.store = None
+        else:
+            raise ValueError(f"Unknown METRICS_BACKEND: {backend}")
+        self.flush_interval = app.config.get('METRICS_FLUSH_SECONDS', 5)
+        self._gauges = {}
+        app.extensions['metrics_exporter'] = self
+
+    def on_snapshot(self, name, previous, snapshot):
+        """Poller listener: re-renders the gauges of a dashboard snapshot when its payload changed."""
+        builder = GAUGE_BUILDERS.get(name)
+        if builder is None or snapshot.status_code != 200:
+            return
+        if previous is not None and previous.version == snapshot.version and name in self._gauges:
+            return
+        self._gauges[name] = builder(snapshot.data)
+
+    def ensure_started(self):
+        """Starts this worker's flusher thread lazily, i.e. after gunicorn has forked it."""
+        if self.store is None or (self._flusher is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._flusher is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._writer = f"{self._pid}:{uuid.uuid4().hex[:8]}"
+            self._written = False
+            self._flusher = threading.Thread(target=self._run_flusher, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self):
+        flushes = 0
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                flushes += 1
+                if flushes % 12 == 0:
+                    self.store.retire(_writer_alive)
+            except Exception:
+                logger.exception("Failed to flush metrics")
+
+    def flush(self):
+        """Writes the series changed since the last flush to the shared store."""
+        if self.store is not None:
+            self.ensure_started()
+            # A new writer starts with everything this process has recorded so far
+            self.store.write(self._writer, registry.samples(changed_only=self._written))
+            self._written = True
+            self.store.write_gauges(rate_limit_gauges(rate_limiter.state()))
+
+    def render(self):
+        parts = [self._gauges[name] for name in GAUGE_BUILDERS if self._gauges.get(name)]
+        if self.store is not None:
+            self.flush()
+            gauges = self.store.read_gauges()
+            samples = self.store.read()
+        else:
+            gauges = [(family, series, value) for family, series, value, _ in rate_limit_gauges(rate_limiter.state())]
+            samples = [(family, kind, series, value) for family, kind, _, _, series, value in registry.samples()]
+        parts.append(self._render_state(gauges))
+        parts.append(self._render_samples(samples))
+        return ''.join(parts)
+
+    @staticmethod
+    def _render_state(gauges):
+        lines = [_header('dashboard_snapshot_age_seconds', 'gauge')]
+        for name in GAUGE_BUILDERS:
+            snapshot = poller.get(name)
+            if snapshot is not None:
+                lines.append(f'dashboard_snapshot_age_seconds{{snapshot="{name}"}} {snapshot.age:.3f}\n')
+        family_seen = None
+        for family, series, value in gauges:
+            if family != family_seen:
+                lines.append(_header(family, 'gauge'))
+                family_seen = family
+            lines.append(f"{series} {int(value)}\n")
+        return ''.join(lines)
+
+    @staticmethod
+    def _render_samples(samples):
+        lines = []
+        family_seen = None
+        for family, kind, series, value in samples:
+            if family != family_seen:
+                lines.append(_header(family, kind))
+                family_seen = family
+            lines.append(f"{series} {value}\n")
+        return ''.join(lines)
+
+    def reset(self):
+        self._gauges = {}
+        registry.reset()
+        if self.store is not None:
+            self.store.clear()
+
+
+metrics_exporter = MetricsExporter()
@@ -0,0 +1,124 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+FANOUT_OK = 'ok'
+FANOUT_ERROR = 'error'
+FANOUT_TIMEOUT = 'timeout'
+
+
+class FanOutResult:
+    __slots__ = ('status', 'value', 'error', 'elapsed')
+
+    def __init__(self, status, value=None, error=None, elapsed=None):
+        self.status = status
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.status == FANOUT_OK
+
+    def __repr__(self):
+        return f'<FanOutResult {self.status}>'
+
+
+def _timed_call(fn):
+    started = time.monotonic()
+    try:
+        return fn(), None, time.monotonic() - started
+    except Exception as e:
+        return None, e, time.monotonic() - started
+
+
+async def _timed_await(semaphore, fn):
+    async with semaphore:
+        started = time.monotonic()
+        try:
+            return await fn(), None, time.monotonic() - started
+        except Exception as e:
+            return None, e, time.monotonic() - started
+
+
+def remaining_seconds(deadline_at):
+    """Seconds left until a time.monotonic() based deadline, never negative."""
+    if deadline_at is None:
+        return None
+    return max(0.0, deadline_at - time.monotonic())
+
+
+def fan_out(jobs, per_group_limit=8, timeout=None):
+    """
+    Runs jobs concurrently and returns {key: FanOutResult}.
+
+    `jobs` is an iterable of (group, key, callable) tuples. Every group gets its
+    own pool of at most `per_group_limit` threads, so one slow organization can
+    not starve the others. Jobs still queued or running when `timeout` expires
+    are reported with FANOUT_TIMEOUT; whatever finished in time is returned.
+    """
+    executors = {}
+    futures = {}
+    for group, key, fn in jobs:
+        executor = executors.get(group)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max(1, per_group_limit), thread_name_prefix='fanout')
+            executors[group] = executor
+        # Copying the context keeps the caller's trace (app.tracing) active in the pool threads
+        futures[executor.submit(contextvars.copy_context().run, _timed_call, fn)] = key
+
+    try:
+        done, _ = wait(futures, timeout=timeout)
+    finally:
+        # Never block on stragglers - they finish in the background and their results are dropped.
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for future, key in futures.items():
+        if future not in done:
+            results[key] = FanOutResult(FANOUT_TIMEOUT)
+            continue
+        value, error, elapsed = future.result()
+        if error is not None:
+            results[key] = FanOutResult(FANOUT_ERROR, error=error, elapsed=elapsed)
+        else:
+            results[key] = FanOutResult(FANOUT_OK, value=value, elapsed=elapsed)
+    return results
+
+
+async def fan_out_async(jobs, per_group_limit=8, timeout=None):
+    """
+    asyncio counterpart of fan_out() with the same results and timeout rules.
+
+    `jobs` are (group, key, coroutine_function) tuples. They all become tasks
+    on the running event loop; a semaphore per group, not a thread pool, caps
+    how many of a group's requests are in flight. Jobs still running at the
+    timeout are cancelled and reported with FANOUT_TIMEOUT.
+    """
+    semaphores = {}
+    tasks = {}
+    for group, key, fn in jobs:
+        semaphore = semaphores.get(group)
+        if semaphore is None:
+            semaphore = semaphores[group] = asyncio.Semaphore(max(1, per_group_limit))
+        tasks[asyncio.ensure_future(_timed_await(semaphore, fn))] = key
+
+    done = set()
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    results = {}
+    for task, key in tasks.items():
+        if task not in done:
+            results[key] = FanOutResult(FANOUT_TIMEOUT)
+            continue
+        value, error, elapsed = task.result()
+        if error is not None:
+            results[key] = FanOutResult(FANOUT_ERROR, error=error, elapsed=elapsed)
+        else:
+            results[key] = FanOutResult(FANOUT_OK, value=value, elapsed=elapsed)
+    return results
@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import case, func, select
+
+from .models import db, StatusSample, TimeToIdleBin
+
+logger = logging.getLogger('gunicorn.error')
+
+RESOLUTION_MINUTE = 60
+RESOLUTION_HOUR = 3600
+RESOLUTION_DAY = 86400
+RESOLUTIONS = (RESOLUTION_MINUTE, RESOLUTION_HOUR, RESOLUTION_DAY)
+
+SOURCE_GITHUB = 'github'
+SOURCE_ADO = 'ado'
+
+_KEY_COLUMNS = ('source', 'org_id', 'group_id', 'resolution', 'bucket')
+_SUM_COLUMNS = ('samples', 'total_sum', 'online_sum', 'offline_sum', 'busy_sum', 'enabled_sum', 'saturated_sum')
+
+
+def dialect_insert():
+    """The insert() of the database dialect in use, which supports ON CONFLICT upserts."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def github_group_counts(data):
+    """Per runner group counts of a GitHub dashboard payload, keyed by organization id (0 for Settings) and group id."""
+    counts = []
+    for org in data.get('organizations', []):
+        for group in org.get('groups', []):
+            if group.get('error'):
+                continue
+            runners = group['runners_data']['runners']
+            counts.append(_counts(org['id'], group['group_id'], runners, enabled=len(runners)))
+    return counts
+
+
+def ado_pool_counts(data):
+    """Per agent pool counts of an ADO dashboard payload, keyed by organization config id and pool id."""
+    counts = []
+    for org in data.get('organizations', []):
+        for pool in org.get('pools', []):
+            if pool.get('error'):
+                continue
+            agents = pool['agents_data']['agents']
+            counts.append(_counts(org['id'], pool['id'], agents,
+                                  enabled=sum(1 for agent in agents if agent.get('enabled'))))
+    return counts
+
+
+def _counts(org_id, group_id, items, enabled):
+    online = sum(1 for item in items if item.get('status') == 'online')
+    busy = sum(1 for item in items if item.get('busy'))
+    return {
+        'org_id': org_id,
+        'group_id': group_id,
+        'total': len(items),
+        'online': online,
+        'offline': len(items) - online,
+        'busy': busy,
+        'enabled': enabled,
+        'saturated': 1 if online and busy >= online else 0,
+    }
+
+
+class StatusHistory:
+    """
+    Time series of runner/agent counts per GitHub runner group and ADO pool.
+
+    Every recorded poll is added to its 1-minute, 1-hour and 1-day buckets in
+    one upsert, so the rollups are always current and a query of any range
+    reads a bounded number of rows from the primary key index. Each resolution
+    has its own retention, applied at most every HISTORY_RETENTION_CHECK_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.retention = {RESOLUTION_MINUTE: 2 * 86400, RESOLUTION_HOUR: 90 * 86400, RESOLUTION_DAY: 730 * 86400}
+        self.retention_check_interval = 3600
+        self.max_points = 1000
+        self._retention_applied_at = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('HISTORY_ENABLED', True))
+        self.retention = {
+            RESOLUTION_MINUTE: app.config.get('HISTORY_RETENTION_MINUTE_DAYS', 2) * 86400,
+            RESOLUTION_HOUR: app.config.get('HISTORY_RETENTION_HOUR_DAYS', 90) * 86400,
+            RESOLUTION_DAY: app.config.get('HISTORY_RETENTION_DAY_DAYS', 730) * 86400,
+        }
+        self.retention_check_interval = app.config.get('HISTORY_RETENTION_CHECK_SECONDS', 3600)
+        self._retention_applied_at = 0.0
+        app.extensions['status_history'] = self
+
+    def record(self, source, counts, at=None):
+        """Adds one observation per group/pool to all rollups. Needs an application context."""
+        if not self.enabled or not counts:
+            return
+        at = int(at if at is not None else time.time())
+        rows = []
+        for count in counts:
+            for resolution in RESOLUTIONS:
+                rows.append({
+                    'source': source,
+                    'org_id': count['org_id'],
+                    'group_id': count['group_id'],
+                    'resolution': resolution,
+                    'bucket': at - at % resolution,
+                    'samples': 1,
+                    'total_sum': count['total'],
+                    'online_sum': count['online'],
+                    'offline_sum': count['offline'],
+                    'busy_sum': count['busy'],
+                    'enabled_sum': count['enabled'],
+                    'busy_max': count['busy'],
+                    'saturated_sum': count.get('saturated', 0),
+                })
+
+        stmt = dialect_insert()(StatusSample).values(rows)
+        updates = {name: getattr(StatusSample, name) + getattr(stmt.excluded, name) for name in _SUM_COLUMNS}
+        updates['busy_max'] = case((stmt.excluded.busy_max > StatusSample.busy_max, stmt.excluded.busy_max),
+                                   else_=StatusSample.busy_max)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(_KEY_COLUMNS), set_=updates))
+        db.session.commit()
+
+        if time.monotonic() - self._retention_applied_at >= self.retention_check_interval:
+            self.apply_retention()
+
+    def apply_retention(self, now=None):
+        with self._lock:
+            self._retention_applied_at = time.monotonic()
+        now = int(now if now is not None else time.time())
+        deleted = 0
+        for model in (StatusSample, TimeToIdleBin):
+            for resolution, seconds in self.retention.items():
+                deleted += model.query.filter(
+                    model.resolution == resolution,
+                    model.bucket < now - seconds,
+                ).delete(synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            logger.info(f"Status history retention removed {deleted} buckets")
+        return deleted
+
+    def choose_resolution(self, start, end, step=None, now=None):
+        """
+        The coarsest rollup not coarser than `step`, or without a step the finest
+        one that answers the range in at most `max_points` points. Rollups whose
+        retention does not reach back to `start` are skipped.
+        """
+        now = now if now is not None else time.time()
+        available = [resolution for resolution in RESOLUTIONS if start >= now - self.retention[resolution]]
+        if not available:
+            available = [RESOLUTIONS[-1]]
+        if step is not None:
+            fitting = [resolution for resolution in available if resolution <= step]
+            return fitting[-1] if fitting else available[0]
+        for resolution in available:
+            if (end - start) / resolution <= self.max_points:
+                return resolution
+        return available[-1]
+
+    def query(self, source, group_id, start, end, step=None, org_id=0):
+        """
+        Points of [start, end) for one group/pool. Buckets of the chosen rollup
+        are merged in SQL when `step` is a multiple of its resolution.
+        """
+        resolution = self.choose_resolution(start, end, step)
+        step = max(resolution, (int(step or resolution) // resolution) * resolution)
+        start = int(start) - int(start) % resolution
+
+        point = (StatusSample.bucket // step) * step
+        rows = db.session.execute(
+            select(
+                point.label('t'),
+                func.sum(StatusSample.samples),
+                func.sum(StatusSample.total_sum),
+                func.sum(StatusSample.online_sum),
+                func.sum(StatusSample.offline_sum),
+                func.sum(StatusSample.busy_sum),
+                func.sum(StatusSample.enabled_sum),
+                func.max(StatusSample.busy_max),
+            )
+            .where(
+                StatusSample.source == source,
+                StatusSample.org_id == org_id,
+                StatusSample.group_id == group_id,
+                StatusSample.resolution == resolution,
+                StatusSample.bucket >= start,
+                StatusSample.bucket < end,
+            )
+            .group_by(point)
+            .order_by(point)
+        ).all()
+
+        points = []
+        for t, samples, total, online, offline, busy, enabled, busy_max in rows:
+            entry = {
+                't': t,
+                'samples': samples,
+                'avg_total': round(total / samples, 2),
+                'avg_online': round(online / samples, 2),
+                'avg_offline': round(offline / samples, 2),
+                'avg_busy': round(busy / samples, 2),
+                'max_busy': busy_max,
+            }
+            if source == SOURCE_ADO:
+                entry['avg_enabled'] = round(enabled / samples, 2)
+            points.append(entry)
+
+        return {
+            'source': source,
+            'org_id': org_id,
+            'group_id': group_id,
+            'from': start,
+            'to': int(end),
+            'resolution': resolution,
+            'step': step,
+            'points': points,
+        }
+
+
+status_history = StatusHistory()
@@ -0,0 +1,159 @@
+import re
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import registry
+from .tracing import span
+
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$', re.IGNORECASE)
+_NAMED_SEGMENTS = ('orgs', 'repos', 'enterprises', 'users')
+
+
+def endpoint_label(url):
+    """
+    The path of an upstream URL with ids and names replaced by placeholders,
+    e.g. /orgs/{name}/actions/runner-groups/{id}/runners, so that latency
+    metrics have one series per API endpoint rather than per resource.
+    """
+    segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+    if '_apis' in segments:
+        # Azure DevOps: /{organization}/[{project}/]_apis/...
+        apis = segments.index('_apis')
+        segments = ['{org}'] * apis + segments[apis:]
+    labelled = []
+    for i, segment in enumerate(segments):
+        if _ID_SEGMENT.match(segment):
+            segment = '{id}'
+        elif i > 0 and segments[i - 1] in _NAMED_SEGMENTS:
+            segment = '{name}'
+        labelled.append(segment)
+    return '/' + '/'.join(labelled)
+
+
+def record_upstream_call(host, url, started, status):
+    """Adds one upstream call to the latency histogram and request counter of the /metrics exporter."""
+    labels = (('host', host), ('endpoint', endpoint_label(url)))
+    registry.observe('upstream_request_duration_seconds', labels, time.perf_counter() - started)
+    registry.inc('upstream_requests_total', labels + (('status', status),))
+
+
+class _NoCookies(DefaultCookiePolicy):
+    """Rejects every cookie: a pooled session is shared by all orgs and tokens on a host."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+class UpstreamHttpClient:
+    """
+    Shared HTTP client for all upstream calls (GitHub, Azure DevOps, Jira).
+
+    Keeps one keep-alive requests.Session per upstream host, so repeated calls
+    reuse pooled TCP/TLS connections instead of paying a new handshake each
+    time. The sessions never store cookies, so no state set for one org's
+    token leaks into another org's calls on the same host. Retries with backoff and a default timeout apply to every call.
+    """
+
+    def __init__(self, app=None):
+        self.pool_maxsize = 10
+        self.retries = 2
+        self.backoff_factor = 0.5
+        self.timeout = (5, 10)
+        self._sessions = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.pool_maxsize = app.config.get('HTTP_POOL_MAXSIZE', 10)
+        self.retries = app.config.get('HTTP_RETRIES', 2)
+        self.backoff_factor = app.config.get('HTTP_RETRY_BACKOFF', 0.5)
+        self.timeout = (app.config.get('HTTP_CONNECT_TIMEOUT', 5), app.config.get('HTTP_READ_TIMEOUT', 10))
+        self.close()
+        app.extensions['http_client'] = self
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.cookies.set_policy(_NoCookies())
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def session_for(self, url):
+        host = urlsplit(url).netloc
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._sessions[host] = self._build_session()
+        return host, session
+
+    def request(self, method, url, timeout=None, **kwargs):
+        host, session = self.session_for(url)
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+        started = time.perf_counter()
+        try:
+            with span('upstream'):
+                response = session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+        except requests.RequestException:
+            record_upstream_call(host, url, started, 'error')
+            raise
+        record_upstream_call(host, url, started, response.status_code)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def stats(self):
+        """Per-host request and connection counters; `reused` counts requests served on an already open connection."""
+        stats = {}
+        with self._lock:
+            sessions = dict(self._sessions)
+            requests_by_host = dict(self._requests)
+        for host, session in sessions.items():
+            connections = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+            total = requests_by_host.get(host, 0)
+            stats[host] = {
+                'requests': total,
+                'connections_opened': connections,
+                'reused': max(0, total - connections),
+            }
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+            self._requests = {}
+        for session in sessions.values():
+            session.close()
+
+
+http_client = UpstreamHttpClient()
@@ -0,0 +1,126 @@
+import threading
+
+
+class Counters:
+    """Thread-safe, process-local counters for upstream traffic statistics."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def get(self, name):
+        return self._values.get(name, 0)
+
+    def snapshot(self, prefix=''):
+        with self._lock:
+            return {name: value for name, value in self._values.items() if name.startswith(prefix)}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+counters = Counters()
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    """Renders label pairs in Prometheus text format, e.g. {host="api.github.com"}."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """
+    Process-local labelled counters and latency histograms for the /metrics
+    exporter. Values are cumulative for the life of the process; `samples()`
+    turns them into exposition lines that can be summed across processes.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._series = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty.add(key)
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+            self._dirty.add(key)
+
+    def samples(self, changed_only=False):
+        """
+        (family, type, base, order, series, value) tuples. `series` is the rendered
+        sample name and labels; `base` and `order` keep the lines of one
+        histogram together and its buckets in order. With `changed_only`, just
+        the series updated since the previous such call are returned.
+        """
+        with self._lock:
+            keys = self._dirty if changed_only else set(self._counters) | set(self._histograms)
+            self._dirty = set() if changed_only else self._dirty
+            counters = [(key, self._counters[key]) for key in keys if key in self._counters]
+            histograms = [(key, list(self._histograms[key])) for key in keys if key in self._histograms]
+
+        samples = []
+        for key, value in counters:
+            (family, kind, base, order, series), = self._lines(key, 'counter')
+            samples.append((family, kind, base, order, series, value))
+        for key, values in histograms:
+            # Bucket counts, then +Inf (= count), sum and count
+            for (family, kind, base, order, series), value in zip(self._lines(key, 'histogram'),
+                                                                  values[:-2] + [values[-1], values[-2], values[-1]]):
+                samples.append((family, kind, base, order, series, value))
+        return samples
+
+    def _lines(self, key, kind):
+        """Rendered series of a counter or histogram, formatted once per label set."""
+        lines = self._series.get(key)
+        if lines is None:
+            name, labels = key
+            base = name + format_labels(labels)
+            if kind == 'counter':
+                lines = [(name, kind, base, 0, base)]
+            else:
+                bounds = [repr(bound) for bound in self.buckets] + ['+Inf']
+                lines = [(name, kind, base, i, f"{name}_bucket{format_labels(labels + (('le', bound),))}")
+                         for i, bound in enumerate(bounds)]
+                lines.append((name, kind, base, len(bounds), f"{name}_sum{format_labels(labels)}"))
+                lines.append((name, kind, base, len(bounds) + 1, f"{name}_count{format_labels(labels)}"))
+            self._series[key] = lines
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._dirty.clear()
+
+
+registry = MetricsRegistry()
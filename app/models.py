@@ -13,11 +13,28 @@ class Setting(db.Model):
         return f'<Setting {self.key}>'
 
 class MonitoredGroup(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    # GitHub runner group id; only unique within an organization
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 0 for the organization in Settings (ORGANIZATION / API_GITHUB_TOKEN), otherwise a GitHubConfig id.
+    # Not a foreign key, because 0 has no github_config row; GitHubConfig.monitored_groups deletes the rest.
+    org_id = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0, server_default='0')
     name = db.Column(db.String(100), nullable=False)
 
     def __repr__(self):
         return f'<MonitoredGroup {self.name}>'
+
+class GitHubConfig(db.Model):
+    """An additional GitHub organization, monitored with its own token next to the one in Settings."""
+    __tablename__ = 'github_config'
+    id = db.Column(db.Integer, primary_key=True)
+    organization_name = db.Column(db.String(100), nullable=False, unique=True)
+    api_token = db.Column(db.String(512), nullable=False)
+    monitored_groups = db.relationship('MonitoredGroup', primaryjoin='GitHubConfig.id == foreign(MonitoredGroup.org_id)',
+                                       lazy=True, cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f'<GitHubConfig {self.organization_name}>'
+
 class AzureDevOpsConfig(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     organization_name = db.Column(db.String(100), nullable=False, unique=True) # Zmieniono z organization_url i dodano unique
@@ -49,3 +66,145 @@ class User(db.Model, UserMixin):
 
     def __repr__(self):
         return f'<User {self.username}>'
+
+class StatusSample(db.Model):
+    """
+    Runner/agent counts of one GitHub runner group or ADO pool, aggregated over
+    a time bucket of `resolution` seconds (1m, 1h and 1d rollups). Sums divided
+    by `samples` give the averages over the bucket.
+    """
+    source = db.Column(db.String(16), primary_key=True)
+    org_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    group_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    resolution = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    samples = db.Column(db.Integer, nullable=False, default=0)
+    total_sum = db.Column(db.Integer, nullable=False, default=0)
+    online_sum = db.Column(db.Integer, nullable=False, default=0)
+    offline_sum = db.Column(db.Integer, nullable=False, default=0)
+    busy_sum = db.Column(db.Integer, nullable=False, default=0)
+    enabled_sum = db.Column(db.Integer, nullable=False, default=0)
+    busy_max = db.Column(db.Integer, nullable=False, default=0)
+    # Samples in which every online runner was busy
+    saturated_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_status_sample_retention', 'resolution', 'bucket'),
+    )
+
+    def __repr__(self):
+        return f'<StatusSample {self.source}:{self.org_id}:{self.group_id} {self.resolution}s@{self.bucket}>'
+
+class RunnerStatusEvent(db.Model):
+    """A state transition of one GitHub runner or ADO agent, appended when consecutive polls differ."""
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(16), nullable=False)
+    org_id = db.Column(db.Integer, nullable=False, default=0)
+    group_id = db.Column(db.Integer, nullable=False)
+    runner_id = db.Column(db.Integer, nullable=False)
+    runner_name = db.Column(db.String(200))
+    old_state = db.Column(db.String(16), nullable=False)
+    new_state = db.Column(db.String(16), nullable=False)
+    occurred_at = db.Column(db.Float, nullable=False)
+    # Time spent in old_state, when the event that started it is in the log
+    state_seconds = db.Column(db.Float)
+
+    __table_args__ = (
+        # Led by the runner/group alone, so every combination of the other /api/events filters
+        # still walks them in (occurred_at, id) order instead of sorting the matches
+        db.Index('ix_runner_status_event_runner', 'runner_id', 'occurred_at', 'id'),
+        db.Index('ix_runner_status_event_group', 'group_id', 'occurred_at', 'id'),
+        db.Index('ix_runner_status_event_time', 'occurred_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source': self.source,
+            'org_id': self.org_id,
+            'group_id': self.group_id,
+            'runner_id': self.runner_id,
+            'runner_name': self.runner_name,
+            'old_state': self.old_state,
+            'new_state': self.new_state,
+            'occurred_at': self.occurred_at,
+            'state_seconds': self.state_seconds,
+        }
+
+    def __repr__(self):
+        return f'<RunnerStatusEvent {self.source}:{self.runner_id} {self.old_state}->{self.new_state}>'
+
+class TimeToIdleBin(db.Model):
+    """
+    Histogram of how long runners/agents of one group or pool stayed busy
+    before going idle again, per hourly and daily bucket. `bin` is a
+    logarithmic duration bin (see app.analytics.duration_bin).
+    """
+    source = db.Column(db.String(16), primary_key=True)
+    org_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    group_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    resolution = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bin = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_time_to_idle_bin_retention', 'resolution', 'bucket'),
+    )
+
+    def __repr__(self):
+        return f'<TimeToIdleBin {self.source}:{self.org_id}:{self.group_id} {self.resolution}s@{self.bucket} #{self.bin}>'
+
+class PollerLease(db.Model):
+    """
+    Which process runs the upstream collection. The holder renews `expires_at`
+    while it is alive; once it passes, any other replica or worker may take over.
+    """
+    __tablename__ = 'poller_lease'
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(128), nullable=False)
+    acquired_at = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<PollerLease {self.name} by {self.holder}>'
+
+class SharedSnapshot(db.Model):
+    """The latest snapshot of a poller collector as published by the lease holder, served by every other process."""
+    __tablename__ = 'shared_snapshot'
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    generated_at = db.Column(db.Float, nullable=False)
+    duration = db.Column(db.Float)
+    last_error = db.Column(db.Text)
+    last_error_at = db.Column(db.Float)
+    # Pre-serialised response body, including the snapshot metadata
+    body = db.Column(db.Text, nullable=False)
+    holder = db.Column(db.String(128))
+
+    def __repr__(self):
+        return f'<SharedSnapshot {self.name} v{self.version}>'
+
+class WebhookEvent(db.Model):
+    """
+    A webhook delivery as received, queued for the collecting process to apply.
+    Redeliveries of the same delivery id are dropped; rows expire after WEBHOOK_RETENTION_SECONDS.
+    """
+    __tablename__ = 'webhook_event'
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(16), nullable=False)
+    delivery_id = db.Column(db.String(64), nullable=False)
+    event = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('source', 'delivery_id', name='uq_webhook_event_delivery'),
+        db.Index('ix_webhook_event_received', 'received_at'),
+        # Ids are the appliers' cursor, so they must not be reused once old rows are pruned
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f'<WebhookEvent {self.source}:{self.event} #{self.id}>'
@@ -0,0 +1,460 @@
+import copy
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from . import runner_diff, tracing
+from .coordination import Lease, SharedSnapshots, process_id
+from .singleflight import SingleFlight
+
+logger = logging.getLogger('gunicorn.error')
+
+
+class Snapshot:
+    """Result of one collector run, pre-serialised so it can be served as-is."""
+
+    __slots__ = ('name', 'data', 'status_code', 'body', 'version', 'generated_at', 'patched_at', 'duration',
+                 'last_error', 'last_error_at', 'deltas', 'views', 'timings')
+
+    def __init__(self, name, data, status_code=200, version=0, generated_at=None, duration=None,
+                 last_error=None, last_error_at=None, patched_at=None):
+        self.name = name
+        self.data = data
+        self.status_code = status_code
+        self.version = version
+        # When the collection ran; patches between collections (see DashboardPoller.apply) keep it and set patched_at
+        self.generated_at = generated_at if generated_at is not None else time.time()
+        self.patched_at = patched_at
+        self.duration = duration
+        self.last_error = last_error
+        self.last_error_at = last_error_at
+        self.deltas = {}
+        # Other serialisations of the payload, built once per snapshot by whoever serves them
+        self.views = {}
+        # Span totals of the collection that produced this snapshot, when tracing is enabled
+        self.timings = None
+        with tracing.span('serialize'):
+            self.body = json.dumps(dict(data, snapshot=self.meta(include_age=False)))
+
+    @property
+    def age(self):
+        return max(0.0, time.time() - self.generated_at)
+
+    def meta(self, include_age=True):
+        meta = {
+            'version': self.version,
+            'generated_at': self.generated_at,
+            'patched_at': self.patched_at,
+            'duration_seconds': self.duration,
+            'last_error': self.last_error,
+            'last_error_at': self.last_error_at,
+        }
+        if include_age:
+            meta['age_seconds'] = round(self.age, 3)
+        return meta
+
+
+class DashboardPoller:
+    """
+    Runs the registered collectors on a background cadence and keeps their
+    latest results as snapshots, so endpoints never wait on upstream APIs.
+
+    Every collector gets its own thread, so a slow integration (e.g. ADO with
+    hundreds of agents) does not delay the others. Collectors are called inside
+    an application context and must return a (payload_dict, status_code) tuple.
+
+    A snapshot's version only moves forward when its payload changes. Versions
+    are microsecond timestamps rather than counters, so a cursor handed out by
+    another worker is simply unknown here and leads to a full resync instead of
+    a wrong delta. Collectors registered with a diff spec keep their last few
+    versions to answer "what changed since version N".
+
+    With POLLER_LEADER_ELECTION only the holder of a database lease collects;
+    it publishes every snapshot to the database, and all other workers and
+    replicas follow those instead of calling the upstream APIs themselves.
+    When the holder dies, the lease expires and a follower takes over.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._collectors = {}
+        self._delays = {}
+        self._diff_specs = {}
+        self._history = {}
+        self._listeners = []
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._wake = {}
+        self._stopping = threading.Event()
+        self._leader = threading.Event()
+        self._lease = None
+        self._flight = SingleFlight()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['dashboard_poller'] = self
+
+    @property
+    def interval(self):
+        return max(1.0, float(self.app.config.get('POLL_INTERVAL_SECONDS', 30)))
+
+    @property
+    def enabled(self):
+        return bool(self.app.config.get('POLLER_ENABLED', False))
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    @property
+    def coordinated(self):
+        """Whether workers elect one collector (see POLLER_LEADER_ELECTION) instead of each polling on its own."""
+        return self.enabled and bool(self.app.config.get('POLLER_LEADER_ELECTION', False))
+
+    @property
+    def is_leader(self):
+        return not self.coordinated or self._leader.is_set()
+
+    @property
+    def lease_seconds(self):
+        return max(3.0, float(self.app.config.get('POLLER_LEASE_SECONDS', 30)))
+
+    @property
+    def follow_interval(self):
+        return max(0.1, float(self.app.config.get('POLLER_FOLLOW_SECONDS', 2)))
+
+    @property
+    def history_size(self):
+        return max(1, int(self.app.config.get('SNAPSHOT_HISTORY_SIZE', 20)))
+
+    def register(self, name, collector, delay=None, diff_spec=None):
+        """
+        `delay(interval) -> seconds` lets a collector stretch its own cadence, e.g.
+        when a rate limit drains; `diff_spec` (see runner_diff) enables deltas.
+        """
+        self._collectors[name] = collector
+        if delay is not None:
+            self._delays[name] = delay
+        if diff_spec is not None:
+            self._diff_specs[name] = diff_spec
+
+    def add_listener(self, callback, followers=True):
+        """
+        `callback(name, previous, snapshot)` runs in an app context after every
+        refresh, e.g. to push changes to streaming clients. With `followers=False`
+        it only runs in the process that collects, i.e. not in the followers of
+        an elected leader, e.g. for writes the leader already made.
+        """
+        self._listeners.append((callback, followers))
+
+    def get(self, name):
+        return self._snapshots.get(name)
+
+    def get_or_collect(self, name):
+        """
+        Returns the latest snapshot. Only a cold start (no snapshot yet) pays for
+        an inline collection; when the poller is disabled, snapshots older than
+        the poll interval are refreshed on demand instead. A follower of an
+        elected leader never collects: until the leader has published, it
+        answers with a 503 "not available yet" snapshot.
+        """
+        snapshot = self._snapshots.get(name)
+        if self.coordinated and not self.is_leader:
+            if snapshot is None:
+                snapshot = self.follow(name)
+            if snapshot is None:
+                snapshot = Snapshot(name, {'error': 'Data is not available yet'}, 503,
+                                    last_error='Waiting for the collecting worker to publish')
+            return snapshot
+        if snapshot is None or (not self.running and snapshot.age >= self.interval):
+            snapshot = self.refresh(name)
+        return snapshot
+
+    def get_fresh(self, name, max_age):
+        """
+        Like get_or_collect(), and brings a snapshot older than `max_age` up to
+        date: the collecting process refreshes it in the background, a follower
+        of an elected leader takes over the leader's newer one, if any.
+        """
+        snapshot = self.get_or_collect(name)
+        if snapshot.age < max_age:
+            return snapshot
+        if self.coordinated and not self.is_leader:
+            return self.follow(name) or snapshot
+        self.refresh_async(name)
+        return snapshot
+
+    def refresh(self, name):
+        """
+        Collects a snapshot now. Refreshes of one name never overlap: a caller
+        arriving while one is in flight (the poller thread, refresh_async or
+        get_or_collect) shares its result, so an older collection can never
+        overwrite a newer snapshot.
+        """
+        return self._flight.do(name, lambda: self._refresh(name))
+
+    def _refresh(self, name):
+        collector = self._collectors[name]
+        previous = self._snapshots.get(name)
+        started = time.monotonic()
+        trace_token = tracing.begin(f"collect {name}") if self.app.config.get('TRACING_ENABLED') else None
+        try:
+            with self.app.app_context():
+                data, status_code = collector()
+        except Exception as e:
+            logger.exception(f"Collector '{name}' failed")
+            error = str(e) or e.__class__.__name__
+            if previous is not None:
+                # Keep serving the last good data, but surface the failure.
+                snapshot = Snapshot(name, previous.data, previous.status_code, version=previous.version,
+                                    generated_at=previous.generated_at, duration=previous.duration,
+                                    last_error=error, last_error_at=time.time(), patched_at=previous.patched_at)
+            else:
+                snapshot = Snapshot(name, {'error': 'Data is not available yet'}, 503,
+                                    version=self._next_version(None),
+                                    duration=time.monotonic() - started,
+                                    last_error=error, last_error_at=time.time())
+        else:
+            error = data.get('error') if status_code >= 400 else None
+            unchanged = previous is not None and previous.status_code == status_code and previous.data == data
+            snapshot = Snapshot(name, data, status_code,
+                                version=previous.version if unchanged else self._next_version(previous),
+                                duration=time.monotonic() - started,
+                                last_error=error, last_error_at=time.time() if error else None)
+        if trace_token is not None:
+            trace = tracing.finish(trace_token)
+            snapshot.timings = trace.summary()
+            tracing.log_trace(trace, self.app.config.get('TRACING_SLOW_MS', 500), status=snapshot.status_code)
+
+        self._publish(snapshot)
+        self._store(name, previous, snapshot)
+        return snapshot
+
+    def apply(self, name, mutate):
+        """
+        Patches the latest snapshot between collections, e.g. with webhook events:
+        `mutate(data)` gets a copy of its payload and returns whether it changed
+        anything. The result is versioned, published and passed to the listeners
+        like a refresh, but keeps the generated_at (and so the age) of the
+        collection it patches and sets patched_at. Returns the latest snapshot,
+        or None while there is no good one to patch. `mutate` runs again when a
+        refresh lands meanwhile.
+        """
+        while True:
+            previous = self._snapshots.get(name)
+            if previous is None or previous.status_code != 200:
+                return None
+            data = copy.deepcopy(previous.data)
+            if not mutate(data):
+                return previous
+            snapshot = Snapshot(name, data, 200, version=self._next_version(previous), generated_at=previous.generated_at,
+                                duration=previous.duration, patched_at=time.time())
+            if self._store(name, previous, snapshot, if_current=True):
+                self._publish(snapshot)
+                return snapshot
+
+    def _publish(self, snapshot):
+        if self.coordinated and self.is_leader:
+            try:
+                with self.app.app_context():
+                    SharedSnapshots.publish(snapshot, self._lease.holder)
+            except Exception:
+                logger.exception(f"Could not publish snapshot '{snapshot.name}'")
+
+    def follow(self, name):
+        """
+        Takes over the leader's published snapshot when it is newer than the
+        local one; returns the latest local snapshot either way.
+        """
+        previous = self._snapshots.get(name)
+        with self.app.app_context():
+            shared = SharedSnapshots.newer_than(name, previous)
+            if shared is None:
+                return previous
+            data = json.loads(shared.body)
+            meta = data.pop('snapshot', None) or {}
+            snapshot = Snapshot(name, data, shared.status_code, version=shared.version,
+                                generated_at=shared.generated_at, duration=shared.duration,
+                                last_error=shared.last_error, last_error_at=shared.last_error_at,
+                                patched_at=meta.get('patched_at'))
+        self._store(name, previous, snapshot)
+        return snapshot
+
+    def _store(self, name, previous, snapshot, if_current=False):
+        """Keeps `snapshot` as the latest one; with `if_current` only while `previous` still is (returns whether it did)."""
+        with self._lock:
+            if if_current and self._snapshots.get(name) is not previous:
+                return False
+            self._snapshots[name] = snapshot
+            if name in self._diff_specs and (previous is None or previous.version != snapshot.version):
+                history = self._history.get(name)
+                if history is None or history.maxlen != self.history_size:
+                    history = self._history[name] = deque(history or (), maxlen=self.history_size)
+                history.append(snapshot)
+        if self._listeners:
+            leader = self.is_leader
+            with self.app.app_context():
+                for callback, followers in self._listeners:
+                    if not (followers or leader):
+                        continue
+                    try:
+                        callback(name, previous, snapshot)
+                    except Exception:
+                        logger.exception(f"Snapshot listener failed for '{name}'")
+        return True
+
+    @staticmethod
+    def _next_version(previous):
+        version = time.time_ns() // 1000
+        if previous is not None and version <= previous.version:
+            version = previous.version + 1
+        return version
+
+    def delta_body(self, name, since):
+        """
+        JSON delta (added/removed/changed items) from version `since` to the
+        latest snapshot, or None when a full resync is needed: the cursor is too
+        old or unknown, or the payload structure changed. Deltas are computed
+        once per (snapshot, since) pair and shared by every client asking.
+        """
+        snapshot = self._snapshots.get(name)
+        spec = self._diff_specs.get(name)
+        if snapshot is None or spec is None:
+            return None
+        if since in snapshot.deltas:
+            return snapshot.deltas[since]
+
+        if since == snapshot.version:
+            base = snapshot
+        else:
+            base = next((old for old in self._history.get(name, ()) if old.version == since), None)
+        body = None
+        if base is not None and base.status_code == 200 and snapshot.status_code == 200:
+            changes = runner_diff.diff(base.data, snapshot.data, spec)
+            if changes is not None:
+                body = json.dumps(dict(changes, delta=True, since=since,
+                                       snapshot=snapshot.meta(include_age=False)))
+        if len(snapshot.deltas) < self.history_size + 1:
+            snapshot.deltas[since] = body
+        return body
+
+    def refresh_async(self, name):
+        """Refreshes a snapshot in the background; a refresh already in flight is not duplicated."""
+        return self._flight.do_async(name, lambda: self._refresh(name))
+
+    def is_ready(self):
+        """Ready once every collector has produced a snapshot (or when polling is disabled)."""
+        if not self.enabled:
+            return True
+        return all(name in self._snapshots for name in self._collectors)
+
+    def invalidate(self, name=None):
+        """
+        Drops snapshots (e.g. after a settings change) and wakes the pollers.
+        Published snapshots are dropped as well, which tells the leader to collect again.
+        """
+        if self.coordinated:
+            try:
+                with self.app.app_context():
+                    SharedSnapshots.drop(name)
+            except Exception:
+                logger.exception("Could not drop the published snapshots")
+        with self._lock:
+            if name is None:
+                self._snapshots.clear()
+                self._history.clear()
+            else:
+                self._snapshots.pop(name, None)
+                self._history.pop(name, None)
+        for wake_name, wake in self._wake.items():
+            if name is None or wake_name == name:
+                wake.set()
+
+    def reset(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._history.clear()
+
+    def ensure_started(self):
+        """Starts the polling threads lazily, i.e. after gunicorn has forked the worker."""
+        if self._threads or not self.enabled:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for name in self._collectors:
+                self._wake[name] = threading.Event()
+                thread = threading.Thread(target=self._run, args=(name,), name=f'poller-{name}', daemon=True)
+                self._threads[name] = thread
+            if self.coordinated:
+                # A new holder id per start, so a forked worker never inherits its parent's lease
+                self._lease = Lease('dashboard_poller', process_id(), self.lease_seconds)
+                self._threads[None] = threading.Thread(target=self._hold_lease, name='poller-lease', daemon=True)
+            for thread in self._threads.values():
+                thread.start()
+        logger.info(f"Dashboard poller started for {', '.join(self._collectors)} every {self.interval}s")
+
+    def stop(self, timeout=None):
+        """Stops the polling threads after their current collection; ensure_started() starts them again."""
+        with self._lock:
+            threads, self._threads = self._threads, {}
+            self._stopping.set()
+            for wake in self._wake.values():
+                wake.set()
+        for thread in threads.values():
+            thread.join(timeout)
+
+    def _run(self, name):
+        wake = self._wake[name]
+        delay = self._delays.get(name)
+        while not self._stopping.is_set():
+            if self.is_leader:
+                self.refresh(name)
+                wake.wait(delay(self.interval) if delay else self.interval)
+            else:
+                try:
+                    self.follow(name)
+                except Exception:
+                    logger.exception(f"Could not read the published snapshot '{name}'")
+                wake.wait(self.follow_interval)
+            wake.clear()
+
+    def _hold_lease(self):
+        """Takes or renews the lease three times per lease period; the leader also re-collects dropped snapshots."""
+        lease = self._lease
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    held = lease.acquire()
+                    published = SharedSnapshots.names() if held else set()
+            except Exception:
+                logger.exception("Could not renew the poller lease")
+                held, published = False, set()
+            if held and not self._leader.is_set():
+                logger.info(f"Poller lease acquired by {lease.holder}, collecting from the upstream APIs")
+                self._leader.set()
+                published = set()
+            elif not held and self._leader.is_set():
+                logger.warning(f"Poller lease lost by {lease.holder}, following the published snapshots")
+                self._leader.clear()
+            if held:
+                for name, wake in self._wake.items():
+                    if name not in published:
+                        wake.set()
+            self._stopping.wait(self.lease_seconds / 3)
+        if self._leader.is_set():
+            self._leader.clear()
+            try:
+                with self.app.app_context():
+                    lease.release()
+            except Exception:
+                logger.exception("Could not release the poller lease")
+
+
+poller = DashboardPoller()
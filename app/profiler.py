@@ -0,0 +1,119 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger('gunicorn.error')
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for production use, switched on with PROFILER_ENABLED.
+
+    A daemon thread samples the stacks of all other threads every
+    PROFILER_INTERVAL_MS and counts them, so the cost is bounded by the
+    sampling rate rather than by how much code runs. When disabled no thread
+    exists and nothing is hooked into the interpreter. Under the gevent worker
+    only the currently running greenlet is visible to a sample.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.interval = 0.01
+        self.max_stacks = 5000
+        self.max_depth = 64
+        self._stacks = Counter()
+        self._samples = 0
+        self._started_at = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('PROFILER_ENABLED', False))
+        self.interval = app.config.get('PROFILER_INTERVAL_MS', 10) / 1000
+        app.extensions['sampling_profiler'] = self
+
+    def ensure_started(self):
+        """Starts the sampling thread lazily, i.e. after gunicorn has forked the worker."""
+        if not self.enabled or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stacks = Counter()
+            self._samples = 0
+            self._started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        logger.info(f"Sampling profiler started, one sample every {self.interval * 1000:g}ms")
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            self.sample(skip=own)
+
+    def sample(self, skip=None):
+        """Records the current stack of every thread but `skip`."""
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip:
+                continue
+            stacks.append(self._collapse(frame))
+        with self._lock:
+            self._samples += 1
+            for stack in stacks:
+                if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                    self._stacks[stack] += 1
+                else:
+                    self._stacks['[truncated]'] += 1
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def report(self, limit=30):
+        """
+        Hottest functions by own (`self`) and cumulative (`total`) samples, plus
+        all stacks in collapsed format for flamegraph tools.
+        """
+        with self._lock:
+            stacks = dict(self._stacks)
+            samples = self._samples
+
+        own = Counter()
+        total = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+
+        return {
+            'enabled': self.enabled,
+            'interval_ms': self.interval * 1000,
+            'samples': samples,
+            'started_at': self._started_at,
+            'top_self': [{'function': name, 'samples': count} for name, count in own.most_common(limit)],
+            'top_total': [{'function': name, 'samples': count} for name, count in total.most_common(limit)],
+            'collapsed': '\n'.join(f"{stack} {count}" for stack, count in sorted(stacks.items())),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stacks = Counter()
+            self._samples = 0
+            self._started_at = time.time() if self._thread is not None else None
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger('gunicorn.error')
+
+PRIORITY_DASHBOARD = 'dashboard'
+PRIORITY_HEALTH = 'health'
+PRIORITY_SETTINGS = 'settings'
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class _Budget:
+    __slots__ = ('limit', 'remaining', 'reset_at', 'observed_at', 'blocked_until', 'tokens', 'refilled_at')
+
+    def __init__(self, burst):
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.observed_at = None
+        self.blocked_until = 0.0
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+
+    @property
+    def fraction_left(self):
+        if not self.limit or self.remaining is None:
+            return 1.0
+        return self.remaining / self.limit
+
+
+class GitHubRateLimiter:
+    """
+    Token-bucket scheduler for GitHub API calls, one budget per API token.
+
+    The bucket refills at the pace that spreads the remaining primary budget
+    (X-RateLimit-Remaining) until its reset, which also smooths the bursts that
+    trigger secondary limits. Lower priorities keep a reserve free for
+    dashboard refreshes: /health stops calling GitHub below the health reserve
+    and settings lookups below the settings reserve. Retry-After and exhausted
+    budgets block every call until GitHub allows requests again.
+    """
+
+    reserves = {PRIORITY_DASHBOARD: 0.0, PRIORITY_HEALTH: 0.1, PRIORITY_SETTINGS: 0.2}
+
+    def __init__(self, app=None):
+        self.burst = 20
+        self.default_rate = 5.0
+        self.max_wait = 5.0
+        self._budgets = {}
+        self._poll_due_at = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.burst = app.config.get('GITHUB_RATE_LIMIT_BURST', 20)
+        self.max_wait = app.config.get('GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS', 5.0)
+        self.reserves = {
+            PRIORITY_DASHBOARD: 0.0,
+            PRIORITY_HEALTH: app.config.get('GITHUB_RATE_LIMIT_HEALTH_RESERVE', 0.1),
+            PRIORITY_SETTINGS: app.config.get('GITHUB_RATE_LIMIT_SETTINGS_RESERVE', 0.2),
+        }
+        self.reset()
+        app.extensions['github_rate_limiter'] = self
+
+    @staticmethod
+    def token_id(authorization):
+        return hashlib.sha256((authorization or '').encode()).hexdigest()[:12]
+
+    def _budget(self, token_id):
+        budget = self._budgets.get(token_id)
+        if budget is None:
+            budget = self._budgets[token_id] = _Budget(self.burst)
+        return budget
+
+    def _refill_rate(self, budget):
+        if budget.remaining is None or budget.reset_at is None:
+            return self.default_rate
+        seconds_left = max(1.0, budget.reset_at - time.time())
+        return max(budget.remaining / seconds_left, 0.01)
+
+    def _refill(self, budget):
+        now = time.monotonic()
+        budget.tokens = min(float(self.burst), budget.tokens + (now - budget.refilled_at) * self._refill_rate(budget))
+        budget.refilled_at = now
+
+    def acquire(self, token_id, priority=PRIORITY_DASHBOARD):
+        """Takes one request slot or raises RateLimitExceeded. Only dashboard calls wait for a slot."""
+        wait = self.reserve(token_id, priority)
+        if wait > 0:
+            time.sleep(wait)
+
+    def reserve(self, token_id, priority=PRIORITY_DASHBOARD):
+        """Like acquire(), but returns the seconds to wait before sending instead of sleeping (for asyncio callers)."""
+        with self._lock:
+            budget = self._budget(token_id)
+            now = time.time()
+            if budget.blocked_until > now:
+                raise RateLimitExceeded(f"GitHub rate limit hit, retry in {int(budget.blocked_until - now)}s")
+            if budget.fraction_left < self.reserves.get(priority, 0.0):
+                raise RateLimitExceeded(f"GitHub budget is reserved for dashboard refreshes ({budget.remaining} left)")
+            self._refill(budget)
+            wait = 0.0 if budget.tokens >= 1 else (1 - budget.tokens) / self._refill_rate(budget)
+            if wait > 0 and (priority != PRIORITY_DASHBOARD or wait > self.max_wait):
+                raise RateLimitExceeded(f"GitHub request budget exhausted, next slot in {wait:.1f}s")
+            budget.tokens -= 1
+        return wait
+
+    def observe(self, token_id, response):
+        """Updates the budget from GitHub's rate-limit headers and secondary rate-limit responses."""
+        headers = response.headers
+        with self._lock:
+            budget = self._budget(token_id)
+            if 'X-RateLimit-Remaining' in headers:
+                try:
+                    budget.limit = int(headers.get('X-RateLimit-Limit', budget.limit or 0)) or None
+                    budget.remaining = int(headers['X-RateLimit-Remaining'])
+                    budget.reset_at = float(headers.get('X-RateLimit-Reset', 0)) or None
+                    budget.observed_at = time.time()
+                except ValueError:
+                    pass
+
+            if response.status_code in (403, 429):
+                retry_after = headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    budget.blocked_until = time.time() + int(retry_after)
+                elif budget.remaining == 0 and budget.reset_at:
+                    budget.blocked_until = budget.reset_at
+                if budget.blocked_until > time.time():
+                    logger.warning(f"GitHub rate limit hit, blocking calls for {int(budget.blocked_until - time.time())}s")
+
+    def poll_delay(self, base_interval, token_ids=None):
+        """
+        Stretches the polling interval as a token budget runs low: the most
+        drained one of `token_ids`, or of every token when not given.
+        """
+        with self._lock:
+            if token_ids is None:
+                budgets = list(self._budgets.values())
+            else:
+                budgets = [self._budgets[token_id] for token_id in token_ids if token_id in self._budgets]
+        delay = base_interval
+        now = time.time()
+        for budget in budgets:
+            if budget.blocked_until > now:
+                delay = max(delay, budget.blocked_until - now)
+                continue
+            fraction = budget.fraction_left
+            if fraction < 0.1:
+                factor = 8
+            elif fraction < 0.25:
+                factor = 4
+            elif fraction < 0.5:
+                factor = 2
+            else:
+                factor = 1
+            delay = max(delay, base_interval * factor)
+        return delay
+
+    def poll_due(self, token_id, base_interval):
+        """
+        Whether a poll with this token is due on a cadence of `base_interval`,
+        i.e. whether its own poll_delay has passed since the last due poll.
+        Polls up to half an interval early still count as due.
+        """
+        now = time.time()
+        with self._lock:
+            due_at = self._poll_due_at.get(token_id)
+            if due_at is not None and now + base_interval / 2 < due_at:
+                return False
+        delay = self.poll_delay(base_interval, [token_id])
+        with self._lock:
+            self._poll_due_at[token_id] = now + delay
+        return True
+
+    def state(self):
+        with self._lock:
+            budgets = dict(self._budgets)
+        now = time.time()
+        return {
+            token_id: {
+                'limit': budget.limit,
+                'remaining': budget.remaining,
+                'reset_at': budget.reset_at,
+                'observed_at': budget.observed_at,
+                'blocked_for_seconds': max(0, int(budget.blocked_until - now)),
+                'bucket_tokens': round(budget.tokens, 2),
+            }
+            for token_id, budget in budgets.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._budgets.clear()
+            self._poll_due_at.clear()
+
+
+rate_limiter = GitHubRateLimiter()
@@ -0,0 +1,83 @@
+"""
+Runner/agent level diffs between two dashboard snapshots.
+
+A dashboard payload is a tree of containers (GitHub and ADO organizations,
+runner groups and pools) whose leaves hold the runner or agent lists. Only the
+leaves are diffed, keyed by the container ids plus the item `id`; any other
+change (a group added, an error appearing, the partial flag flipping) is a
+structural change and callers fall back to sending the full payload.
+"""
+
+
+class DiffSpec:
+    """
+    Where the items of a payload live: `levels` is the chain of
+    (list_key, id_key) container lists from the root, and every innermost
+    container holds its items in `container[holder][items]` next to a
+    `total_count` that is derived from them.
+    """
+
+    def __init__(self, levels, holder, items, item_id='id'):
+        self.levels = levels
+        self.holder = holder
+        self.items = items
+        self.item_id = item_id
+
+
+GITHUB_RUNNERS = DiffSpec([['organizations', 'id'], ['groups', 'group_id']], 'runners_data', 'runners')
+ADO_AGENTS = DiffSpec([['organizations', 'id'], ['pools', 'id']], 'agents_data', 'agents')
+
+
+def index_items(data, spec):
+    """Maps (container ids..., item id) to the item for every leaf item of the payload."""
+    index = {}
+    for path, container in _containers(data, spec.levels, ()):
+        for item in (container.get(spec.holder) or {}).get(spec.items) or []:
+            index[path + (item.get(spec.item_id),)] = item
+    return index
+
+
+def failed_paths(data, spec):
+    """Paths of the innermost containers that carry an `error` instead of a current item list."""
+    return {path for path, container in _containers(data, spec.levels, ()) if container.get('error')}
+
+
+def structure(data, spec):
+    """The payload without its items, i.e. everything a delta cannot express."""
+    return _strip(data, spec, 0)
+
+
+def diff(previous, current, spec):
+    """
+    Returns {'added', 'removed', 'changed'} between two payloads, or None when
+    their structure differs and a full payload has to be sent instead.
+    """
+    if structure(previous, spec) != structure(current, spec):
+        return None
+    before = index_items(previous, spec)
+    after = index_items(current, spec)
+    return {
+        'added': [{'key': list(key), 'item': item} for key, item in after.items() if key not in before],
+        'removed': [{'key': list(key)} for key in before if key not in after],
+        'changed': [{'key': list(key), 'item': item} for key, item in after.items()
+                    if key in before and before[key] != item],
+    }
+
+
+def _containers(node, levels, path):
+    if not levels:
+        yield path, node
+        return
+    (list_key, id_key), rest = levels[0], levels[1:]
+    for child in node.get(list_key) or []:
+        yield from _containers(child, rest, path + (child.get(id_key),))
+
+
+def _strip(node, spec, depth):
+    if depth == len(spec.levels):
+        return {key: value for key, value in node.items() if key != spec.holder}
+    list_key = spec.levels[depth][0]
+    stripped = dict(node)
+    if list_key in stripped:
+        stripped[list_key] = [_strip(child, spec, depth + 1) for child in stripped[list_key] or []]
+    return stripped
@@ -0,0 +1,275 @@
+"""
+Indexed runner/agent queries on top of the dashboard snapshots.
+
+A RunnerStore holds the items of one snapshot column-wise, ordered by name,
+with the names and statuses interned. Item positions are indexed by bucket,
+i.e. by (runner group or pool, status, busy, enabled); a name prefix is a
+contiguous range of positions. A query picks the buckets its filters match,
+cuts every bucket down to the prefix range by bisection and merges them in
+the requested order, so it costs O(buckets * log(fleet) + page), not O(fleet).
+Counts per runner group or pool are computed once per snapshot.
+
+Cursors are keyset cursors (the sort value, name and path of the last item
+returned), so paging continues correctly after the snapshot changed.
+"""
+import base64
+import binascii
+import bisect
+import heapq
+import json
+import sys
+import threading
+from array import array
+from itertools import chain, islice
+
+from . import runner_diff
+from .poller import poller
+
+SORT_FIELDS = ('name', 'group', 'status', 'busy')
+
+# Snapshot payload shape and the names of its organization and group/pool containers
+SOURCES = {
+    'github': ('github_dashboard', runner_diff.GITHUB_RUNNERS, ('name', 'group_name')),
+    'ado': ('ado_dashboard', runner_diff.ADO_AGENTS, ('name', 'name')),
+}
+
+
+class RunnerStore:
+    """The runners or agents of one snapshot payload, see the module docstring."""
+
+    __slots__ = ('_groups', '_items', '_names', '_group_codes', '_buckets', 'facets')
+
+    def __init__(self, data, spec, name_keys):
+        self._groups = []
+        self.facets = []
+        records = []
+        for path, names, container in _containers(data, spec, name_keys):
+            code = len(self._groups)
+            self._groups.append((path, tuple(name.casefold() for name in names)))
+            facet = {'org_id': path[0], 'org': names[0], 'group_id': path[-1], 'group': names[-1],
+                     'total': 0, 'online': 0, 'offline': 0, 'busy': 0, 'enabled': 0, 'enabled_busy': 0}
+            if container.get('error'):
+                facet['error'] = container['error']
+            self.facets.append(facet)
+            for item in (container.get(spec.holder) or {}).get(spec.items) or []:
+                name = sys.intern(str(item.get('name') or '').casefold())
+                records.append((name, path, str(item.get(spec.item_id)), code, item))
+
+        records.sort(key=lambda record: record[:3])
+        self._items = [record[4] for record in records]
+        self._names = [record[0] for record in records]
+        self._group_codes = array('I', (record[3] for record in records))
+        self._buckets = {}
+        for position, item in enumerate(self._items):
+            code = self._group_codes[position]
+            status = sys.intern(str(item.get('status') or 'offline'))
+            busy = bool(item.get('busy'))
+            enabled = item.get('enabled') is not False
+            key = (code, status, busy, enabled)
+            positions = self._buckets.get(key)
+            if positions is None:
+                positions = self._buckets[key] = array('I')
+            positions.append(position)
+
+            facet = self.facets[code]
+            facet['total'] += 1
+            facet['online' if status == 'online' else 'offline'] += 1
+            facet['busy'] += busy
+            facet['enabled'] += enabled
+            facet['enabled_busy'] += busy and enabled
+
+    def __len__(self):
+        return len(self._items)
+
+    def query(self, orgs=None, groups=None, statuses=None, busy=None, enabled=None, prefix=None,
+              sort='name', descending=False, limit=50, cursor=None):
+        """
+        Items matching every given filter, at most `limit` of them after
+        `cursor`: {'items', 'total', 'next_cursor', 'facets'}. `orgs` are
+        organization names, `groups` group/pool ids or (org id, group id)
+        paths, `prefix` a case-insensitive name prefix. Raises ValueError for an
+        unknown sort field or a cursor of another sort order.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {sort}")
+        after = _decode_cursor(cursor, sort, descending) if cursor else None
+        codes = self._group_filter(orgs, groups)
+
+        if prefix:
+            prefix = prefix.casefold()
+            lo = bisect.bisect_left(self._names, prefix)
+            hi = bisect.bisect_left(self._names, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+        else:
+            lo, hi = 0, len(self._items)
+        if after is not None:
+            rank_after, count_lt, count_le = after[0], *self._count_before(after[1], tuple(after[2]))
+
+        classes = {}
+        total = 0
+        for key, positions in self._buckets.items():
+            code, status, item_busy, item_enabled = key
+            if (codes is not None and code not in codes) or (statuses and status not in statuses) \
+                    or (busy is not None and item_busy != busy) or (enabled is not None and item_enabled != enabled):
+                continue
+            start = bisect.bisect_left(positions, lo)
+            end = bisect.bisect_left(positions, hi, start)
+            total += end - start
+            rank = self._rank(sort, key)
+            if after is not None:
+                if (rank < rank_after) if not descending else (rank > rank_after):
+                    continue
+                if rank == rank_after:
+                    if descending:
+                        end = bisect.bisect_left(positions, count_lt, start, end)
+                    else:
+                        start = bisect.bisect_left(positions, count_le, start, end)
+            if start < end:
+                classes.setdefault(rank, []).append((positions, start, end))
+
+        ordered = chain.from_iterable(_ranked(rank, _merge(classes[rank], descending))
+                                      for rank in sorted(classes, reverse=descending))
+        page = list(islice(ordered, max(0, limit) + 1))
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            if page:
+                rank, position = page[-1]
+                next_cursor = _encode_cursor(sort, descending, rank, self._names[position], self._tie(position))
+        return {
+            'items': [self._items[position] for _, position in page],
+            'total': total,
+            'next_cursor': next_cursor,
+            'facets': [self.facets[code] for code in sorted(codes)] if codes is not None else self.facets,
+        }
+
+    def _group_filter(self, orgs, groups):
+        if not orgs and not groups:
+            return None
+        orgs = {org.casefold() for org in orgs or ()}
+        codes = set()
+        for code, (path, names) in enumerate(self._groups):
+            if orgs and names[0] not in orgs:
+                continue
+            if groups and path not in groups and path[-1] not in groups:
+                continue
+            codes.add(code)
+        return codes
+
+    def _rank(self, sort, key):
+        code, status, busy, _ = key
+        if sort == 'status':
+            return status
+        if sort == 'busy':
+            return busy
+        if sort == 'group':
+            path, names = self._groups[code]
+            return names + path
+        return 0
+
+    def _tie(self, position):
+        """Breaks ties between equal names, like the record sort in __init__."""
+        path = self._groups[self._group_codes[position]][0]
+        return list(path) + [str(self._items[position].get('id'))]
+
+    def _count_before(self, name, tie):
+        """Positions of items ordered before, and up to and including, (name, tie)."""
+        lo = bisect.bisect_left(self._names, name)
+        hi = bisect.bisect_right(self._names, name, lo)
+        count_lt = count_le = lo
+        for position in range(lo, hi):
+            item_tie = tuple(self._tie(position))
+            count_lt += item_tie < tie
+            count_le += item_tie <= tie
+        return count_lt, count_le
+
+def _merge(slices, descending):
+    """Positions of every (positions, start, end) bucket slice, merged in ascending or descending order."""
+    return heapq.merge(*(_walk_slice(positions, start, end, descending) for positions, start, end in slices),
+                       reverse=descending)
+
+
+def _walk_slice(positions, start, end, descending):
+    steps = range(end - 1, start - 1, -1) if descending else range(start, end)
+    return (positions[i] for i in steps)
+
+
+def _ranked(rank, positions):
+    return ((rank, position) for position in positions)
+
+
+def _containers(data, spec, name_keys):
+    """(ids path, names path, container) of every innermost container of a payload."""
+    def walk(node, depth, path, names):
+        if depth == len(spec.levels):
+            yield path, names, node
+            return
+        list_key, id_key = spec.levels[depth]
+        for child in node.get(list_key) or []:
+            yield from walk(child, depth + 1, path + (child.get(id_key),),
+                            names + (sys.intern(str(child.get(name_keys[depth]) or '')),))
+    return walk(data, 0, (), ())
+
+
+def _encode_cursor(sort, descending, rank, name, tie):
+    raw = json.dumps([sort, descending, rank, name, tie], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, sort, descending):
+    """(rank, name, tie) of a cursor handed out for the same sort order."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, rank, name, tie = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if (cursor_sort, cursor_descending) != (sort, descending):
+        raise ValueError("The cursor belongs to another sort order")
+    # Group ranks are tuples, which JSON turns into lists
+    return tuple(rank) if isinstance(rank, list) else rank, name, tie
+
+
+class RunnerStores:
+    """
+    The RunnerStore of each dashboard snapshot, built on the first query of a
+    snapshot version and kept until the next one.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._stores = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['runner_stores'] = self
+
+    @property
+    def page_size(self):
+        return max(1, int(self.app.config.get('RUNNER_PAGE_SIZE', 50)))
+
+    @property
+    def max_page_size(self):
+        return max(self.page_size, int(self.app.config.get('RUNNER_MAX_PAGE_SIZE', 500)))
+
+    def get(self, source):
+        """(snapshot, store) of a source; the store is None while the snapshot holds no good payload."""
+        name, spec, name_keys = SOURCES[source]
+        snapshot = poller.get_or_collect(name)
+        if snapshot.status_code != 200:
+            return snapshot, None
+        cached = self._stores.get(name)
+        if cached is not None and cached[0] == snapshot.version:
+            return snapshot, cached[1]
+        with self._lock:
+            cached = self._stores.get(name)
+            if cached is None or cached[0] != snapshot.version:
+                cached = self._stores[name] = (snapshot.version, RunnerStore(snapshot.data, spec, name_keys))
+        return snapshot, cached[1]
+
+    def reset(self):
+        self._stores = {}
+
+
+runner_stores = RunnerStores()
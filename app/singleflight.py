@@ -0,0 +1,64 @@
+import logging
+import threading
+
+logger = logging.getLogger('gunicorn.error')
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, every caller arriving while it is in flight waits for and shares
+    its result (or exception) instead of starting its own upstream fetch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            self._execute(key, call, fn)
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do_async(self, key, fn):
+        """Runs fn in a background thread unless a call for key is already in flight. Returns immediately."""
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+        threading.Thread(target=self._execute, args=(key, call, fn), name='singleflight', daemon=True).start()
+        return True
+
+    def in_flight(self, key):
+        return key in self._calls
+
+    def _execute(self, key, call, fn):
+        try:
+            call.result = fn()
+        except Exception as e:
+            logger.error(f"Coalesced call for {key} failed: {e}")
+            call.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
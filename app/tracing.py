@@ -0,0 +1,226 @@
+"""
+Lightweight timing spans for requests and snapshot collections.
+
+A trace is bound to the current context (request, poller refresh); code
+marks the interesting parts with `span('db')` or `@traced('decrypt')`, and
+the per-name totals end up in the Server-Timing header and a structured log
+line. Without an active trace a span is a shared no-op, so instrumented code
+costs one ContextVar lookup when tracing is off.
+"""
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('gunicorn.error')
+
+_current = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """Per-name span totals of one request or collection; spans may finish on other threads."""
+
+    __slots__ = ('name', 'started', 'duration', 'spans', 'annotations', '_lock')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = {}
+        self.annotations = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, count = self.spans.get(name, (0.0, 0))
+            self.spans[name] = (total + seconds, count + 1)
+
+    def annotate(self, timings, prefix=''):
+        """Attaches timings measured elsewhere (e.g. the collection behind a snapshot) without adding them up."""
+        for name, entry in (timings or {}).items():
+            self.annotations[prefix + name] = entry
+
+    def summary(self):
+        """{span: {'ms': total, 'count': calls}}, plus the trace's own 'total' once finished."""
+        with self._lock:
+            spans = dict(self.spans)
+        timings = {name: {'ms': round(total * 1000, 2), 'count': count} for name, (total, count) in spans.items()}
+        if self.duration is not None:
+            timings['total'] = {'ms': round(self.duration * 1000, 2), 'count': 1}
+        return timings
+
+    def server_timing(self):
+        entries = []
+        for name, entry in list(self.summary().items()) + list(self.annotations.items()):
+            value = f"{name};dur={entry['ms']}"
+            if entry['count'] > 1:
+                value += f';desc="{entry["count"]} calls"'
+            entries.append(value)
+        return ', '.join(entries)
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name):
+    """Context manager timing a block under `name` in the active trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.add(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def current():
+    return _current.get()
+
+
+def begin(name):
+    """Starts a trace in the current context; returns the token for finish()."""
+    return _current.set(Trace(name))
+
+
+def finish(token):
+    trace = _current.get()
+    _current.reset(token)
+    if trace is not None:
+        trace.duration = time.perf_counter() - trace.started
+    return trace
+
+
+def log_trace(trace, slow_ms, **fields):
+    """One structured (JSON) log line per trace; INFO when at least `slow_ms` long, DEBUG otherwise."""
+    level = logging.INFO if trace.duration * 1000 >= slow_ms else logging.DEBUG
+    if not logger.isEnabledFor(level):
+        return
+    record = {'event': 'trace', 'name': trace.name, 'duration_ms': round(trace.duration * 1000, 2)}
+    record.update(fields)
+    record['spans'] = trace.summary()
+    if trace.annotations:
+        record['annotations'] = trace.annotations
+    logger.log(level, json.dumps(record))
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with jsonify() responses timed as 'serialize'."""
+
+    def response(self, *args, **kwargs):
+        with span('serialize'):
+            return super().response(*args, **kwargs)
+
+
+class RequestTracer:
+    """
+    Flask extension tracing every request when TRACING_ENABLED is set: adds the
+    Server-Timing header, logs the spans and times SQL statements ('db') and
+    JSON responses ('serialize') without touching the views. The header only
+    goes to logged-in users; anonymous requests (/login, /health) are logged.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.slow_ms = 500
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('TRACING_ENABLED', False))
+        self.slow_ms = app.config.get('TRACING_SLOW_MS', 500)
+        app.extensions['request_tracer'] = self
+        if not self.enabled:
+            return
+
+        app.json = TimedJSONProvider(app)
+        if not getattr(Engine, '_request_tracer_listening', False):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            Engine._request_tracer_listening = True
+
+        app.before_request(self._begin)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+    @staticmethod
+    def _begin():
+        g._trace_token = begin(f"{request.method} {request.path}")
+
+    def _finish(self, response):
+        token = g.pop('_trace_token', None)
+        if token is not None:
+            trace = finish(token)
+            if current_user.is_authenticated:
+                response.headers['Server-Timing'] = trace.server_timing()
+            log_trace(trace, self.slow_ms, endpoint=request.endpoint, status=response.status_code)
+        return response
+
+    @staticmethod
+    def _teardown(exc):
+        # after_request is skipped when a view raised
+        token = g.pop('_trace_token', None)
+        if token is not None:
+            finish(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('_trace_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current.get()
+    started = conn.info.get('_trace_started')
+    if trace is not None and started:
+        trace.add('db', time.perf_counter() - started.pop())
+
+
+request_tracer = RequestTracer()
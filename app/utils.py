@@ -2,6 +2,8 @@ import os
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 
+from .tracing import traced
+
 load_dotenv()
 
 ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY')
@@ -15,6 +17,7 @@ def encrypt_data(data: str) -> str:
         return ""
     return fernet.encrypt(data.encode()).decode()
 
+@traced('decrypt')
 def decrypt_data(encrypted_data: str) -> str:
     if not encrypted_data:
         return ""
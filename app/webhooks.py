@@ -0,0 +1,322 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from sqlalchemy import delete, func, or_, select
+
+from .history import dialect_insert
+from .models import db, WebhookEvent
+from .poller import poller
+
+logger = logging.getLogger('gunicorn.error')
+
+Event = namedtuple('Event', 'id source event payload received_at')
+
+
+def github_signature_valid(secret, body, signature):
+    """Checks GitHub's X-Hub-Signature-256 header, an HMAC-SHA256 of the raw request body."""
+    if not secret or not signature:
+        return False
+    expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def secret_valid(secret, candidate):
+    """Constant-time check of a shared secret, e.g. the basic auth password of an ADO service hook."""
+    return bool(secret) and candidate is not None and hmac.compare_digest(secret.encode(), candidate.encode())
+
+
+class WebhookIngestor:
+    """
+    Applies webhook events to the dashboard snapshots, in batches.
+
+    Receiving only queues the delivery in memory, so the sender gets its answer
+    right away. Every worker moves its queue into the webhook_event table in
+    batches; the process that collects (the elected leader, see the poller)
+    reads new rows in id order and applies each batch to a snapshot with one
+    poller.apply(), i.e. one new version and one delta per batch. Workers that
+    do not poll in the background write and apply a delivery before answering.
+
+    While events arrive, the regular collection of a source only runs every
+    WEBHOOK_RECONCILE_SECONDS to correct what the events missed.
+    """
+
+    # Ids are handed out at insert but become visible at commit, so on PostgreSQL a
+    # batch that commits late can land below the cursor; missing ids are looked up
+    # again for this long before they count as rolled back or dropped as duplicates.
+    gap_seconds = 60
+    # Bounds the ids looked for again, e.g. after a jump of the PostgreSQL sequence
+    max_gaps = 10000
+
+    def __init__(self, app=None):
+        self.app = None
+        self._handlers = {}
+        self._queue = None
+        self._lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._cursor = None
+        self._gaps = {}
+        self._retry = []
+        self._seen = {}
+        self._last_applied = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self._queue = queue.Queue(maxsize=max(1, int(app.config.get('WEBHOOK_QUEUE_SIZE', 10000))))
+        app.extensions['webhook_ingestor'] = self
+
+    @property
+    def batch_size(self):
+        return max(1, int(self.app.config.get('WEBHOOK_BATCH_SIZE', 500)))
+
+    @property
+    def batch_seconds(self):
+        return max(0.05, float(self.app.config.get('WEBHOOK_BATCH_SECONDS', 1)))
+
+    @property
+    def reconcile_seconds(self):
+        return float(self.app.config.get('WEBHOOK_RECONCILE_SECONDS', 300))
+
+    @property
+    def retention_seconds(self):
+        return max(60.0, float(self.app.config.get('WEBHOOK_RETENTION_SECONDS', 3600)))
+
+    def register(self, source, snapshot_name, apply_event, ordering=None):
+        """
+        `apply_event(data, event) -> bool` patches a snapshot payload with one
+        event. `ordering(event) -> (subject, timestamp)` or None lets events that
+        arrive late for a subject (e.g. a runner) be skipped instead of applied.
+        """
+        self._handlers[source] = (snapshot_name, apply_event, ordering)
+
+    def submit(self, source, delivery_id, event, payload):
+        """Queues a verified delivery (`payload` is the raw JSON text); False when the queue is full."""
+        if delivery_id is None:
+            delivery_id = uuid.uuid4().hex
+        try:
+            self._queue.put_nowait((source, str(delivery_id)[:64], event[:64], payload, time.time()))
+        except queue.Full:
+            return False
+        if not poller.running:
+            self._start_cursor()
+            self.flush()
+            self.apply_pending()
+        return True
+
+    def reconcile_delay(self, source, interval):
+        """Poll delay of a source: WEBHOOK_RECONCILE_SECONDS while its events keep arriving, else `interval`."""
+        last_applied = self._last_applied.get(source)
+        if last_applied is None or time.time() - last_applied > self.reconcile_seconds:
+            return interval
+        return max(interval, self.reconcile_seconds)
+
+    def ensure_started(self):
+        """Starts this worker's writer and applier threads lazily, i.e. after gunicorn has forked it."""
+        if not self._handlers or not poller.running or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run_writer, name='webhook-write', daemon=True),
+                threading.Thread(target=self._run_applier, name='webhook-apply', daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def flush(self, first=None):
+        """
+        Writes every queued delivery (after a batch that failed before and
+        `first`) to the database, a batch per statement; returns how many. A
+        batch that cannot be written is kept for the next flush.
+        """
+        written = 0
+        with self._lock:
+            batch, self._retry = self._retry, []
+        if first is not None:
+            batch.append(first)
+        while True:
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return written
+            try:
+                self._write(batch)
+            except Exception:
+                # Redelivered rows are dropped by the unique delivery id, so a retry never duplicates one
+                with self._lock:
+                    self._retry = batch + self._retry
+                raise
+            written += len(batch)
+            batch = []
+
+    def _write(self, batch):
+        rows = [{'source': source, 'delivery_id': delivery_id, 'event': event, 'payload': payload, 'received_at': received_at}
+                for source, delivery_id, event, payload, received_at in batch]
+        with self.app.app_context():
+            db.session.execute(dialect_insert()(WebhookEvent).values(rows).on_conflict_do_nothing(
+                index_elements=['source', 'delivery_id']))
+            db.session.commit()
+
+    def apply_pending(self):
+        """Applies the stored events this process has not applied yet, a batch per snapshot update; returns how many."""
+        self._start_cursor()
+        with self._apply_lock, self.app.app_context():
+            if not poller.is_leader:
+                # Followers get the leader's result; they only keep up in case they take over
+                self._cursor = db.session.execute(
+                    select(func.coalesce(func.max(WebhookEvent.id), self._cursor))).scalar()
+                self._gaps.clear()
+                return 0
+            applied = 0
+            while True:
+                gaps = self._open_gaps()
+                new = WebhookEvent.id > self._cursor
+                rows = db.session.execute(
+                    select(WebhookEvent).where(or_(new, WebhookEvent.id.in_(gaps)) if gaps else new)
+                    .order_by(WebhookEvent.id).limit(self.batch_size)
+                ).scalars().all()
+                if not rows:
+                    return applied
+                events = {}
+                for row in rows:
+                    try:
+                        payload = json.loads(row.payload)
+                    except ValueError:
+                        payload = None
+                    if not isinstance(payload, dict):
+                        logger.warning(f"Skipping {row.source} webhook event #{row.id} without a JSON object")
+                        continue
+                    events.setdefault(row.source, []).append(
+                        Event(row.id, row.source, row.event, payload, row.received_at))
+                for source, batch in events.items():
+                    self._apply_batch(source, batch)
+                self._advance(row.id for row in rows)
+                applied += len(rows)
+                if len(rows) < self.batch_size:
+                    return applied
+
+    def _open_gaps(self):
+        """Ids below the cursor still looked for; the ones missing for gap_seconds are given up."""
+        expired = time.time() - self.gap_seconds
+        for event_id in [event_id for event_id, since in self._gaps.items() if since < expired]:
+            del self._gaps[event_id]
+        return list(self._gaps)
+
+    def _advance(self, ids):
+        """Moves the cursor past the applied `ids` (in order), noting the ids it skipped as gaps."""
+        now = time.time()
+        for event_id in ids:
+            if event_id <= self._cursor:
+                self._gaps.pop(event_id, None)
+                continue
+            for missing in range(max(self._cursor + 1, event_id - self.max_gaps), event_id):
+                self._gaps[missing] = now
+            self._cursor = event_id
+        for event_id in sorted(self._gaps)[:max(0, len(self._gaps) - self.max_gaps)]:
+            del self._gaps[event_id]
+
+    def _start_cursor(self):
+        """Events stored before this process started are part of what its first collection saw."""
+        if self._cursor is not None:
+            return
+        with self._apply_lock, self.app.app_context():
+            if self._cursor is None:
+                self._cursor = db.session.execute(select(func.coalesce(func.max(WebhookEvent.id), 0))).scalar()
+
+    def _apply_batch(self, source, events):
+        handler = self._handlers.get(source)
+        if handler is None:
+            return
+        snapshot_name, apply_event, ordering = handler
+        seen = {}
+
+        def mutate(data):
+            seen.clear()
+            changed = False
+            for event in events:
+                try:
+                    order = ordering(event) if ordering else None
+                    if order is not None:
+                        subject, timestamp = order
+                        latest = seen.get(subject)
+                        if latest is None and subject in self._seen:
+                            latest = self._seen[subject][0]
+                        if latest is not None and timestamp < latest:
+                            continue
+                        seen[subject] = timestamp
+                    changed = apply_event(data, event) or changed
+                except Exception:
+                    logger.exception(f"Could not apply {source} webhook event {event.event} #{event.id}")
+            return changed
+
+        if poller.apply(snapshot_name, mutate) is not None:
+            now = time.time()
+            self._seen.update((subject, (timestamp, now)) for subject, timestamp in seen.items())
+        self._last_applied[source] = time.time()
+
+    def prune(self, now=None):
+        """Drops stored events and the latest event times of subjects older than WEBHOOK_RETENTION_SECONDS."""
+        now = now if now is not None else time.time()
+        cutoff = now - self.retention_seconds
+        with self._apply_lock:
+            self._seen = {subject: entry for subject, entry in self._seen.items() if entry[1] >= cutoff}
+        with self.app.app_context():
+            db.session.execute(delete(WebhookEvent).where(WebhookEvent.received_at < cutoff))
+            db.session.commit()
+
+    def _run_writer(self):
+        while True:
+            try:
+                # Block for the first delivery, unless a failed batch waits for its retry,
+                # then give a burst a moment to fill the batch
+                first = self._queue.get() if not self._retry else None
+                time.sleep(min(0.2, self.batch_seconds))
+                self.flush(first)
+            except Exception:
+                logger.exception("Failed to store webhook events, retrying")
+                time.sleep(self.batch_seconds)
+
+    def _run_applier(self):
+        passes = 0
+        while True:
+            time.sleep(self.batch_seconds)
+            try:
+                self.apply_pending()
+                passes += 1
+                if passes % 600 == 0:
+                    self.prune()
+            except Exception:
+                logger.exception("Failed to apply webhook events")
+
+    def reset(self):
+        with self._apply_lock:
+            self._cursor = None
+            self._gaps = {}
+            self._seen = {}
+            self._last_applied = {}
+        with self._lock:
+            self._retry = []
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+webhook_ingestor = WebhookIngestor()
@@ -0,0 +1,278 @@
+"""
+End-to-end latency and throughput of the dashboards and /health against a fake upstream.
+
+Starts the fake GitHub/ADO/Jira server from mock_upstream.py, points the app
+at it, serves the app over real HTTP (threaded werkzeug server, background
+poller on) and drives every endpoint with concurrent logged-in clients. The
+JSON report carries the git commit and all parameters, so two runs can be
+compared; with --baseline the script exits 1 when an endpoint regressed.
+
+--orgs is the number of GitHub and of Azure DevOps organizations (the first
+GitHub one is the organization in Settings, the others additional ones with
+their own tokens); --groups is the runner groups or pools per organization.
+
+    ENCRYPTION_KEY=... python benchmarks/bench_end_to_end.py --clients 8 --duration 10 \\
+        --orgs 3 --groups 5 --runners 100 --latency-ms 80 --output before.json
+    ENCRYPTION_KEY=... python benchmarks/bench_end_to_end.py ... --baseline before.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.models import db, User, Setting, MonitoredGroup, GitHubConfig, AzureDevOpsConfig, MonitoredADOPool
+from app.poller import poller
+from app.utils import encrypt_data
+
+from mock_upstream import add_arguments, from_arguments, org_name
+
+# The dashboard pages load the counts of /api/runners; the full payloads serve API clients
+ENDPOINTS = ['/api/dashboard-data', '/api/azure-devops/dashboard-data', '/api/runners?source=github&limit=0',
+             '/api/runners?source=ado&limit=0', '/health']
+COMPARED = (('latency_ms', 'p50', 1), ('latency_ms', 'p99', 1), ('requests_per_second', None, -1))
+
+
+def build_app(instance_dir, upstream_url, args):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(instance_dir, 'bench.db')}",
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'bench-secret-key',
+        'GITHUB_API_URL': f"{upstream_url}/github",
+        'ADO_API_URL': f"{upstream_url}/ado",
+        'POLLER_ENABLED': not args.no_poller,
+        'POLL_INTERVAL_SECONDS': args.poll_interval,
+        'API_CACHE_SECONDS': args.poll_interval,
+        'ASYNC_UPSTREAM_ENABLED': args.async_upstream,
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.add(Setting(key='API_GITHUB_TOKEN', value=encrypt_data('bench-token')))
+        db.session.add(Setting(key='ORGANIZATION', value=org_name(0)))
+        db.session.add(Setting(key='JIRA_BASE_URL', value=f"{upstream_url}/jira"))
+        db.session.add(Setting(key='JIRA_EMAIL', value='bench@example.com'))
+        db.session.add(Setting(key='JIRA_API_TOKEN', value=encrypt_data('bench-token')))
+        for org in range(args.orgs):
+            org_id = 0
+            if org:
+                config = GitHubConfig(organization_name=org_name(org), api_token=encrypt_data(f'bench-token-{org}'))
+                db.session.add(config)
+                db.session.flush()
+                org_id = config.id
+            for group in range(1, args.groups + 1):
+                db.session.add(MonitoredGroup(id=group, org_id=org_id, name=f"group-{group}"))
+        for org in range(args.orgs):
+            config = AzureDevOpsConfig(organization_name=org_name(org), pat_token=encrypt_data('bench-pat'))
+            db.session.add(config)
+            db.session.flush()
+            for pool in range(1, args.groups + 1):
+                db.session.add(MonitoredADOPool(pool_id=pool, pool_name=f"pool-{pool}", ado_config_id=config.id))
+        db.session.commit()
+    return app
+
+
+def logged_in_session(base_url):
+    session = requests.Session()
+    response = session.post(f"{base_url}/login", data={'username': 'bench', 'password': 'bench'},
+                            allow_redirects=False)
+    assert response.status_code == 302, f"Login failed with {response.status_code}"
+    return session
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(latencies, statuses, elapsed):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': sum(count for status, count in statuses.items() if status != 200),
+        'status_codes': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'requests_per_second': round(len(values) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(values) / len(values) * 1000, 3) if values else None,
+            'p50': round(percentile(values, 0.50) * 1000, 3) if values else None,
+            'p90': round(percentile(values, 0.90) * 1000, 3) if values else None,
+            'p99': round(percentile(values, 0.99) * 1000, 3) if values else None,
+            'max': round(values[-1] * 1000, 3) if values else None,
+        },
+    }
+
+
+def load(base_url, endpoint, clients, duration):
+    """Closed loop: every client sends its next request as soon as the last one finished."""
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    sessions = [logged_in_session(base_url) for _ in range(clients)]
+    start_barrier = threading.Barrier(clients + 1)
+    stop_at = []
+
+    def client(session):
+        own_latencies, own_statuses = [], Counter()
+        start_barrier.wait()
+        while time.perf_counter() < stop_at[0]:
+            started = time.perf_counter()
+            try:
+                status = session.get(f"{base_url}{endpoint}").status_code
+            except requests.RequestException:
+                status = 'connection_error'
+            own_latencies.append(time.perf_counter() - started)
+            own_statuses[status] += 1
+        with lock:
+            latencies.extend(own_latencies)
+            statuses.update(own_statuses)
+
+    threads = [threading.Thread(target=client, args=(session,)) for session in sessions]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    stop_at.append(started + duration)
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for session in sessions:
+        session.close()
+    return summarize(latencies, statuses, elapsed)
+
+
+def git_revision():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def compare(report, baseline, threshold):
+    """Relative change of p50, p99 and throughput per endpoint; worse than `threshold` is a regression."""
+    comparison = {}
+    regressions = []
+    for endpoint, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if previous is None:
+            continue
+        comparison[endpoint] = {}
+        for field, key, worse_sign in COMPARED:
+            old = previous[field][key] if key else previous[field]
+            new = current[field][key] if key else current[field]
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            name = key or field
+            comparison[endpoint][name] = {'baseline': old, 'current': new, 'change': round(change, 4)}
+            if change * worse_sign > threshold:
+                regressions.append(f"{endpoint} {name}: {old} -> {new} ({change:+.1%})")
+    return {
+        'baseline_commit': baseline.get('meta', {}).get('git_commit'),
+        'threshold': threshold,
+        'endpoints': comparison,
+        'regressions': regressions,
+    }
+
+
+def run(args):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    collections = defaultdict(list)
+    poller.add_listener(lambda name, previous, snapshot: collections[name].append(snapshot.duration))
+
+    with from_arguments(args) as upstream, tempfile.TemporaryDirectory() as instance_dir:
+        app = build_app(instance_dir, upstream.url, args)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            # The first request of each endpoint collects its snapshot inline
+            cold = {}
+            session = logged_in_session(base_url)
+            for endpoint in args.endpoints:
+                started = time.perf_counter()
+                status = session.get(f"{base_url}{endpoint}").status_code
+                cold[endpoint] = {'status': status, 'latency_ms': round((time.perf_counter() - started) * 1000, 3)}
+            session.close()
+
+            endpoints = {endpoint: load(base_url, endpoint, args.clients, args.duration)
+                         for endpoint in args.endpoints}
+        finally:
+            server.shutdown()
+            poller.stop()
+        upstream_stats = upstream.stats()
+
+    commit, dirty = git_revision()
+    report = {
+        'benchmark': 'end_to_end',
+        'meta': {
+            'git_commit': commit,
+            'git_dirty': dirty,
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'parameters': {key: value for key, value in sorted(vars(args).items()) if key not in ('output', 'baseline')},
+        'cold_start': cold,
+        'endpoints': endpoints,
+        'collections': {name: {
+            'count': len(durations),
+            'p50_ms': round(percentile(sorted(durations), 0.5) * 1000, 3),
+            'max_ms': round(max(durations) * 1000, 3),
+        } for name, durations in sorted(collections.items())},
+        'upstream': upstream_stats,
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report['comparison'] = compare(report, json.load(baseline_file), args.threshold)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients per endpoint')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per endpoint')
+    parser.add_argument('--endpoints', nargs='+', default=ENDPOINTS)
+    parser.add_argument('--poll-interval', type=float, default=5.0, help='POLL_INTERVAL_SECONDS of the app')
+    parser.add_argument('--no-poller', action='store_true', help='collect on demand instead of in the background')
+    parser.add_argument('--async-upstream', action='store_true', help='ASYNC_UPSTREAM_ENABLED')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative change of p50/p99/throughput counted as a regression')
+    args = parser.parse_args()
+
+    report = run(args)
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(body + '\n')
+    else:
+        print(body)
+    regressions = report.get('comparison', {}).get('regressions')
+    if regressions:
+        print('Regressions:\n  ' + '\n  '.join(regressions), file=sys.stderr)
+        sys.exit(1)
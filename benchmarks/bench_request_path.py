@@ -0,0 +1,86 @@
+"""
+Requests/second and DB queries per request of /api/dashboard-data with a warm snapshot.
+
+Measures the per-request overhead of the app itself (auth gate, user loading,
+snapshot serving) for a logged-in dashboard poll; upstream APIs are mocked and
+only hit once to warm the snapshot.
+
+    ENCRYPTION_KEY=... python benchmarks/bench_request_path.py --requests 2000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests_mock
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, User, Setting, MonitoredGroup
+from app.utils import encrypt_data
+
+
+def build_app(instance_dir):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(instance_dir, 'bench.db')}",
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'bench-secret-key',
+        'POLLER_ENABLED': False,
+        'POLL_INTERVAL_SECONDS': 3600,
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.add(Setting(key='API_GITHUB_TOKEN', value=encrypt_data('bench-token')))
+        db.session.add(Setting(key='ORGANIZATION', value='bench-org'))
+        db.session.add(MonitoredGroup(id=1, name='Linux'))
+        db.session.commit()
+    return app
+
+
+def run(total_requests):
+    with tempfile.TemporaryDirectory() as instance_dir:
+        app = build_app(instance_dir)
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+        runners = [{'id': i, 'name': f'runner-{i}', 'status': 'online', 'busy': i % 3 == 0} for i in range(200)]
+        with requests_mock.Mocker() as upstream:
+            upstream.get('https://api.github.com/orgs/bench-org/actions/runner-groups/1/runners',
+                         json={'total_count': len(runners), 'runners': runners})
+            assert client.get('/api/dashboard-data').status_code == 200
+
+        queries = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda *args: queries.append(1)
+        event.listen(engine, 'before_cursor_execute', listener)
+
+        started = time.perf_counter()
+        for _ in range(total_requests):
+            response = client.get('/api/dashboard-data')
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - started
+        event.remove(engine, 'before_cursor_execute', listener)
+
+        return {
+            'endpoint': '/api/dashboard-data',
+            'requests': total_requests,
+            'requests_per_second': round(total_requests / elapsed, 1),
+            'mean_latency_ms': round(elapsed / total_requests * 1000, 3),
+            'db_queries_per_request': round(len(queries) / total_requests, 2),
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests), indent=2))
@@ -0,0 +1,312 @@
+"""
+Local fake of the GitHub, Azure DevOps and Jira endpoints the dashboards call.
+
+Serves N organizations x M runner groups / agent pools x K runners from one
+threaded HTTP server, with configurable latency, page size, rate-limit
+headers and injected failures, and counts what it was asked for:
+
+    /github/orgs/{org}/actions/runner-groups[/{id}/runners|/{id}/hosted-runners]
+    /github/orgs/{org}/actions/hosted-runners
+    /ado/{org}/_apis/distributedtask/pools/{id}/agents[/{agent_id}]
+    /ado/{org}/_apis/projects
+    /jira/status
+
+Point GITHUB_API_URL at `{url}/github`, ADO_API_URL at `{url}/ado` and the
+Jira base URL at `{url}/jira`. Run standalone to poke at it by hand:
+
+    python benchmarks/mock_upstream.py --port 8099 --runners 50 --latency-ms 80
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+GITHUB_ROUTES = [
+    ('github.runner_groups', re.compile(r'^/orgs/(?P<org>[^/]+)/actions/runner-groups$')),
+    ('github.runners', re.compile(r'^/orgs/(?P<org>[^/]+)/actions/runner-groups/(?P<group>\d+)/runners$')),
+    ('github.group_hosted_runners', re.compile(r'^/orgs/(?P<org>[^/]+)/actions/runner-groups/(?P<group>\d+)/hosted-runners$')),
+    ('github.hosted_runners', re.compile(r'^/orgs/(?P<org>[^/]+)/actions/hosted-runners$')),
+]
+ADO_ROUTES = [
+    ('ado.agents', re.compile(r'^/(?P<org>[^/]+)/_apis/distributedtask/pools/(?P<pool>\d+)/agents$')),
+    ('ado.agent', re.compile(r'^/(?P<org>[^/]+)/_apis/distributedtask/pools/(?P<pool>\d+)/agents/(?P<agent>\d+)$')),
+    ('ado.projects', re.compile(r'^/(?P<org>[^/]+)/_apis/projects$')),
+]
+
+
+def org_name(index):
+    return f"org-{index}"
+
+
+class MockUpstream:
+    """
+    The fake upstream and its knobs. Runner state is derived from the ids, so a
+    page is identical between calls (and revalidates with 304) unless `churn`
+    is set, in which case that fraction of runners flips busy every second.
+    """
+
+    def __init__(self, orgs=1, groups=4, runners=50, latency_ms=50.0, jitter_ms=0.0, page_size=100,
+                 failure_rate=0.0, rate_limit=5000, churn=0.0, seed=1, host='127.0.0.1', port=0):
+        self.orgs = orgs
+        self.groups = groups
+        self.runners = runners
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.page_size = page_size
+        self.failure_rate = failure_rate
+        self.rate_limit = rate_limit
+        self.churn = churn
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._statuses = Counter()
+        # Authorization header -> [remaining, reset], like GitHub's per-token budgets
+        self._rate_budgets = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """Requests served by route, and responses by status code."""
+        with self._lock:
+            return {
+                'requests': sum(self._requests.values()),
+                'by_route': dict(sorted(self._requests.items())),
+                'by_status': {str(status): count for status, count in sorted(self._statuses.items())},
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._requests.clear()
+            self._statuses.clear()
+
+    # -- fake data ---------------------------------------------------------
+
+    def _is_busy(self, group, runner):
+        busy = (group * 7 + runner) % 3 == 0
+        if self.churn:
+            tick = int(time.time())
+            digest = hashlib.blake2b(f"{group}:{runner}:{tick}".encode(), digest_size=2).digest()
+            if int.from_bytes(digest, 'big') / 65536 < self.churn:
+                busy = not busy
+        return busy
+
+    def _runner_id(self, group, runner):
+        return group * 100000 + runner + 1
+
+    def _github_runners(self, group):
+        return [{
+            'id': self._runner_id(group, i),
+            'name': f"runner-{group}-{i}",
+            'os': 'Linux',
+            'status': 'offline' if i % 10 == 9 else 'online',
+            'busy': self._is_busy(group, i),
+            'labels': [{'id': 1, 'name': 'self-hosted', 'type': 'read-only'}],
+        } for i in range(self.runners)]
+
+    def _github_hosted_runners(self, group):
+        return [{
+            'id': self._runner_id(group, i),
+            'name': f"hosted-{group}-{i}",
+            'status': 'Running' if self._is_busy(group, i) else 'Ready',
+        } for i in range(self.runners)]
+
+    def _ado_agent(self, pool, i, assigned=False, last_completed=False):
+        """Agents ending in 7 never ran a job, so they have no last completed request."""
+        agent = {
+            'id': self._runner_id(pool, i),
+            'name': f"agent-{pool}-{i}",
+            'status': 'offline' if i % 10 == 9 else 'online',
+            'enabled': True,
+            'version': '3.236.1',
+        }
+        if assigned and self._is_busy(pool, i):
+            agent['assignedRequest'] = {'requestId': agent['id'], 'planType': 'Build',
+                                        'definition': {'name': f"pipeline-{pool}"}}
+        if last_completed and i % 10 != 7:
+            agent['lastCompletedRequest'] = {'requestId': agent['id'] - 1, 'result': 'succeeded',
+                                             'finishTime': '2025-01-01T00:00:00Z'}
+        return agent
+
+    # -- HTTP ----------------------------------------------------------------
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                upstream._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _handle(self, handler):
+        parts = urlsplit(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        route, params = self._route(parts.path)
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self._requests[route or 'unknown'] += 1
+            failed = route is not None and self.failure_rate and self._random.random() < self.failure_rate
+
+        if route is None:
+            status, body, headers = 404, {'message': 'Not Found'}, {}
+        elif failed:
+            status, body, headers = 500, {'message': 'Injected failure'}, {}
+        elif route.startswith('github.'):
+            status, body, headers = self._github(handler, route, params, query)
+        elif route.startswith('ado.'):
+            status, body, headers = self._ado(route, params, query)
+        else:
+            status, body, headers = 200, {'state': 'RUNNING'}, {}
+
+        with self._lock:
+            self._statuses[status] += 1
+        self._respond(handler, status, body, headers)
+
+    @staticmethod
+    def _route(path):
+        if path == '/jira/status':
+            return 'jira.status', {}
+        for prefix, routes in (('/github', GITHUB_ROUTES), ('/ado', ADO_ROUTES)):
+            if path.startswith(prefix + '/'):
+                for route, pattern in routes:
+                    match = pattern.match(path[len(prefix):])
+                    if match:
+                        return route, match.groupdict()
+        return None, {}
+
+    def _github(self, handler, route, params, query):
+        with self._lock:
+            budget = self._rate_budgets.setdefault(handler.headers.get('Authorization'), [self.rate_limit, 0])
+            if time.time() >= budget[1]:
+                budget[:] = [self.rate_limit, int(time.time()) + 3600]
+            exhausted = budget[0] <= 0
+            if not exhausted:
+                budget[0] -= 1
+            headers = {
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(0, budget[0])),
+                'X-RateLimit-Reset': str(budget[1]),
+                'X-RateLimit-Resource': 'core',
+            }
+        if exhausted:
+            return 403, {'message': 'API rate limit exceeded'}, headers
+
+        if route == 'github.runner_groups':
+            headers['github-authentication-token-expiration'] = '2099-01-01 00:00:00 +0000'
+            headers['x-accepted-github-permissions'] = 'organization_self_hosted_runners=read'
+            groups = [{'id': group + 1, 'name': f"group-{group + 1}"} for group in range(self.groups)]
+            return 200, {'total_count': len(groups), 'runner_groups': groups}, headers
+
+        group = int(params.get('group', 0))
+        items = self._github_runners(group) if route == 'github.runners' else self._github_hosted_runners(group)
+        per_page = min(int(query.get('per_page', 30)), self.page_size)
+        page = int(query.get('page', 1))
+        page_items = items[(page - 1) * per_page:page * per_page]
+        if page * per_page < len(items):
+            path = urlsplit(handler.path).path
+            headers['Link'] = (f'<http://{handler.headers["Host"]}{path}?per_page={per_page}&page={page + 1}>; '
+                               f'rel="next"')
+
+        body = {'total_count': len(items), 'runners': page_items}
+        etag = '"' + hashlib.blake2b(json.dumps(body, sort_keys=True).encode(), digest_size=8).hexdigest() + '"'
+        headers['ETag'] = etag
+        if handler.headers.get('If-None-Match') == etag:
+            return 304, None, headers
+        return 200, body, headers
+
+    def _ado(self, route, params, query):
+        if route == 'ado.projects':
+            return 200, {'count': 1, 'value': [{'id': '1', 'name': 'project'}]}, {}
+        pool = int(params['pool'])
+        assigned = query.get('includeAssignedRequest') == 'true'
+        last_completed = query.get('includeLastCompletedRequest') == 'true'
+        if route == 'ado.agents':
+            start = int(query.get('continuationToken', 0))
+            end = min(start + self.page_size, self.runners)
+            agents = [self._ado_agent(pool, i, assigned, last_completed) for i in range(start, end)]
+            headers = {'x-ms-continuationtoken': str(end)} if end < self.runners else {}
+            return 200, {'count': len(agents), 'value': agents}, headers
+        index = int(params['agent']) - pool * 100000 - 1
+        if not 0 <= index < self.runners:
+            return 404, {'message': 'Agent not found'}, {}
+        return 200, self._ado_agent(pool, index, assigned, last_completed), {}
+
+    @staticmethod
+    def _respond(handler, status, body, headers):
+        payload = b'' if body is None else json.dumps(body).encode()
+        handler.send_response(status)
+        if body is not None:
+            handler.send_header('Content-Type', 'application/json; charset=utf-8')
+        handler.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+
+def add_arguments(parser):
+    parser.add_argument('--orgs', type=int, default=1, help='Azure DevOps organizations')
+    parser.add_argument('--groups', type=int, default=4, help='GitHub runner groups and ADO pools per organization')
+    parser.add_argument('--runners', type=int, default=50, help='runners / agents per group or pool')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='added to every upstream response')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='random extra latency, 0..jitter')
+    parser.add_argument('--page-size', type=int, default=100, help='largest GitHub page and ADO agent listing page the fake serves')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of upstream calls answered with 500')
+    parser.add_argument('--rate-limit', type=int, default=5000, help='GitHub requests per token and rate-limit window')
+    parser.add_argument('--churn', type=float, default=0.0, help='fraction of runners flipping busy every second')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def from_arguments(args, port=0):
+    return MockUpstream(orgs=args.orgs, groups=args.groups, runners=args.runners, latency_ms=args.latency_ms,
+                        jitter_ms=args.jitter_ms, page_size=args.page_size, failure_rate=args.failure_rate,
+                        rate_limit=args.rate_limit, churn=args.churn, seed=args.seed, port=port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--port', type=int, default=8099)
+    args = parser.parse_args()
+    with from_arguments(args, port=args.port) as upstream:
+        print(f"Serving fake upstream on {upstream.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(json.dumps(upstream.stats(), indent=2))
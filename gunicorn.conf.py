@@ -0,0 +1,20 @@
+# Gunicorn settings, overridable through GUNICORN_* environment variables.
+#
+# The gthread worker serves each request from a real thread, which the poller,
+# lease and webhook threads, the fan-out pools and the blocking database drivers
+# rely on. The dashboard streams (/api/*/stream) are time-bounded long-polls: a
+# viewer holds a thread for up to SSE_LONG_POLL_SECONDS, then reconnects after
+# SSE_RETRY_SECONDS, so each worker serves about
+# threads * (SSE_LONG_POLL_SECONDS + SSE_RETRY_SECONDS) / SSE_LONG_POLL_SECONDS
+# idle viewers before other requests queue.
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+accesslog = '-'
+errorlog = '-'
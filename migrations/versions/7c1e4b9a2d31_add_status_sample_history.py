@@ -0,0 +1,43 @@
+"""Add status sample history
+
+Revision ID: 7c1e4b9a2d31
+Revises: 394065929e1c
+Create Date: 2026-10-17 07:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4b9a2d31'
+down_revision = '394065929e1c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('status_sample',
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('org_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('group_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('resolution', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('total_sum', sa.Integer(), nullable=False),
+    sa.Column('online_sum', sa.Integer(), nullable=False),
+    sa.Column('offline_sum', sa.Integer(), nullable=False),
+    sa.Column('busy_sum', sa.Integer(), nullable=False),
+    sa.Column('enabled_sum', sa.Integer(), nullable=False),
+    sa.Column('busy_max', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('source', 'org_id', 'group_id', 'resolution', 'bucket')
+    )
+    with op.batch_alter_table('status_sample', schema=None) as batch_op:
+        batch_op.create_index('ix_status_sample_retention', ['resolution', 'bucket'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('status_sample', schema=None) as batch_op:
+        batch_op.drop_index('ix_status_sample_retention')
+
+    op.drop_table('status_sample')
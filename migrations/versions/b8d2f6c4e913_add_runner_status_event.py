@@ -0,0 +1,44 @@
+"""Add runner status event log
+
+Revision ID: b8d2f6c4e913
+Revises: 7c1e4b9a2d31
+Create Date: 2026-10-17 07:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2f6c4e913'
+down_revision = '7c1e4b9a2d31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('runner_status_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('org_id', sa.Integer(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('runner_id', sa.Integer(), nullable=False),
+    sa.Column('runner_name', sa.String(length=200), nullable=True),
+    sa.Column('old_state', sa.String(length=16), nullable=False),
+    sa.Column('new_state', sa.String(length=16), nullable=False),
+    sa.Column('occurred_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('runner_status_event', schema=None) as batch_op:
+        batch_op.create_index('ix_runner_status_event_runner', ['source', 'runner_id', 'occurred_at'], unique=False)
+        batch_op.create_index('ix_runner_status_event_group', ['source', 'org_id', 'group_id', 'occurred_at'], unique=False)
+        batch_op.create_index('ix_runner_status_event_time', ['occurred_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('runner_status_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_runner_status_event_time')
+        batch_op.drop_index('ix_runner_status_event_group')
+        batch_op.drop_index('ix_runner_status_event_runner')
+
+    op.drop_table('runner_status_event')
@@ -0,0 +1,32 @@
+"""Lead the runner status event indexes with the runner and group
+
+Revision ID: c5f8a2d6b937
+Revises: a7e3c9d1b524
+Create Date: 2026-10-17 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f8a2d6b937'
+down_revision = 'a7e3c9d1b524'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('runner_status_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_runner_status_event_group')
+        batch_op.drop_index('ix_runner_status_event_runner')
+        batch_op.create_index('ix_runner_status_event_runner', ['runner_id', 'occurred_at', 'id'], unique=False)
+        batch_op.create_index('ix_runner_status_event_group', ['group_id', 'occurred_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('runner_status_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_runner_status_event_group')
+        batch_op.drop_index('ix_runner_status_event_runner')
+        batch_op.create_index('ix_runner_status_event_runner', ['source', 'runner_id', 'occurred_at'], unique=False)
+        batch_op.create_index('ix_runner_status_event_group', ['source', 'org_id', 'group_id', 'occurred_at'], unique=False)
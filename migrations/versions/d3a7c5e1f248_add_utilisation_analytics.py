@@ -0,0 +1,50 @@
+"""Add utilisation analytics
+
+Revision ID: d3a7c5e1f248
+Revises: b8d2f6c4e913
+Create Date: 2026-10-17 08:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7c5e1f248'
+down_revision = 'b8d2f6c4e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('time_to_idle_bin',
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('org_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('group_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('resolution', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('bin', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('source', 'org_id', 'group_id', 'resolution', 'bucket', 'bin')
+    )
+    with op.batch_alter_table('time_to_idle_bin', schema=None) as batch_op:
+        batch_op.create_index('ix_time_to_idle_bin_retention', ['resolution', 'bucket'], unique=False)
+
+    with op.batch_alter_table('status_sample', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('saturated_sum', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('runner_status_event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('state_seconds', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('runner_status_event', schema=None) as batch_op:
+        batch_op.drop_column('state_seconds')
+
+    with op.batch_alter_table('status_sample', schema=None) as batch_op:
+        batch_op.drop_column('saturated_sum')
+
+    with op.batch_alter_table('time_to_idle_bin', schema=None) as batch_op:
+        batch_op.drop_index('ix_time_to_idle_bin_retention')
+
+    op.drop_table('time_to_idle_bin')
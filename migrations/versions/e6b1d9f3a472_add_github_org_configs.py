@@ -0,0 +1,41 @@
+"""Add GitHub organization configs
+
+Revision ID: e6b1d9f3a472
+Revises: d3a7c5e1f248
+Create Date: 2026-10-17 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b1d9f3a472'
+down_revision = 'd3a7c5e1f248'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('github_config',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('organization_name', sa.String(length=100), nullable=False),
+    sa.Column('api_token', sa.String(length=512), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('organization_name')
+    )
+
+    # Existing groups belong to the organization in Settings (org_id 0); group ids
+    # are only unique within an organization, so the key becomes (id, org_id).
+    with op.batch_alter_table('monitored_group', schema=None, recreate='always') as batch_op:
+        batch_op.add_column(sa.Column('org_id', sa.Integer(), server_default='0', autoincrement=False, nullable=False))
+        batch_op.create_primary_key('pk_monitored_group', ['id', 'org_id'])
+
+
+def downgrade():
+    op.execute('DELETE FROM monitored_group WHERE org_id != 0')
+    with op.batch_alter_table('monitored_group', schema=None, recreate='always') as batch_op:
+        batch_op.drop_column('org_id')
+        batch_op.create_primary_key('pk_monitored_group', ['id'])
+
+    op.drop_table('github_config')
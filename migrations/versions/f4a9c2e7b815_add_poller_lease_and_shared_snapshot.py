@@ -0,0 +1,43 @@
+"""Add poller lease and shared snapshots
+
+Revision ID: f4a9c2e7b815
+Revises: e6b1d9f3a472
+Create Date: 2026-10-17 12:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a9c2e7b815'
+down_revision = 'e6b1d9f3a472'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('poller_lease',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('holder', sa.String(length=128), nullable=False),
+    sa.Column('acquired_at', sa.Float(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('shared_snapshot',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('generated_at', sa.Float(), nullable=False),
+    sa.Column('duration', sa.Float(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('last_error_at', sa.Float(), nullable=True),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('holder', sa.String(length=128), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('shared_snapshot')
+    op.drop_table('poller_lease')
@@ -4,6 +4,15 @@ import pytest
 from app import create_app
 from app.models import db, User, Setting
 from app.utils import encrypt_data
+from app.poller import poller
+from app.cache import api_cache
+from app.metrics import counters
+from app.ratelimit import rate_limiter
+from app.config_cache import config_cache
+from app.broadcast import broadcaster
+from app.exporter import metrics_exporter
+from app.webhooks import webhook_ingestor
+from app.runner_store import runner_stores
 from sqlalchemy import text
 
 @pytest.fixture(scope='module')
@@ -46,6 +55,17 @@ def db_session(test_app):
                 connection.execute(table.delete())
             transaction.commit()
 
+        # Snapshots collected in one test must not leak into the next one
+        poller.reset()
+        api_cache.clear()
+        counters.reset()
+        rate_limiter.reset()
+        config_cache.invalidate()
+        broadcaster.reset()
+        metrics_exporter.reset()
+        webhook_ingestor.reset()
+        runner_stores.reset()
+
 
 @pytest.fixture()
 def auth_client(client, db_session):
@@ -0,0 +1,106 @@
+# tests/test_analytics.py
+
+import random
+import time
+
+from app.analytics import runner_analytics, duration_bin
+from app.cache import api_cache
+from app.history import status_history, RESOLUTION_HOUR, RESOLUTION_DAY, SOURCE_GITHUB
+from app.models import db, Setting, MonitoredGroup, StatusSample, TimeToIdleBin
+from app.poller import poller
+
+DAY = 86400
+RUNNERS_URL = 'https://api.github.com/orgs/test-org/actions/runner-groups/3/runners'
+
+
+def _count(group_id, busy, online):
+    return {'org_id': 0, 'group_id': group_id, 'total': online, 'online': online, 'offline': 0,
+            'busy': busy, 'enabled': online, 'saturated': 1 if online and busy >= online else 0}
+
+
+def _busy_period(seconds, at, group_id=3):
+    return {'org_id': 0, 'group_id': group_id, 'runner_id': 1, 'old_state': 'busy', 'new_state': 'idle',
+            'occurred_at': at, 'state_seconds': seconds}
+
+
+def test_busy_ratio_and_saturation_come_from_the_rollups():
+    now = time.time()
+    status_history.record(SOURCE_GITHUB, [_count(3, busy=4, online=4)], at=now - 3600)
+    status_history.record(SOURCE_GITHUB, [_count(3, busy=1, online=4)], at=now - 1800)
+    status_history.record(SOURCE_GITHUB, [_count(3, busy=1, online=2)], at=now - 600)
+
+    group, = runner_analytics.report(SOURCE_GITHUB, now - DAY, now)['groups']
+
+    assert group['busy_ratio'] == round(6 / 10, 4)
+    assert group['saturation_ratio'] == round(1 / 3, 4)
+    assert group['peak_busy'] == 4
+    assert group['saturated_seconds'] > 0
+
+
+def test_time_to_idle_percentiles_track_the_exact_values():
+    """Histogram percentiles stay within one bin (~9%) of the exact nearest-rank percentiles."""
+    now = time.time()
+    rng = random.Random(7)
+    durations = sorted(rng.expovariate(1 / 600) + 5 for _ in range(2000))
+    runner_analytics.record_time_to_idle(SOURCE_GITHUB, [_busy_period(d, now - 3600) for d in durations])
+
+    time_to_idle = runner_analytics.report(SOURCE_GITHUB, now - DAY, now)['groups'][0]['time_to_idle']
+
+    assert time_to_idle['count'] == 2000
+    for p, exact in ((50, durations[999]), (95, durations[1899])):
+        assert abs(time_to_idle[f'p{p}'] - exact) / exact < 0.1
+
+
+def test_reports_stay_interactive_over_90_days_of_2000_runners():
+    """20 groups of 100 runners: hourly and daily rollups plus daily time-to-idle histograms for 90 days."""
+    now = int(time.time())
+    start = now - now % DAY - 90 * DAY
+    db.session.execute(StatusSample.__table__.insert(), [
+        {'source': 'github', 'org_id': 0, 'group_id': group_id, 'resolution': resolution,
+         'bucket': start + i * resolution, 'samples': 120 * n, 'total_sum': 12000 * n, 'online_sum': 11000 * n,
+         'offline_sum': 1000 * n, 'busy_sum': 6600 * n, 'enabled_sum': 12000 * n, 'busy_max': 90,
+         'saturated_sum': 6 * n}
+        for resolution, n in ((RESOLUTION_HOUR, 1), (RESOLUTION_DAY, 24))
+        for group_id in range(20) for i in range(90 * DAY // resolution)
+    ])
+    db.session.execute(TimeToIdleBin.__table__.insert(), [
+        {'source': 'github', 'org_id': 0, 'group_id': group_id, 'resolution': RESOLUTION_DAY,
+         'bucket': start + day * DAY, 'bin': bin_, 'count': 50}
+        for group_id in range(20) for day in range(90) for bin_ in range(duration_bin(30), duration_bin(7200))
+    ])
+    db.session.commit()
+
+    started = time.perf_counter()
+    report = runner_analytics.report(SOURCE_GITHUB, now - 90 * DAY, now)
+    elapsed = time.perf_counter() - started
+
+    assert len(report['groups']) == 20
+    assert report['groups'][0]['busy_ratio'] == 0.6
+    assert report['groups'][0]['saturation_ratio'] == 0.05
+    assert 30 < report['groups'][0]['time_to_idle']['p50'] < 7200
+    assert elapsed < 1.0
+
+
+def test_polled_busy_periods_reach_the_runners_queues_page(configured_client, requests_mock):
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    requests_mock.get(RUNNERS_URL, [
+        {'json': {'total_count': 1, 'runners': [{'id': 1, 'name': 'r1', 'status': 'online', 'busy': busy}]}}
+        for busy in (False, True, False)
+    ])
+    for _ in range(3):
+        api_cache.clear()
+        poller.refresh('github_dashboard')
+    api_cache.clear()
+
+    data = configured_client.get('/api/analytics?window=1d').get_json()
+    group, = data['sources'][0]['groups']
+    assert group['name'] == 'Linux'
+    assert group['time_to_idle']['count'] == 1
+    assert group['busy_ratio'] == round(1 / 3, 4)
+
+    page = configured_client.get('/runners-queues?window=1d')
+    assert page.status_code == 200
+    assert b'Linux' in page.data
+    assert configured_client.get('/api/analytics?window=soon').status_code == 400
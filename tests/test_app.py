@@ -1,8 +1,21 @@
 # tests/test_app.py
 
+import base64
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event, text
+
 # THIS IS THE FIX: Added 'db' to the import list
-from app.models import db, Setting, AzureDevOpsConfig, MonitoredADOPool, User
-from app.utils import encrypt_data
+from app.models import db, Setting, AzureDevOpsConfig, MonitoredADOPool, User, MonitoredGroup, GitHubConfig
+from app.utils import encrypt_data, decrypt_data
+from app.poller import DashboardPoller, poller
+from app.config_cache import config_cache
+from app.controllers.main_controller import get_config_from_db, get_github_api_headers, _github_poll_delay
+from app.cache import api_cache
 from flask import current_app, url_for
 
 ## User Flow Tests (Setup -> Login -> Settings)
@@ -148,4 +161,427 @@ def test_version_endpoint(configured_client):
     response = configured_client.get('/version')
     assert response.status_code == 200
     data = response.get_json()
-    assert 'version' in data
\ No newline at end of file
+    assert 'version' in data
+
+
+def _add_monitored_ado_pool(org_name='test-org', pool_id=7, pool_name='Linux'):
+    config = AzureDevOpsConfig(id=1, organization_name=org_name, pat_token=encrypt_data('valid-pat'))
+    db.session.add(config)
+    db.session.add(MonitoredADOPool(pool_id=pool_id, pool_name=pool_name, ado_config_id=1))
+    db.session.commit()
+
+def test_ado_dashboard_data_fans_out_agent_details(configured_client, requests_mock):
+    """Tests that the ADO dashboard resolves the busy flag for every agent of a pool."""
+    _add_monitored_ado_pool()
+    requests_mock.get('https://dev.azure.com/test-org/_apis/distributedtask/pools/7/agents?api-version=7.0', json={'value': [
+        {'id': 1, 'name': 'agent-1', 'status': 'online', 'enabled': True},
+        {'id': 2, 'name': 'agent-2', 'status': 'online', 'enabled': True},
+    ]})
+    requests_mock.get('https://dev.azure.com/test-org/_apis/distributedtask/pools/7/agents/1', json={'id': 1, 'assignedRequest': {'requestId': 5}})
+    requests_mock.get('https://dev.azure.com/test-org/_apis/distributedtask/pools/7/agents/2', json={'id': 2})
+
+    response = configured_client.get('/api/azure-devops/dashboard-data')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['partial'] is False
+    agents = {a['id']: a for a in data['organizations'][0]['pools'][0]['agents_data']['agents']}
+    assert agents[1]['busy'] is True
+    assert agents[2]['busy'] is False
+    assert agents[1]['detail_status'] == 'ok'
+
+def test_ado_dashboard_data_reads_busy_state_from_paged_listing(configured_client, requests_mock):
+    """Agents listed with their jobs need no detail call; only an agent without job data is looked up."""
+    _add_monitored_ado_pool()
+    agents_url = 'https://dev.azure.com/test-org/_apis/distributedtask/pools/7/agents'
+    listing = requests_mock.get(agents_url, [
+        {'json': {'value': [
+            {'id': 1, 'name': 'agent-1', 'status': 'online', 'enabled': True,
+             'assignedRequest': {'requestId': 5, 'assignTime': '2025-01-01T10:00:00Z', 'definition': {'name': 'CI'}}},
+            {'id': 2, 'name': 'agent-2', 'status': 'online', 'enabled': True,
+             'lastCompletedRequest': {'requestId': 4, 'finishTime': '2025-01-01T09:00:00Z', 'result': 'succeeded'}},
+        ]}, 'headers': {'x-ms-continuationtoken': 'page/2'}},
+        {'json': {'value': [{'id': 3, 'name': 'agent-3', 'status': 'online', 'enabled': True}]}},
+    ])
+    detail = requests_mock.get(f'{agents_url}/3', json={'id': 3, 'assignedRequest': {'requestId': 6}})
+
+    data = configured_client.get('/api/azure-devops/dashboard-data').get_json()
+
+    agents = {a['id']: a for a in data['organizations'][0]['pools'][0]['agents_data']['agents']}
+    assert [agents[i]['busy'] for i in (1, 2, 3)] == [True, False, True]
+    assert agents[1]['assigned_request'] == {'id': 5, 'definition': 'CI', 'assigned_at': '2025-01-01T10:00:00Z',
+                                             'finished_at': None, 'result': None}
+    assert agents[2]['last_completed_request']['result'] == 'succeeded'
+    assert 'detail_status' not in agents[1] and agents[3]['detail_status'] == 'ok'
+    assert listing.call_count == 2 and detail.call_count == 1
+    assert listing.request_history[0].qs['includeassignedrequest'] == ['true']
+    assert listing.request_history[1].qs['continuationtoken'] == ['page/2']
+
+def test_ado_dashboard_data_marks_timed_out_agents(configured_client, requests_mock, test_app, monkeypatch):
+    """Tests that agents whose detail call misses the deadline are reported as timed out."""
+    _add_monitored_ado_pool()
+    monkeypatch.setitem(test_app.config, 'ADO_FETCH_DEADLINE_SECONDS', 0.5)
+
+    def slow_detail(request, context):
+        time.sleep(2)
+        return {'id': 2, 'assignedRequest': {}}
+
+    requests_mock.get('https://dev.azure.com/test-org/_apis/distributedtask/pools/7/agents?api-version=7.0', json={'value': [
+        {'id': 1, 'name': 'agent-1', 'status': 'online', 'enabled': True},
+        {'id': 2, 'name': 'agent-2', 'status': 'online', 'enabled': True},
+    ]})
+    requests_mock.get('https://dev.azure.com/test-org/_apis/distributedtask/pools/7/agents/1', json={'id': 1})
+    requests_mock.get('https://dev.azure.com/test-org/_apis/distributedtask/pools/7/agents/2', json=slow_detail)
+
+    response = configured_client.get('/api/azure-devops/dashboard-data')
+    data = response.get_json()
+    assert data['partial'] is True
+    agents = {a['id']: a for a in data['organizations'][0]['pools'][0]['agents_data']['agents']}
+    assert agents[1]['detail_status'] == 'ok'
+    assert agents[2]['detail_status'] == 'timeout'
+
+def test_dashboard_data_is_served_from_snapshot(configured_client, requests_mock):
+    """Tests that repeated dashboard polls are answered from the snapshot, not from GitHub."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    upstream = requests_mock.get('https://api.github.com/orgs/test-org/actions/runner-groups/3/runners', json={
+        'total_count': 1, 'runners': [{'id': 11, 'name': 'runner-1', 'status': 'online', 'busy': True}]})
+
+    first = configured_client.get('/api/dashboard-data')
+    second = configured_client.get('/api/dashboard-data')
+
+    assert upstream.call_count == 1
+    assert first.get_json() == second.get_json()
+    data = second.get_json()
+    assert data['organizations'][0]['groups'][0]['runners_data']['runners'][0]['name'] == 'runner-1'
+    assert data['snapshot']['last_error'] is None
+    assert 'Age' in second.headers
+
+def _add_github_orgs():
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    other = GitHubConfig(organization_name='other-org', api_token=encrypt_data('other-token'))
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(MonitoredGroup(id=3, org_id=other.id, name='Linux'))
+    db.session.add(MonitoredGroup(id=5, org_id=other.id, name='Windows'))
+    db.session.commit()
+    return other
+
+def test_dashboard_data_collects_every_github_organization(configured_client, requests_mock):
+    """Each organization is fetched with its own token; one failing group does not hide the rest."""
+    other = _add_github_orgs()
+    main = requests_mock.get('https://api.github.com/orgs/test-org/actions/runner-groups/3/runners', json={
+        'total_count': 1, 'runners': [{'id': 11, 'name': 'runner-1', 'status': 'online', 'busy': True}]})
+    same_group_id = requests_mock.get('https://api.github.com/orgs/other-org/actions/runner-groups/3/runners', json={
+        'total_count': 1, 'runners': [{'id': 11, 'name': 'other-runner', 'status': 'offline', 'busy': False}]})
+    requests_mock.get('https://api.github.com/orgs/other-org/actions/runner-groups/5/runners', status_code=500)
+
+    data = configured_client.get('/api/dashboard-data').get_json()
+
+    assert data['partial'] is False
+    assert [(org['id'], org['name']) for org in data['organizations']] == [(0, 'test-org'), (other.id, 'other-org')]
+    assert data['organizations'][0]['groups'][0]['runners_data']['runners'][0]['name'] == 'runner-1'
+    linux, windows = data['organizations'][1]['groups']
+    assert linux['runners_data']['runners'][0]['name'] == 'other-runner'
+    assert windows['error'] == 'Failed to fetch runners'
+    assert main.last_request.headers['Authorization'] == 'Bearer fake-github-token'
+    assert same_group_id.last_request.headers['Authorization'] == 'Bearer other-token'
+
+    # API clients from before several organizations still find the Settings organization under `groups`
+    assert data['groups'] == data['organizations'][0]['groups']
+
+    only_other = configured_client.get('/api/dashboard-data?org=other-org').get_json()
+    assert [org['name'] for org in only_other['organizations']] == ['other-org']
+    assert only_other['groups'] == []
+    assert only_other['snapshot'] == data['snapshot']
+
+def test_organization_token_that_fails_to_decrypt_is_never_replaced(configured_client, requests_mock):
+    """An organization whose token does not decrypt fails on its own instead of borrowing the Settings token."""
+    other = _add_github_orgs()
+    other.api_token = 'not-a-fernet-token'
+    db.session.commit()
+    requests_mock.get('https://api.github.com/orgs/test-org/actions/runner-groups/3/runners', json={
+        'total_count': 0, 'runners': []})
+
+    data = configured_client.get('/api/dashboard-data').get_json()
+
+    assert data['organizations'][1]['error'] == 'API token is missing or could not be decrypted'
+    assert {group['error'] for group in data['organizations'][1]['groups']} == {data['organizations'][1]['error']}
+    assert not [call for call in requests_mock.request_history if '/orgs/other-org/' in call.url]
+    assert get_github_api_headers('') is None
+
+def test_drained_organization_budget_only_slows_its_own_fetches(configured_client, requests_mock):
+    """An organization low on its own rate budget keeps its last data; the others keep the regular cadence."""
+    _add_github_orgs()
+    main = requests_mock.get('https://api.github.com/orgs/test-org/actions/runner-groups/3/runners', json={
+        'total_count': 0, 'runners': []})
+    drained = {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '100',
+               'X-RateLimit-Reset': str(int(time.time()) + 3600)}
+    other = requests_mock.get(re.compile(r'https://api\.github\.com/orgs/other-org/.*'), headers=drained, json={
+        'total_count': 1, 'runners': [{'id': 11, 'name': 'other-runner', 'status': 'online', 'busy': False}]})
+
+    first = configured_client.get('/api/dashboard-data').get_json()
+    api_cache.clear()
+    second = poller.refresh('github_dashboard').data
+
+    assert (main.call_count, other.call_count) == (2, 2)
+    assert second['organizations'][1] == first['organizations'][1]
+    assert _github_poll_delay(30) == 30
+
+class _SlowOtherOrgHandler(BaseHTTPRequestHandler):
+    """A GitHub API whose other-org answers after 2 seconds."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = {'total_count': 0, 'runners': []}
+        if self.path.startswith('/orgs/other-org/'):
+            time.sleep(2)
+        elif self.path.startswith('/orgs/test-org/actions/runner-groups/3/runners'):
+            body = {'total_count': 1, 'runners': [{'id': 11, 'name': 'runner-1', 'status': 'online', 'busy': True}]}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def test_slow_github_organization_only_delays_its_own_groups(configured_client, requests_mock, test_app, monkeypatch):
+    """Groups that miss the deadline are marked as timed out, the other organizations are served."""
+    # requests_mock answers the requests it mocks one at a time behind a global lock, so the
+    # slow organization is served by a real local host that requests_mock lets through
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowOtherOrgHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    requests_mock.get(re.compile(re.escape(base_url)), real_http=True)
+    monkeypatch.setitem(test_app.config, 'GITHUB_API_URL', base_url)
+    monkeypatch.setitem(test_app.config, 'GITHUB_FETCH_DEADLINE_SECONDS', 0.5)
+    _add_github_orgs()
+
+    try:
+        started = time.monotonic()
+        data = configured_client.get('/api/dashboard-data').get_json()
+        elapsed = time.monotonic() - started
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert elapsed < 1.5
+    assert data['partial'] is True
+    assert data['organizations'][0]['groups'][0]['runners_data']['total_count'] == 1
+    assert {group['error'] for group in data['organizations'][1]['groups']} == {'Timed out fetching runners'}
+
+def test_settings_add_github_organization_and_groups(configured_client, requests_mock):
+    """Additional organizations get their own token and runner group selection."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+
+    response = configured_client.post('/settings', data={
+        'form_name': 'add_github_org', 'active_tab': '#github',
+        'organization_name': 'other-org', 'api_token': 'other-token'}, follow_redirects=True)
+    assert b'has been added successfully' in response.data
+    config = GitHubConfig.query.filter_by(organization_name='other-org').one()
+    assert decrypt_data(config.api_token) == 'other-token'
+    duplicate = configured_client.post('/settings', data={
+        'form_name': 'add_github_org', 'organization_name': 'test-org', 'api_token': 'x'}, follow_redirects=True)
+    assert b'is already configured' in duplicate.data
+
+    groups = requests_mock.get('https://api.github.com/orgs/other-org/actions/runner-groups', json={
+        'runner_groups': [{'id': 3, 'name': 'Linux'}]})
+    listed = configured_client.get(f'/api/github/{config.id}/runner-groups').get_json()
+    assert [group['id'] for group in listed['available_groups']] == [3, 0]
+    assert listed['monitored_ids'] == []
+    assert groups.last_request.headers['Authorization'] == 'Bearer other-token'
+
+    assert configured_client.post(f'/api/github/{config.id}/runner-groups',
+                                  json={'group_ids': [[3, 'Linux']]}).status_code == 200
+    assert {(group.org_id, group.id) for group in MonitoredGroup.query.all()} == {(0, 3), (config.id, 3)}
+
+    assert configured_client.delete(f'/api/github/{config.id}').status_code == 200
+    assert {(group.org_id, group.id) for group in MonitoredGroup.query.all()} == {(0, 3)}
+
+def test_poller_keeps_last_good_snapshot_on_failure(test_app, monkeypatch):
+    """Tests that a failing collector keeps the previous data and records the error."""
+    monkeypatch.setitem(test_app.extensions, 'dashboard_poller', None)
+    local_poller = DashboardPoller(test_app)
+    results = [({'value': 1}, 200)]
+
+    def collector():
+        if not results:
+            raise RuntimeError('upstream down')
+        return results.pop()
+
+    local_poller.register('test', collector)
+    good = local_poller.refresh('test')
+    failed = local_poller.refresh('test')
+
+    assert failed.data == {'value': 1}
+    assert failed.generated_at == good.generated_at
+    assert failed.last_error == 'upstream down'
+    assert failed.meta()['age_seconds'] >= 0
+
+def test_poller_refreshes_of_one_snapshot_never_overlap(test_app, monkeypatch):
+    """Concurrent refreshes share the one in flight instead of racing to store older data."""
+    monkeypatch.setitem(test_app.extensions, 'dashboard_poller', None)
+    local_poller = DashboardPoller(test_app)
+    calls = []
+
+    def collector():
+        calls.append(None)
+        time.sleep(0.2)
+        return {'value': 1}, 200
+
+    local_poller.register('test', collector)
+    assert local_poller.refresh_async('test')
+    time.sleep(0.05)
+    snapshot = local_poller.refresh('test')
+
+    assert len(calls) == 1
+    assert snapshot is local_poller.get('test')
+    assert local_poller.refresh('test').version == snapshot.version
+
+def test_poller_stop_joins_the_polling_threads(test_app, monkeypatch):
+    """stop() returns once no collection is running any more, e.g. before the database goes away."""
+    monkeypatch.setitem(test_app.extensions, 'dashboard_poller', None)
+    monkeypatch.setitem(test_app.config, 'POLLER_ENABLED', True)
+    local_poller = DashboardPoller(test_app)
+    local_poller.register('test', lambda: ({'value': 1}, 200))
+
+    local_poller.ensure_started()
+    assert local_poller.running
+    deadline = time.monotonic() + 5
+    while local_poller.get('test') is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    local_poller.stop(timeout=5)
+
+    assert not local_poller.running
+    assert local_poller.get('test').data == {'value': 1}
+
+def test_livez_and_readyz_skip_setup_and_upstream(client, requests_mock):
+    """Probe endpoints answer before setup and never call upstream services."""
+    assert client.get('/livez').get_json() == {'status': 'ok'}
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
+    assert requests_mock.call_count == 0
+
+def test_health_is_cached_with_max_age(configured_client, requests_mock):
+    """/health and /healthcheck share one cached upstream check and advertise its max-age."""
+    first = configured_client.get('/health')
+    page = configured_client.get('/healthcheck')
+    second = configured_client.get('/health')
+
+    assert first.get_json()['github'] == {'status': 'not_configured'}
+    assert first.get_json() == second.get_json()
+    assert second.headers['Cache-Control'].startswith('max-age=')
+    assert page.status_code == 200
+    assert b'not_configured' in page.data
+
+def test_health_checks_run_in_parallel_with_deadline(configured_client, requests_mock, test_app, monkeypatch):
+    """A slow integration is reported as timeout while the other checks still report their latency."""
+    monkeypatch.setitem(test_app.config, 'HEALTH_DEADLINE_SECONDS', 0.5)
+    db.session.add(AzureDevOpsConfig(organization_name='fast-org', pat_token=encrypt_data('fast-pat')))
+    db.session.add(AzureDevOpsConfig(organization_name='slow-org', pat_token=encrypt_data('slow-pat')))
+    db.session.add(Setting(key='JIRA_BASE_URL', value='https://test.atlassian.net'))
+    db.session.add(Setting(key='JIRA_EMAIL', value='test@example.com'))
+    db.session.add(Setting(key='JIRA_API_TOKEN', value=encrypt_data('fake-token')))
+    db.session.commit()
+
+    def slow_projects(request, context):
+        time.sleep(2)
+        return {'value': []}
+
+    fast = requests_mock.get('https://dev.azure.com/fast-org/_apis/projects?api-version=7.0', json={'value': []})
+    requests_mock.get('https://dev.azure.com/slow-org/_apis/projects?api-version=7.0', json=slow_projects)
+    requests_mock.get('https://test.atlassian.net/status', json={'state': 'RUNNING'})
+
+    started = time.monotonic()
+    health = configured_client.get('/health').get_json()
+    assert time.monotonic() - started < 2
+
+    ado = {org['organization']: org for org in health['azure_devops']}
+    assert ado['fast-org']['status'] == 'ok'
+    assert ado['slow-org']['status'] == 'timeout'
+    assert health['jira']['status'] == 'ok'
+    assert health['jira']['latency_ms'] >= 0
+    assert ado['slow-org']['latency_ms'] == 500
+    # The stored PAT is decrypted before it is sent to Azure DevOps
+    expected_auth = 'Basic ' + base64.b64encode(b':fast-pat').decode()
+    assert fast.last_request.headers['Authorization'] == expected_auth
+
+def _count_queries(test_app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return statements, lambda: event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+def test_config_cache_serves_hot_reads_without_queries(configured_client, test_app):
+    """Repeated config and token reads hit the DB once and are invalidated by settings writes."""
+    get_config_from_db()
+    statements, stop = _count_queries(test_app)
+    try:
+        for _ in range(5):
+            get_config_from_db()
+            headers = get_github_api_headers()
+    finally:
+        stop()
+    assert statements == []
+    assert headers['Authorization'] == 'Bearer fake-github-token'
+
+    configured_client.post('/settings', data={'form_name': 'github', 'org_name': 'renamed-org'})
+    assert get_config_from_db()['ORGANIZATION'] == 'renamed-org'
+    assert 'CONFIG_VERSION' not in get_config_from_db()
+
+def test_config_cache_picks_up_changes_from_other_workers(configured_client, test_app, monkeypatch):
+    """A write made by another worker is detected through the version counter in the DB."""
+    db.session.add(Setting(key='ORGANIZATION', value='first-org'))
+    db.session.commit()
+    assert get_config_from_db()['ORGANIZATION'] == 'first-org'
+
+    # Simulate another worker: raw SQL bypasses this process' ORM events.
+    with db.engine.begin() as connection:
+        connection.execute(text("UPDATE setting SET value = 'second-org' WHERE key = 'ORGANIZATION'"))
+        connection.execute(text("UPDATE setting SET value = CAST(value AS INTEGER) + 1 WHERE key = 'CONFIG_VERSION'"))
+
+    assert get_config_from_db()['ORGANIZATION'] == 'first-org'
+    monkeypatch.setattr(config_cache, 'check_interval', 0)
+    assert get_config_from_db()['ORGANIZATION'] == 'second-org'
+
+def test_warm_dashboard_poll_makes_no_db_queries(configured_client, test_app, requests_mock):
+    """The auth gate and user loading are answered from process state once warm."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.commit()
+    requests_mock.get('https://api.github.com/orgs/test-org/actions/runner-groups', json={'runner_groups': []})
+    assert configured_client.get('/api/dashboard-data').status_code == 200
+    assert configured_client.get('/api/dashboard-data').status_code == 200
+
+    statements, stop = _count_queries(test_app)
+    try:
+        for _ in range(5):
+            assert configured_client.get('/api/dashboard-data').status_code == 200
+    finally:
+        stop()
+    assert statements == []
+
+def test_auth_gate_follows_token_removal_in_other_worker(configured_client, test_app, monkeypatch):
+    """Deleting the token in another worker sends users back to settings after the next version check."""
+    assert configured_client.get('/settings').status_code == 200
+    assert configured_client.get('/azure-devops').status_code == 200
+
+    with db.engine.begin() as connection:
+        connection.execute(text("DELETE FROM setting WHERE key = 'API_GITHUB_TOKEN'"))
+        connection.execute(text("UPDATE setting SET value = CAST(value AS INTEGER) + 1 WHERE key = 'CONFIG_VERSION'"))
+
+    assert configured_client.get('/azure-devops').status_code == 200
+    monkeypatch.setattr(config_cache, 'check_interval', 0)
+    response = configured_client.get('/azure-devops')
+    assert response.status_code == 302
+    assert response.location == '/settings'
@@ -0,0 +1,197 @@
+# tests/test_async_client.py
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+from app.async_client import AsyncUpstreamClient, async_client
+from app.fanout import fan_out_async, FANOUT_OK, FANOUT_TIMEOUT
+from app.models import db, Setting, AzureDevOpsConfig, MonitoredADOPool, MonitoredGroup
+from app.poller import poller
+from app.utils import encrypt_data
+
+
+class _MockUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    routes = {}
+    failures_left = 0
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if _MockUpstreamHandler.failures_left > 0:
+            _MockUpstreamHandler.failures_left -= 1
+            return self._send(503, {})
+        route = self.routes.get(path)
+        if route is None:
+            return self._send(404, {'message': 'Not Found'})
+        status, body, headers = route(self) if callable(route) else route
+        self._send(status, body, headers)
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode() if status != 304 else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def mock_upstream():
+    _MockUpstreamHandler.routes = {}
+    _MockUpstreamHandler.failures_left = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _MockUpstreamHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', _MockUpstreamHandler.routes
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def async_upstream(test_app, monkeypatch, mock_upstream):
+    """Routes the integrations through the async client and the local mock server."""
+    base_url, routes = mock_upstream
+    monkeypatch.setitem(test_app.config, 'GITHUB_API_URL', base_url)
+    monkeypatch.setitem(test_app.config, 'ADO_API_URL', base_url)
+    monkeypatch.setattr(async_client, 'enabled', True)
+    yield base_url, routes
+    async_client.close()
+
+
+def _slow(seconds, body):
+    def handler(request):
+        time.sleep(seconds)
+        return 200, body, {}
+    return handler
+
+
+def test_many_requests_are_in_flight_at_once(mock_upstream):
+    """One event loop keeps all requests of a fan-out in flight concurrently."""
+    base_url, routes = mock_upstream
+    routes['/slow'] = _slow(0.3, {'ok': True})
+    client = AsyncUpstreamClient()
+    jobs = [('org', i, lambda: client.get_json(f'{base_url}/slow')) for i in range(40)]
+
+    started = time.monotonic()
+    results = client.run(fan_out_async(jobs, per_group_limit=40, timeout=10))
+    elapsed = time.monotonic() - started
+
+    assert all(result.status == FANOUT_OK and result.value == {'ok': True} for result in results.values())
+    assert elapsed < 40 * 0.3 / 4
+    assert client.stats()['max_in_flight'] == 40
+    client.close()
+
+
+def test_async_fan_out_times_out_stragglers(mock_upstream):
+    """Requests still running at the deadline are cancelled and reported as timeouts."""
+    base_url, routes = mock_upstream
+    routes['/fast'] = (200, {'fast': True}, {})
+    routes['/slow'] = _slow(2, {'slow': True})
+    client = AsyncUpstreamClient()
+    jobs = [('a', 'fast', lambda: client.get_json(f'{base_url}/fast')),
+            ('b', 'slow', lambda: client.get_json(f'{base_url}/slow'))]
+
+    results = client.run(fan_out_async(jobs, timeout=0.5))
+
+    assert results['fast'].value == {'fast': True}
+    assert results['slow'].status == FANOUT_TIMEOUT
+    client.close()
+
+
+def test_async_client_retries_server_errors(mock_upstream):
+    base_url, routes = mock_upstream
+    routes['/status'] = (200, {'ok': True}, {})
+    _MockUpstreamHandler.failures_left = 2
+    client = AsyncUpstreamClient()
+    client.backoff_factor = 0
+
+    assert client.run(client.get_json(f'{base_url}/status')) == {'ok': True}
+    assert client.stats()['requests'] == 1
+    client.close()
+
+
+def test_ado_dashboard_uses_async_path(configured_client, async_upstream):
+    """Pool listings and agent details are fetched by the async client from the configured ADO URL."""
+    base_url, routes = async_upstream
+    config = AzureDevOpsConfig(organization_name='ado-org', pat_token=encrypt_data('pat'))
+    db.session.add(config)
+    db.session.commit()
+    db.session.add(MonitoredADOPool(pool_id=9, pool_name='Pool', ado_config_id=config.id))
+    db.session.commit()
+    routes['/ado-org/_apis/distributedtask/pools/9/agents'] = (200, {'value': [
+        {'id': 1, 'name': 'agent-1', 'status': 'online', 'enabled': True},
+        {'id': 2, 'name': 'agent-2', 'status': 'online', 'enabled': True}]}, {})
+    routes['/ado-org/_apis/distributedtask/pools/9/agents/1'] = (200, {'assignedRequest': {'requestId': 3}}, {})
+    routes['/ado-org/_apis/distributedtask/pools/9/agents/2'] = (200, {}, {})
+
+    data = configured_client.get('/api/azure-devops/dashboard-data').get_json()
+
+    agents = {agent['id']: agent for agent in data['organizations'][0]['pools'][0]['agents_data']['agents']}
+    assert agents[1]['busy'] is True and agents[2]['busy'] is False
+    assert data['partial'] is False
+    assert async_client.stats()['requests'] == 3
+
+
+def test_github_pagination_uses_async_path(configured_client, async_upstream):
+    """Link pagination and ETag revalidation work the same on the async path."""
+    base_url, routes = async_upstream
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    runners_path = '/orgs/test-org/actions/runner-groups/3/runners'
+    second_page = f'{base_url}{runners_path}/page2'
+
+    def first_page(request):
+        if request.headers.get('If-None-Match') == '"p1"':
+            return 304, None, {}
+        return 200, {'runners': [{'id': 1, 'name': 'r1', 'status': 'online', 'busy': False}]}, {
+            'ETag': '"p1"', 'Link': f'<{second_page}>; rel="next"'}
+
+    routes[runners_path] = first_page
+    routes[f'{runners_path}/page2'] = (200, {'runners': [{'id': 2, 'name': 'r2', 'status': 'offline', 'busy': False}]}, {})
+
+    data = configured_client.get('/api/dashboard-data').get_json()
+    assert [runner['id'] for runner in data['organizations'][0]['groups'][0]['runners_data']['runners']] == [1, 2]
+
+    from app.cache import api_cache
+    from app.metrics import counters
+    api_cache.delete(f'paginated:{base_url}{runners_path}')
+    poller.refresh('github_dashboard')
+    assert counters.get('github_not_modified') == 1
+
+
+def test_github_groups_are_gathered_on_the_loop_with_the_callers_trace(configured_client, async_upstream,
+                                                                       monkeypatch):
+    """All runner groups of a collection run as coroutines of one fan-out on the loop, inside the caller's trace."""
+    from app import tracing
+    from app.controllers import main_controller
+    base_url, routes = async_upstream
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    for group_id in (3, 4):
+        db.session.add(MonitoredGroup(id=group_id, name=f'Group {group_id}'))
+        routes[f'/orgs/test-org/actions/runner-groups/{group_id}/runners'] = _slow(0.3, {'runners': [
+            {'id': group_id, 'name': f'runner-{group_id}', 'status': 'online', 'busy': False}]})
+    db.session.commit()
+    monkeypatch.setattr(main_controller, 'fan_out', None)
+
+    token = tracing.begin('collect')
+    try:
+        data, status = main_controller.collect_github_dashboard_data()
+    finally:
+        trace = tracing.finish(token)
+
+    assert status == 200
+    assert [group['runners_data']['runners'][0]['id'] for group in data['organizations'][0]['groups']] == [3, 4]
+    assert async_client.stats()['max_in_flight'] == 2
+    assert trace.summary()['upstream']['count'] == 2
@@ -0,0 +1,204 @@
+# tests/test_cache.py
+
+import multiprocessing
+import threading
+import time
+
+from app.cache import MemoryCache, SQLiteCache, api_cache
+from app.controllers.main_controller import make_paginated_github_api_call
+
+RUNNERS_URL = 'https://api.github.com/orgs/test-org/actions/runner-groups/3/runners'
+
+
+def test_memory_cache_expires_and_evicts():
+    """Entries expire after their TTL and the least recently used entry is evicted first."""
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    cache.set('short', 'x', ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short') is None
+
+
+def test_sqlite_cache_is_size_bounded(tmp_path):
+    """The shared cache never holds more than max_entries rows."""
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_entries=3)
+    for i in range(10):
+        cache.set(f'key-{i}', {'i': i}, ttl=60)
+    assert cache.get('key-9') == {'i': 9}
+    assert cache.get('key-0') is None
+    count = cache._connect().conn.execute('SELECT COUNT(*) FROM api_cache').fetchone()[0]
+    assert count == 3
+
+
+def test_sqlite_cache_keeps_fill_locks_out_of_the_entries(tmp_path):
+    """Fill locks neither count towards max_entries nor get evicted; entries are trimmed every few writes."""
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_entries=20)
+    assert cache.acquire_lock('key-0', ttl=60)
+    assert not cache.acquire_lock('key-0', ttl=60)
+    conn = cache._connect().conn
+    counts = []
+    for i in range(50):
+        cache.set(f'key-{i}', {'i': i}, ttl=60)
+        counts.append(conn.execute('SELECT COUNT(*) FROM api_cache').fetchone()[0])
+
+    assert max(counts) == 20
+    assert len(set(counts[20:])) > 1
+    assert cache.is_locked('key-0')
+    cache.release_lock('key-0')
+    assert not cache.is_locked('key-0')
+
+
+def test_sqlite_cache_reads_do_not_take_the_write_lock(tmp_path):
+    """Reads go on while another worker holds the write lock; a lock is only released by its owner."""
+    path = str(tmp_path / 'cache.db')
+    cache, other = SQLiteCache(path), SQLiteCache(path)
+    cache.set('key', {'i': 1}, ttl=60)
+    assert cache.acquire_lock('fill', ttl=60)
+
+    writer = other._connection()
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        started = time.monotonic()
+        assert cache.get('key') == {'i': 1}
+        assert cache.is_locked('fill')
+        assert time.monotonic() - started < 1
+    finally:
+        writer.execute('ROLLBACK')
+
+    released = threading.Thread(target=other.release_lock, args=('fill',))
+    released.start()
+    released.join()
+    assert cache.is_locked('fill')
+
+
+def _worker_get_or_fill(path):
+    cache = SQLiteCache(path)
+    if cache.get('shared') is not None:
+        return 'hit'
+    cache.set('shared', ['runner'], ttl=60)
+    return 'fetched'
+
+
+def test_sqlite_cache_is_shared_between_processes(tmp_path):
+    """An entry written by one worker process is visible to the others."""
+    path = str(tmp_path / 'cache.db')
+    context = multiprocessing.get_context('fork')
+    results = []
+    for _ in range(4):
+        with context.Pool(1) as pool:
+            results.append(pool.apply(_worker_get_or_fill, (path,)))
+    assert results == ['fetched', 'hit', 'hit', 'hit']
+
+
+def test_one_upstream_fetch_per_ttl_window_across_workers(test_app, configured_client, requests_mock, tmp_path, monkeypatch):
+    """Four 'workers' with their own cache connections share a single GitHub pagination per TTL window."""
+    path = str(tmp_path / 'cache.db')
+    upstream = requests_mock.get(RUNNERS_URL, json={'total_count': 1, 'runners': [{'id': 1, 'name': 'r1'}]})
+
+    for _ in range(4):
+        monkeypatch.setattr(api_cache, 'backend', SQLiteCache(path))
+        results, error = make_paginated_github_api_call(RUNNERS_URL)
+        assert error is None
+        assert results == [{'id': 1, 'name': 'r1'}]
+
+    assert upstream.call_count == 1
+
+
+def test_concurrent_misses_share_one_pagination(test_app, configured_client, requests_mock):
+    """Concurrent callers missing on the same cache key wait for a single upstream fetch."""
+
+    def slow_runners(request, context):
+        time.sleep(0.3)
+        return {'total_count': 1, 'runners': [{'id': 1, 'name': 'r1'}]}
+
+    upstream = requests_mock.get(RUNNERS_URL, json=slow_runners)
+    results = []
+
+    def call():
+        with test_app.app_context():
+            results.append(make_paginated_github_api_call(RUNNERS_URL))
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.call_count == 1
+    assert results == [([{'id': 1, 'name': 'r1'}], None)] * 5
+
+
+def test_stale_entry_is_served_while_revalidating(test_app, configured_client, requests_mock, monkeypatch):
+    """An expired entry within the stale window is returned at once and refreshed in the background."""
+    monkeypatch.setitem(test_app.config, 'API_CACHE_SECONDS', 0.05)
+    monkeypatch.setattr(api_cache, 'stale_seconds', 60)
+    upstream = requests_mock.get(RUNNERS_URL, [
+        {'json': {'runners': [{'id': 1, 'name': 'old'}]}},
+        {'json': {'runners': [{'id': 1, 'name': 'new'}]}},
+    ])
+
+    assert make_paginated_github_api_call(RUNNERS_URL) == ([{'id': 1, 'name': 'old'}], None)
+    time.sleep(0.1)
+    assert make_paginated_github_api_call(RUNNERS_URL) == ([{'id': 1, 'name': 'old'}], None)
+
+    deadline = time.monotonic() + 5
+    while upstream.call_count < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert upstream.call_count == 2
+    assert api_cache.backend.get_entry('paginated:' + RUNNERS_URL, max_stale=60)[0] == [{'id': 1, 'name': 'new'}]
+
+
+def test_fill_lock_makes_other_workers_wait(tmp_path):
+    """A worker that finds another worker's fill lock waits for its result instead of fetching."""
+    from app.cache import ApiCache
+
+    path = str(tmp_path / 'cache.db')
+    worker_a, worker_b = ApiCache(), ApiCache()
+    worker_a.backend, worker_b.backend = SQLiteCache(path), SQLiteCache(path)
+    fetches = []
+
+    def slow_fetch():
+        fetches.append('a')
+        time.sleep(0.3)
+        return ['value'], None
+
+    thread = threading.Thread(target=worker_a.get_or_fetch, args=('k', slow_fetch, 60))
+    thread.start()
+    time.sleep(0.1)
+    result = worker_b.get_or_fetch('k', lambda: (fetches.append('b'), (['other'], None))[1], 60)
+    thread.join()
+
+    assert result == (['value'], None)
+    assert fetches == ['a']
+
+
+def test_unchanged_pages_are_revalidated_with_etag(test_app, configured_client, requests_mock):
+    """After the result cache expires, unchanged pages come back as 304 and reuse the cached body."""
+    from app.metrics import counters
+    body = {'total_count': 1, 'runners': [{'id': 1, 'name': 'r1'}]}
+
+    def runners(request, context):
+        if request.headers.get('If-None-Match') == '"v1"':
+            context.status_code = 304
+            return None
+        context.headers['ETag'] = '"v1"'
+        return body
+
+    upstream = requests_mock.get(RUNNERS_URL, json=runners)
+
+    assert make_paginated_github_api_call(RUNNERS_URL) == (body['runners'], None)
+    api_cache.delete('paginated:' + RUNNERS_URL)
+    assert make_paginated_github_api_call(RUNNERS_URL) == (body['runners'], None)
+
+    assert upstream.call_count == 2
+    assert upstream.last_request.headers['If-None-Match'] == '"v1"'
+    assert counters.get('github_not_modified') == 1
+    assert counters.get('github_rate_limit_units_saved') == 1
+    assert counters.get('github_bytes_saved') > 0
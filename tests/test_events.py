@@ -0,0 +1,142 @@
+# tests/test_events.py
+
+import pytest
+from sqlalchemy import event
+
+from app import runner_diff
+from app.events import runner_event_log, transitions, encode_cursor, STATE_ABSENT, STATE_BUSY, STATE_IDLE, STATE_OFFLINE
+from app.cache import api_cache
+from app.models import db, Setting, MonitoredGroup, RunnerStatusEvent
+from app.poller import poller
+
+RUNNERS_URL = 'https://api.github.com/orgs/test-org/actions/runner-groups/3/runners'
+
+
+def _runner(runner_id, status='online', busy=False):
+    return {'id': runner_id, 'name': f'r{runner_id}', 'status': status, 'busy': busy}
+
+
+def _github(*runners):
+    return {'organizations': [{'id': 0, 'name': 'test-org', 'groups': [
+        {'group_id': 3, 'group_name': 'Linux', 'runners_data': {'total_count': len(runners), 'runners': list(runners)}}]}]}
+
+
+def test_only_state_transitions_become_events():
+    """Unchanged runners and changes that do not move the state (e.g. a label) are not logged."""
+    previous = _github(_runner(1), _runner(2, busy=True), dict(_runner(3), labels=['a']))
+    current = _github(_runner(1, busy=True), dict(_runner(3), labels=['b']), _runner(4, status='offline'))
+
+    events = transitions(previous, current, runner_diff.GITHUB_RUNNERS, occurred_at=100.0)
+
+    assert sorted((e['runner_id'], e['old_state'], e['new_state']) for e in events) == [
+        (1, STATE_IDLE, STATE_BUSY), (2, STATE_BUSY, STATE_ABSENT), (4, STATE_ABSENT, STATE_OFFLINE)]
+    assert all(e['org_id'] == 0 and e['group_id'] == 3 for e in events)
+
+
+def test_failed_pools_do_not_report_agents_as_absent():
+    previous = {'organizations': [{'id': 2, 'pools': [
+        {'id': 9, 'agents_data': {'total_count': 1, 'agents': [_runner(5)]}}]}]}
+    current = {'organizations': [{'id': 2, 'pools': [
+        {'id': 9, 'error': 'Failed to fetch agent list', 'agents_data': {'total_count': 0, 'agents': []}}]}]}
+
+    assert transitions(previous, current, runner_diff.ADO_AGENTS, occurred_at=100.0) == []
+
+
+def test_transitions_seen_by_several_workers_are_logged_once():
+    events = transitions(_github(_runner(1)), _github(_runner(1, busy=True)), runner_diff.GITHUB_RUNNERS, 100.0)
+
+    assert len(runner_event_log.record('github', events)) == 1
+    # Another worker polls a few seconds later and sees the same change
+    assert runner_event_log.record('github', [dict(events[0], occurred_at=104.0)]) == []
+    assert RunnerStatusEvent.query.count() == 1
+
+
+def test_repeated_transitions_within_a_poll_interval_are_kept(monkeypatch):
+    """A runner that goes busy -> idle twice on short jobs logs both, unless only the leader records."""
+    busy, idle = _github(_runner(1, busy=True)), _github(_runner(1))
+    spec = runner_diff.GITHUB_RUNNERS
+
+    assert len(runner_event_log.record('github', transitions(busy, idle, spec, 100.0))) == 1
+    assert len(runner_event_log.record('github', transitions(idle, busy, spec, 105.0))) == 1
+    assert len(runner_event_log.record('github', transitions(busy, idle, spec, 110.0))) == 1
+    assert runner_event_log.record('github', transitions(busy, idle, spec, 112.0)) == []
+
+    monkeypatch.setattr(runner_event_log, 'deduplicate', False)
+    assert len(runner_event_log.record('github', transitions(busy, idle, spec, 115.0))) == 1
+    assert [event.occurred_at for event in RunnerStatusEvent.query.order_by(RunnerStatusEvent.occurred_at)] == [
+        100.0, 105.0, 110.0, 115.0]
+
+
+def test_keyset_pagination_walks_newest_first():
+    rows = [{'source': 'github', 'org_id': 0, 'group_id': 3, 'runner_id': i % 4, 'runner_name': f'r{i % 4}',
+             'old_state': STATE_IDLE, 'new_state': STATE_BUSY, 'occurred_at': float(1000 + i // 2)}
+            for i in range(25)]
+    db.session.execute(RunnerStatusEvent.__table__.insert(), rows)
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = runner_event_log.query(source='github', limit=10, cursor=cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert len(seen) == 25 and len({event.id for event in seen}) == 25
+    keys = [(event.occurred_at, event.id) for event in seen]
+    assert keys == sorted(keys, reverse=True)
+
+    runner_page, _ = runner_event_log.query(source='github', runner_id=1, start=1005, limit=100)
+    assert {event.runner_id for event in runner_page} == {1}
+    assert all(event.occurred_at >= 1005 for event in runner_page)
+
+
+@pytest.mark.parametrize('params, index', [
+    ('runner_id=1', 'ix_runner_status_event_runner'),
+    ('source=github&runner_id=1&from=2026-01-01T00:00:00Z', 'ix_runner_status_event_runner'),
+    ('group_id=9', 'ix_runner_status_event_group'),
+    ('source=github&group_id=9', 'ix_runner_status_event_group'),
+    ('source=ado&org_id=2&group_id=9&state=busy', 'ix_runner_status_event_group'),
+    ('source=github', 'ix_runner_status_event_time'),
+])
+def test_events_endpoint_queries_walk_an_index_in_order(configured_client, params, index):
+    """Whatever filters accompany a runner or group, its page is read from its index without a sort."""
+    cursor = encode_cursor(RunnerStatusEvent(occurred_at=2000.0, id=5))
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM runner_status_event' in statement:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        assert configured_client.get(f'/api/events?{params}&cursor={cursor}').status_code == 200
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    (statement, parameters), = statements
+    plan = ' '.join(str(row[-1]) for row in db.session.connection().exec_driver_sql(
+        f'EXPLAIN QUERY PLAN {statement}', parameters))
+    assert index in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_events_endpoint_reports_polled_transitions(configured_client, requests_mock):
+    """Consecutive polls that change a runner's state show up in /api/events."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    requests_mock.get(RUNNERS_URL, [
+        {'json': {'total_count': 1, 'runners': [_runner(1)]}},
+        {'json': {'total_count': 1, 'runners': [_runner(1, busy=True)]}},
+        {'json': {'total_count': 1, 'runners': [_runner(1, busy=True)]}},
+    ])
+    for _ in range(3):
+        api_cache.clear()
+        poller.refresh('github_dashboard')
+
+    data = configured_client.get('/api/events?source=github&runner_id=1').get_json()
+
+    assert [(e['old_state'], e['new_state']) for e in data['events']] == [(STATE_IDLE, STATE_BUSY)]
+    assert data['next_cursor'] is None
+    assert configured_client.get('/api/events?source=gitlab').status_code == 400
+    assert configured_client.get('/api/events?cursor=nope').status_code == 400
@@ -0,0 +1,92 @@
+# tests/test_history.py
+
+import time
+
+from app.history import status_history, RESOLUTION_MINUTE, RESOLUTION_HOUR, RESOLUTION_DAY, SOURCE_ADO
+from app.models import db, Setting, MonitoredGroup, StatusSample
+
+DAY = 86400
+# A fixed midnight keeps bucket boundaries predictable; "now" for retention is derived from it
+T0 = 1_790_000_000 - 1_790_000_000 % DAY
+
+
+def _count(group_id, busy, online=10, total=12, org_id=0, enabled=12):
+    return {'org_id': org_id, 'group_id': group_id, 'total': total, 'online': online,
+            'offline': total - online, 'busy': busy, 'enabled': enabled}
+
+
+def test_observations_are_rolled_up_into_every_resolution(monkeypatch):
+    """One poll lands in its minute, hour and day bucket; queries read the requested rollup."""
+    monkeypatch.setattr(time, 'time', lambda: T0 + 2 * 3600)
+    status_history.record('github', [_count(3, busy=2)], at=T0 + 10)
+    status_history.record('github', [_count(3, busy=6)], at=T0 + 30)
+    status_history.record('github', [_count(3, busy=4)], at=T0 + 3600 + 5)
+
+    assert StatusSample.query.filter_by(resolution=RESOLUTION_MINUTE).count() == 2
+    assert StatusSample.query.filter_by(resolution=RESOLUTION_DAY).count() == 1
+
+    hourly = status_history.query('github', 3, T0, T0 + 7200, step=3600)
+    assert hourly['resolution'] == RESOLUTION_HOUR
+    assert [(p['t'], p['samples'], p['avg_busy'], p['max_busy']) for p in hourly['points']] == [
+        (T0, 2, 4.0, 6), (T0 + 3600, 1, 4.0, 4)]
+
+    # 2-hour steps are merged from the hourly rollup in SQL
+    merged = status_history.query('github', 3, T0, T0 + 7200, step=7200)
+    assert [(p['samples'], p['max_busy']) for p in merged['points']] == [(3, 6)]
+
+    by_minute = status_history.query('github', 3, T0, T0 + 7200)
+    assert by_minute['resolution'] == RESOLUTION_MINUTE
+    assert len(by_minute['points']) == 2
+
+
+def test_retention_drops_expired_buckets_per_resolution():
+    """Minute buckets expire long before the hourly and daily rollups of the same period."""
+    status_history.record(SOURCE_ADO, [_count(9, busy=1, org_id=2, enabled=8)], at=T0)
+
+    status_history.apply_retention(now=T0 + 3 * DAY)
+
+    assert StatusSample.query.filter_by(resolution=RESOLUTION_MINUTE).count() == 0
+    assert StatusSample.query.filter_by(resolution=RESOLUTION_HOUR).count() == 1
+    # Old ranges are answered from the rollups that still cover them
+    assert status_history.choose_resolution(T0, T0 + DAY, step=60, now=T0 + 3 * DAY) == RESOLUTION_HOUR
+    history = status_history.query(SOURCE_ADO, 9, T0, T0 + DAY, step=3600, org_id=2)
+    assert history['points'][0]['avg_enabled'] == 8.0
+
+
+def test_range_queries_stay_fast_over_months_of_data():
+    """Three months of hourly rollups for many pools are queried from the primary key index."""
+    rows = [
+        {'source': 'github', 'org_id': 0, 'group_id': group_id, 'resolution': RESOLUTION_HOUR,
+         'bucket': T0 + hour * 3600, 'samples': 60, 'total_sum': 600, 'online_sum': 540,
+         'offline_sum': 60, 'busy_sum': 120, 'enabled_sum': 600, 'busy_max': 5}
+        for group_id in range(20) for hour in range(90 * 24)
+    ]
+    db.session.execute(StatusSample.__table__.insert(), rows)
+    db.session.commit()
+
+    started = time.perf_counter()
+    history = status_history.query('github', 7, T0, T0 + 30 * DAY, step=3600)
+    elapsed = time.perf_counter() - started
+
+    assert len(history['points']) == 30 * 24
+    assert history['points'][0]['avg_busy'] == 2.0
+    assert elapsed < 0.2
+
+
+def test_history_endpoint_records_polls(configured_client, requests_mock):
+    """Every dashboard poll adds a sample that /api/history returns."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    requests_mock.get('https://api.github.com/orgs/test-org/actions/runner-groups/3/runners', json={
+        'total_count': 2, 'runners': [{'id': 1, 'name': 'r1', 'status': 'online', 'busy': True},
+                                      {'id': 2, 'name': 'r2', 'status': 'offline', 'busy': False}]})
+    configured_client.get('/api/dashboard-data')
+
+    data = configured_client.get('/api/history?group_id=3&step=1h').get_json()
+
+    assert data['resolution'] == RESOLUTION_HOUR
+    assert data['points'][-1]['avg_online'] == 1.0
+    assert data['points'][-1]['max_busy'] == 1
+    assert configured_client.get('/api/history').status_code == 400
+    assert configured_client.get('/api/history?group_id=3&from=yesterday').status_code == 400
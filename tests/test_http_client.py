@@ -0,0 +1,77 @@
+# tests/test_http_client.py
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.http_client import UpstreamHttpClient
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failures_left = 0
+    cookies = []
+
+    def do_GET(self):
+        _KeepAliveHandler.cookies.append(self.headers.get('Cookie'))
+        if _KeepAliveHandler.failures_left > 0:
+            _KeepAliveHandler.failures_left -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Set-Cookie', 'session=org-a; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused_per_host(local_server):
+    """Sequential calls to the same host go over one pooled keep-alive connection."""
+    client = UpstreamHttpClient()
+    for _ in range(3):
+        assert client.get(f'{local_server}/status').json() == {'ok': True}
+
+    stats = client.stats()[local_server.removeprefix('http://')]
+    assert stats == {'requests': 3, 'connections_opened': 1, 'reused': 2}
+    client.close()
+
+
+def test_server_errors_are_retried(local_server):
+    """Transient 5xx responses are retried with backoff before giving up."""
+    client = UpstreamHttpClient()
+    client.backoff_factor = 0
+    _KeepAliveHandler.failures_left = 2
+
+    response = client.get(f'{local_server}/status')
+    assert response.status_code == 200
+    client.close()
+
+
+def test_sessions_do_not_keep_cookies(local_server):
+    """A cookie set on one org's call is not sent along with the next call to the same host."""
+    client = UpstreamHttpClient()
+    _KeepAliveHandler.cookies = []
+    client.get(f'{local_server}/orgs/a', headers={'Authorization': 'token a'})
+    client.get(f'{local_server}/orgs/b', headers={'Authorization': 'token b'})
+
+    assert _KeepAliveHandler.cookies == [None, None]
+    assert not client.session_for(local_server)[1].cookies
+    client.close()
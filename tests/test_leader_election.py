@@ -0,0 +1,119 @@
+# tests/test_leader_election.py
+
+import time
+from collections import Counter
+
+from flask import Flask
+
+from app.coordination import Lease, SharedSnapshots
+from app.models import db
+from app.poller import DashboardPoller, Snapshot
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.02)
+
+
+def test_lease_has_one_holder_until_it_expires():
+    first = Lease('poller', 'pod-a', duration=30)
+    second = Lease('poller', 'pod-b', duration=30)
+
+    assert first.acquire(now=1000)
+    assert not second.acquire(now=1010)
+    assert first.acquire(now=1020)
+    # Renewed until 1050, so still held at 1045
+    assert not second.acquire(now=1045)
+    assert second.acquire(now=1051)
+    assert not first.acquire(now=1052)
+    assert second.current_holder(now=1052) == 'pod-b'
+
+    second.release()
+    assert first.acquire(now=1053)
+
+
+def test_shared_snapshots_only_move_forward():
+    newer = Snapshot('github_dashboard', {'groups': [1]}, generated_at=200.0, version=2)
+    older = Snapshot('github_dashboard', {'groups': []}, generated_at=100.0, version=1)
+
+    SharedSnapshots.publish(newer, 'pod-a')
+    SharedSnapshots.publish(older, 'pod-b')
+
+    shared = SharedSnapshots.newer_than('github_dashboard', None)
+    assert (shared.version, shared.holder) == (2, 'pod-a')
+    assert SharedSnapshots.newer_than('github_dashboard', newer) is None
+    # A patch between collections keeps generated_at but has a higher version
+    patched = Snapshot('github_dashboard', {'groups': [1, 2]}, generated_at=200.0, version=3, patched_at=250.0)
+    SharedSnapshots.publish(patched, 'pod-a')
+    assert SharedSnapshots.newer_than('github_dashboard', newer).version == 3
+    SharedSnapshots.drop('github_dashboard')
+    assert SharedSnapshots.names() == set()
+
+
+def test_only_the_lease_holder_collects_and_a_follower_takes_over(tmp_path):
+    """Two workers on one database: the follower serves the leader's snapshot and collects once the leader is gone."""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'shared.db'}", POLLER_ENABLED=True,
+                      POLLER_LEADER_ELECTION=True, POLLER_LEASE_SECONDS=3, POLLER_FOLLOW_SECONDS=0.05,
+                      POLL_INTERVAL_SECONDS=1)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    collections = Counter()
+    leader_only = []
+
+    def worker(name):
+        def collect():
+            collections[name] += 1
+            return {'runners': [1, 2, 3]}, 200
+        poller = DashboardPoller(app)
+        poller.register('dashboard', collect)
+        poller.add_listener(lambda *args: leader_only.append(name), followers=False)
+        return poller
+
+    first, second = worker('first'), worker('second')
+    first.ensure_started()
+    _wait_for(lambda: first.get('dashboard') is not None)
+    second.ensure_started()
+    try:
+        _wait_for(lambda: second.get('dashboard') is not None)
+        assert first.is_leader and not second.is_leader
+        assert collections == {'first': collections['first']}
+        assert second.get('dashboard').version == first.get('dashboard').version
+        assert second.get('dashboard').data == {'runners': [1, 2, 3]}
+        assert set(leader_only) == {'first'}
+
+        first.stop()
+        _wait_for(lambda: collections['second'] > 0)
+        assert second.is_leader
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_follower_never_collects_even_when_cold_or_stale(tmp_path):
+    """Before the leader published, a follower answers 503; a stale snapshot is followed, not refreshed."""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'shared.db'}", POLLER_ENABLED=True,
+                      POLLER_LEADER_ELECTION=True)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    collections = []
+    follower = DashboardPoller(app)
+    follower.register('health', lambda: collections.append(1) or ({'github': 'ok'}, 200))
+
+    cold = follower.get_or_collect('health')
+    assert (cold.status_code, cold.data) == (503, {'error': 'Data is not available yet'})
+    assert follower.get('health') is None
+
+    with app.app_context():
+        SharedSnapshots.publish(Snapshot('health', {'github': 'ok'}, generated_at=time.time() - 120, version=1), 'pod-a')
+    assert follower.get_or_collect('health').version == 1
+    with app.app_context():
+        SharedSnapshots.publish(Snapshot('health', {'github': 'ok'}, version=2), 'pod-a')
+    assert follower.get_fresh('health', max_age=60).version == 2
+    assert collections == []
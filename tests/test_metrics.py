@@ -0,0 +1,115 @@
+# tests/test_metrics.py
+
+import time
+
+from app.cache import api_cache
+from app.exporter import metrics_exporter, SQLiteMetricsStore, MetricsExporter
+from app.metrics import registry, MetricsRegistry
+from app.models import db, Setting, MonitoredGroup
+from app.poller import poller, Snapshot
+
+RUNNERS_URL = 'https://api.github.com/orgs/test-org/actions/runner-groups/3/runners'
+
+
+def test_metrics_endpoint_exports_runners_latency_and_cache_counters(configured_client, requests_mock):
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    requests_mock.get(RUNNERS_URL, json={'total_count': 2, 'runners': [
+        {'id': 1, 'name': 'r1', 'status': 'online', 'busy': True},
+        {'id': 2, 'name': 'r2', 'status': 'online', 'busy': False}]})
+    poller.refresh('github_dashboard')
+    poller.refresh('github_dashboard')
+    calls = requests_mock.call_count
+
+    response = configured_client.get('/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert requests_mock.call_count == calls
+    assert 'github_runners{organization="test-org",group_id="3",group="Linux",status="online",busy="true"} 1' in body
+    assert 'github_runners{organization="test-org",group_id="3",group="Linux",status="offline",busy="false"} 0' in body
+    assert ('upstream_request_duration_seconds_count{host="api.github.com",'
+            'endpoint="/orgs/{name}/actions/runner-groups/{id}/runners"} 1') in body
+    assert 'github_api_cache_requests_total{result="miss"} 1' in body
+    assert 'github_api_cache_requests_total{result="hit"} 1' in body
+    assert '# TYPE upstream_request_duration_seconds histogram' in body
+
+
+def test_workers_are_summed_and_retired_workers_keep_their_totals(tmp_path):
+    store = SQLiteMetricsStore(str(tmp_path / 'metrics.db'))
+    worker_a, worker_b = MetricsRegistry(), MetricsRegistry()
+    worker_a.inc('upstream_requests_total', (('host', 'api.github.com'),), 3)
+    worker_b.inc('upstream_requests_total', (('host', 'api.github.com'),), 4)
+    worker_b.observe('upstream_request_duration_seconds', (('host', 'dev.azure.com'),), 0.3)
+    store.write('111:a', worker_a.samples())
+    store.write('222:b', worker_b.samples())
+
+    totals = {series: value for _, _, series, value in store.read()}
+    assert totals['upstream_requests_total{host="api.github.com"}'] == 7
+    assert totals['upstream_request_duration_seconds_bucket{host="dev.azure.com",le="0.25"}'] == 0
+    assert totals['upstream_request_duration_seconds_bucket{host="dev.azure.com",le="0.5"}'] == 1
+
+    # Worker a exits; its count is folded into the retired totals instead of vanishing
+    assert store.retire(lambda writer: writer != '111:a') == 1
+    totals = {series: value for _, _, series, value in store.read()}
+    assert totals['upstream_requests_total{host="api.github.com"}'] == 7
+
+    # Buckets of one histogram stay in order
+    buckets = [series for _, _, series, _ in store.read() if series.startswith('upstream_request_duration_seconds_')]
+    assert buckets[0].endswith('le="0.05"}') and buckets[-1].startswith('upstream_request_duration_seconds_count')
+
+
+def test_rendering_thousands_of_series_stays_under_10ms(tmp_path, test_app):
+    """2,000 agent gauge series plus 40 endpoint histograms, summed over the shared store."""
+    test_app.config['METRICS_BACKEND'] = 'sqlite'
+    test_app.config['METRICS_PATH'] = str(tmp_path / 'metrics.db')
+    exporter = MetricsExporter(test_app)
+    test_app.config['METRICS_BACKEND'] = 'memory'
+    try:
+        organizations = [{'id': org, 'name': f'org-{org}', 'pools': [
+            {'id': pool, 'name': f'pool-{pool}', 'agents_data': {'total_count': 4, 'agents': [
+                {'id': i, 'status': 'online' if i % 2 else 'offline', 'busy': i == 1} for i in range(4)]}}
+            for pool in range(100)]} for org in range(5)]
+        exporter.on_snapshot('ado_dashboard', None, Snapshot('ado_dashboard', {'organizations': organizations}))
+        for endpoint in range(40):
+            registry.observe('upstream_request_duration_seconds',
+                             (('host', 'dev.azure.com'), ('endpoint', f'/e{endpoint}')), 0.2)
+
+        exporter.render()
+        durations = []
+        for i in range(20):
+            registry.observe('upstream_request_duration_seconds', (('host', 'dev.azure.com'), ('endpoint', f'/e{i}')), 0.4)
+            started = time.perf_counter()
+            body = exporter.render()
+            durations.append(time.perf_counter() - started)
+
+        assert body.count('\nado_agents{') == 2000
+        assert sorted(durations)[len(durations) // 2] < 0.010
+    finally:
+        test_app.extensions['metrics_exporter'] = metrics_exporter
+
+
+def test_rate_limit_gauges_are_shared_with_workers_that_never_call_github(tmp_path, test_app):
+    """A follower exports the budgets the collecting worker saw; an older observation never wins."""
+    from types import SimpleNamespace
+    from app.ratelimit import rate_limiter
+    test_app.config['METRICS_BACKEND'] = 'sqlite'
+    test_app.config['METRICS_PATH'] = str(tmp_path / 'metrics.db')
+    leader, follower = MetricsExporter(test_app), MetricsExporter(test_app)
+    test_app.config['METRICS_BACKEND'] = 'memory'
+    try:
+        rate_limiter.observe('abc', SimpleNamespace(status_code=200, headers={
+            'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4321', 'X-RateLimit-Reset': '0'}))
+        leader.flush()
+        rate_limiter.reset()
+
+        body = follower.render()
+        assert 'github_rate_limit_remaining{token="abc"} 4321\n' in body
+        assert 'github_rate_limit_limit{token="abc"} 5000\n' in body
+
+        follower.store.write_gauges([('github_rate_limit_remaining', 'github_rate_limit_remaining{token="abc"}',
+                                      4999, 1.0)])
+        assert 'github_rate_limit_remaining{token="abc"} 4321\n' in follower.render()
+    finally:
+        test_app.extensions['metrics_exporter'] = metrics_exporter
@@ -0,0 +1,93 @@
+# tests/test_ratelimit.py
+
+import time
+
+import pytest
+
+from app.ratelimit import (GitHubRateLimiter, RateLimitExceeded, PRIORITY_DASHBOARD,
+                           PRIORITY_HEALTH, PRIORITY_SETTINGS)
+
+
+class _Response:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _budget_headers(remaining, limit=5000):
+    return {
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str(int(time.time()) + 3600),
+    }
+
+
+def test_low_budget_is_reserved_for_dashboard_refreshes():
+    """Below the reserves, health and settings lookups are refused while dashboard calls go through."""
+    limiter = GitHubRateLimiter()
+    limiter.observe('token', _Response(headers=_budget_headers(remaining=400)))
+
+    limiter.acquire('token', PRIORITY_DASHBOARD)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire('token', PRIORITY_HEALTH)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire('token', PRIORITY_SETTINGS)
+    assert limiter.state()['token']['remaining'] == 400
+
+
+def test_retry_after_blocks_every_priority():
+    """A secondary rate limit response blocks all calls for the Retry-After period."""
+    limiter = GitHubRateLimiter()
+    limiter.observe('token', _Response(status_code=403, headers={'Retry-After': '60'}))
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire('token', PRIORITY_DASHBOARD)
+    assert limiter.poll_delay(30) >= 59
+
+
+def test_poll_delay_grows_as_budget_drains():
+    """The polling interval is stretched as the remaining budget shrinks."""
+    limiter = GitHubRateLimiter()
+    limiter.observe('token', _Response(headers=_budget_headers(remaining=4000)))
+    assert limiter.poll_delay(30) == 30
+    limiter.observe('token', _Response(headers=_budget_headers(remaining=1000)))
+    assert limiter.poll_delay(30) == 120
+    limiter.observe('token', _Response(headers=_budget_headers(remaining=100)))
+    assert limiter.poll_delay(30) == 240
+
+
+def test_bucket_refuses_bursts_for_low_priorities():
+    """Once the burst is spent, non-dashboard calls are refused instead of waiting."""
+    limiter = GitHubRateLimiter()
+    limiter.burst = 2
+    limiter.reset()
+    limiter.acquire('token', PRIORITY_SETTINGS)
+    limiter.acquire('token', PRIORITY_SETTINGS)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire('token', PRIORITY_SETTINGS)
+
+
+def test_github_calls_stop_after_secondary_rate_limit(configured_client, requests_mock):
+    """After GitHub answers with Retry-After, the next fetch fails fast without calling GitHub."""
+    from app.controllers.main_controller import make_paginated_github_api_call
+    url = 'https://api.github.com/orgs/test-org/actions/runner-groups/3/runners'
+    upstream = requests_mock.get(url, status_code=429, headers={'Retry-After': '120'})
+
+    _, first_error = make_paginated_github_api_call(url)
+    _, second_error = make_paginated_github_api_call(url)
+
+    assert first_error is not None
+    assert 'rate limit' in second_error
+    assert upstream.call_count == 1
+
+
+def test_poll_delay_and_due_follow_one_token_only():
+    """A drained token stretches only its own polls, not those of other tokens."""
+    limiter = GitHubRateLimiter()
+    limiter.observe('drained', _Response(headers=_budget_headers(remaining=100)))
+    limiter.observe('fresh', _Response(headers=_budget_headers(remaining=4000)))
+
+    assert limiter.poll_delay(30, ['fresh']) == 30
+    assert limiter.poll_delay(30, ['drained', 'fresh']) == 240
+    assert limiter.poll_due('drained', 30) and limiter.poll_due('fresh', 30)
+    assert not limiter.poll_due('drained', 30)
@@ -0,0 +1,85 @@
+# tests/test_runner_store.py
+
+from app import runner_diff
+from app.models import db, Setting, MonitoredGroup
+from app.runner_store import RunnerStore
+
+
+def _payload(groups):
+    return {'organizations': [{'id': 0, 'name': 'test-org', 'groups': [
+        {'group_id': group_id, 'group_name': f'Group {group_id}',
+         'runners_data': {'total_count': len(runners), 'runners': runners}}
+        for group_id, runners in groups.items()]}], 'partial': False}
+
+
+def _runner(runner_id, name, status='online', busy=False):
+    return {'id': runner_id, 'name': name, 'status': status, 'busy': busy}
+
+
+def _store(groups):
+    return RunnerStore(_payload(groups), runner_diff.GITHUB_RUNNERS, ('name', 'group_name'))
+
+
+def test_query_filters_by_group_status_busy_and_name_prefix():
+    store = _store({
+        3: [_runner(1, 'linux-b', busy=True), _runner(2, 'Linux-a'), _runner(3, 'win-a', status='offline')],
+        4: [_runner(4, 'linux-c', busy=True), _runner(5, 'mac-a')],
+    })
+
+    def names(**filters):
+        return [item['name'] for item in store.query(**filters)['items']]
+
+    assert names() == ['Linux-a', 'linux-b', 'linux-c', 'mac-a', 'win-a']
+    assert names(prefix='LINUX') == ['Linux-a', 'linux-b', 'linux-c']
+    assert names(groups={3}, statuses={'online'}) == ['Linux-a', 'linux-b']
+    assert names(groups={(0, 4)}, busy=True) == ['linux-c']
+    assert names(busy=True, sort='name', descending=True) == ['linux-c', 'linux-b']
+    assert names(sort='status') == ['win-a', 'Linux-a', 'linux-b', 'linux-c', 'mac-a']
+    assert names(orgs=['other-org']) == []
+    assert store.query(prefix='linux', limit=0)['total'] == 3
+
+
+def test_group_counts_are_precomputed():
+    store = _store({3: [_runner(1, 'a', busy=True), _runner(2, 'b', status='offline')], 4: []})
+
+    assert [(f['group_id'], f['total'], f['online'], f['offline'], f['busy']) for f in store.facets] == [
+        (3, 2, 1, 1, 1), (4, 0, 0, 0, 0)]
+    assert store.query(groups={4})['facets'] == [store.facets[1]]
+
+
+def test_cursor_pages_continue_after_the_snapshot_changed():
+    """Keyset cursors: runners added before the cursor or removed after it do not shift the next page."""
+    runners = [_runner(i, f'runner-{i:02d}') for i in range(10)]
+    first = _store({3: runners}).query(limit=4)
+    assert [item['id'] for item in first['items']] == [0, 1, 2, 3]
+
+    changed = [_runner(99, 'runner-00a')] + [runner for runner in runners if runner['id'] != 5]
+    second = _store({3: changed}).query(limit=4, cursor=first['next_cursor'])
+    assert [item['id'] for item in second['items']] == [4, 6, 7, 8]
+
+    last = _store({3: changed}).query(limit=4, cursor=second['next_cursor'])
+    assert [item['id'] for item in last['items']] == [9]
+    assert last['next_cursor'] is None
+
+
+def test_runners_api_pages_through_a_group(configured_client, requests_mock):
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    runners = [_runner(i, f'runner-{i}', busy=i % 3 == 0) for i in range(10)]
+    requests_mock.get('https://api.github.com/orgs/test-org/actions/runner-groups/3/runners',
+                      json={'total_count': 10, 'runners': runners})
+
+    page = configured_client.get('/api/runners?group=0:3&busy=true&limit=3').get_json()
+    assert [item['name'] for item in page['items']] == ['runner-0', 'runner-3', 'runner-6']
+    assert page['total'] == 4
+    assert page['facets'] == [{'org_id': 0, 'org': 'test-org', 'group_id': 3, 'group': 'Linux', 'total': 10,
+                               'online': 10, 'offline': 0, 'busy': 4, 'enabled': 10, 'enabled_busy': 4}]
+
+    rest = configured_client.get(f"/api/runners?group=0:3&busy=true&limit=3&cursor={page['next_cursor']}").get_json()
+    assert [item['name'] for item in rest['items']] == ['runner-9']
+    assert rest['next_cursor'] is None
+
+    assert configured_client.get(f"/api/runners?sort=-name&cursor={page['next_cursor']}").status_code == 400
+    assert configured_client.get('/api/runners?sort=size').status_code == 400
+    assert configured_client.get('/api/runners?source=jira').status_code == 400
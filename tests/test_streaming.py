@@ -0,0 +1,180 @@
+# tests/test_streaming.py
+
+import json
+
+from app import runner_diff
+from app.broadcast import Broadcaster, EVENT_DELTA, EVENT_RESYNC
+from app.cache import api_cache
+from app.models import db, Setting, MonitoredGroup
+from app.poller import poller
+
+RUNNERS_URL = 'https://api.github.com/orgs/test-org/actions/runner-groups/3/runners'
+
+
+def _github_payload(*runners):
+    return {'organizations': [{'id': 0, 'name': 'test-org', 'groups': [
+        {'group_id': 3, 'group_name': 'Linux', 'runners_data': {'total_count': len(runners), 'runners': list(runners)}}]}],
+        'partial': False}
+
+
+def test_diff_reports_added_removed_and_changed_runners():
+    """Runners are matched by group and runner id; unchanged runners are left out."""
+    previous = _github_payload({'id': 1, 'busy': False}, {'id': 2, 'busy': False}, {'id': 3, 'busy': True})
+    current = _github_payload({'id': 1, 'busy': False}, {'id': 2, 'busy': True}, {'id': 4, 'busy': False})
+
+    delta = runner_diff.diff(previous, current, runner_diff.GITHUB_RUNNERS)
+
+    assert delta['added'] == [{'key': [0, 3, 4], 'item': {'id': 4, 'busy': False}}]
+    assert delta['removed'] == [{'key': [0, 3, 3]}]
+    assert delta['changed'] == [{'key': [0, 3, 2], 'item': {'id': 2, 'busy': True}}]
+
+
+def test_diff_requires_resync_on_structural_change():
+    """A new group or pool cannot be expressed as a runner delta."""
+    previous = _github_payload({'id': 1})
+    current = _github_payload({'id': 1})
+    current['organizations'][0]['groups'].append({'group_id': 4, 'group_name': 'Windows',
+                                                  'runners_data': {'total_count': 0, 'runners': []}})
+    assert runner_diff.diff(previous, current, runner_diff.GITHUB_RUNNERS) is None
+
+    ado = {'organizations': [{'id': 1, 'name': 'org', 'pools': [
+        {'id': 7, 'name': 'pool', 'agents_data': {'total_count': 1, 'agents': [{'id': 1, 'busy': False}]}}]}],
+        'partial': False}
+    changed = json.loads(json.dumps(ado))
+    changed['organizations'][0]['pools'][0]['agents_data']['agents'][0]['busy'] = True
+    assert runner_diff.diff(ado, changed, runner_diff.ADO_AGENTS)['changed'] == [
+        {'key': [1, 7, 1], 'item': {'id': 1, 'busy': True}}]
+    changed['partial'] = True
+    assert runner_diff.diff(ado, changed, runner_diff.ADO_AGENTS) is None
+
+
+def test_slow_subscriber_is_told_to_resync():
+    """A subscriber that falls too far behind loses the backlog and gets a resync event."""
+    broadcaster = Broadcaster(max_pending=2)
+    subscription = broadcaster.subscribe('github_dashboard')
+    for i in range(3):
+        broadcaster.publish('github_dashboard', EVENT_DELTA, json.dumps({'i': i}))
+
+    assert subscription.get(timeout=0) == (EVENT_RESYNC, '{}')
+    assert subscription.get(timeout=0) is None
+    subscription.close()
+    assert broadcaster.subscriber_count() == 0
+
+
+def test_stream_pushes_only_changed_runners(configured_client, requests_mock):
+    """After a refresh, the stream carries the changed runner on top of the snapshot clients hold."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    runners = [{'id': i, 'name': f'runner-{i}', 'status': 'online', 'busy': False} for i in range(50)]
+    requests_mock.get(RUNNERS_URL, json={'total_count': 50, 'runners': runners})
+    initial = configured_client.get('/api/dashboard-data').get_json()
+
+    response = configured_client.get('/api/dashboard-data/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+    assert next(events).startswith(b'retry:')
+
+    runners[7] = dict(runners[7], busy=True)
+    requests_mock.get(RUNNERS_URL, json={'total_count': 50, 'runners': runners})
+    api_cache.clear()
+    poller.refresh('github_dashboard')
+
+    event, event_id, data = next(events).decode().strip().split('\n')
+    response.close()
+    assert event == f'event: {EVENT_DELTA}'
+    assert event_id == f"id: {json.loads(data[len('data: '):])['snapshot']['version']}"
+    delta = json.loads(data[len('data: '):])
+    assert delta['since'] == initial['snapshot']['version']
+    assert delta['snapshot']['version'] > delta['since']
+    assert delta['added'] == [] and delta['removed'] == []
+    assert delta['changed'] == [{'key': [0, 3, 7], 'item': {'id': 7, 'name': 'runner-7', 'status': 'online',
+                                                        'busy': True, 'type': 'self-hosted'}}]
+
+
+
+def test_stream_is_a_bounded_long_poll_that_catches_up_on_reconnect(test_app, configured_client, requests_mock,
+                                                                   monkeypatch):
+    """A stream without changes ends after SSE_LONG_POLL_SECONDS; a reconnect gets the change it missed."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    runners = [{'id': i, 'name': f'runner-{i}', 'status': 'online', 'busy': False} for i in range(5)]
+    requests_mock.get(RUNNERS_URL, json={'total_count': 5, 'runners': runners})
+    version = configured_client.get('/api/dashboard-data').get_json()['snapshot']['version']
+    monkeypatch.setitem(test_app.config, 'SSE_LONG_POLL_SECONDS', 0.2)
+    monkeypatch.setitem(test_app.config, 'SSE_KEEPALIVE_SECONDS', 0.1)
+
+    idle = b''.join(configured_client.get('/api/dashboard-data/stream', buffered=False).response)
+    assert idle.startswith(f'retry: 10000\nid: {version}\n\n'.encode())
+    assert idle.count(b': keepalive') == 2
+
+    runners[2] = dict(runners[2], busy=True)
+    requests_mock.get(RUNNERS_URL, json={'total_count': 5, 'runners': runners})
+    api_cache.clear()
+    latest = poller.refresh('github_dashboard')
+
+    response = configured_client.get('/api/dashboard-data/stream', headers={'Last-Event-ID': str(version)},
+                                     buffered=False)
+    retry, event = b''.join(response.response).decode().strip().split('\n\n')
+    assert retry.endswith(f'id: {latest.version}')
+    kind, event_id, data = event.split('\n')
+    assert (kind, event_id) == (f'event: {EVENT_DELTA}', f'id: {latest.version}')
+    assert json.loads(data[len('data: '):])['changed'][0]['key'] == [0, 3, 2]
+
+def test_since_cursor_returns_only_changed_runners(configured_client, requests_mock):
+    """`?since=` answers with the runners changed after that version, or the full payload for unknown cursors."""
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    runners = [{'id': i, 'name': f'runner-{i}', 'status': 'online', 'busy': False} for i in range(500)]
+    requests_mock.get(RUNNERS_URL, json={'total_count': 500, 'runners': runners})
+    full = configured_client.get('/api/dashboard-data')
+    version = full.get_json()['snapshot']['version']
+
+    unchanged = configured_client.get(f'/api/dashboard-data?since={version}').get_json()
+    assert unchanged['delta'] is True
+    assert unchanged['added'] == unchanged['removed'] == unchanged['changed'] == []
+
+    requests_mock.get(RUNNERS_URL, json={'total_count': 500, 'runners': runners[1:] + [
+        {'id': 500, 'name': 'runner-500', 'status': 'offline', 'busy': False}]})
+    api_cache.clear()
+    poller.refresh('github_dashboard')
+    # Same payload again: the version does not move
+    api_cache.clear()
+    latest = poller.refresh('github_dashboard')
+
+    delta = configured_client.get(f'/api/dashboard-data?since={version}')
+    data = delta.get_json()
+    assert data['since'] == version
+    assert data['snapshot']['version'] == latest.version
+    assert [entry['key'] for entry in data['added']] == [[0, 3, 500]]
+    assert data['removed'] == [{'key': [0, 3, 0]}]
+    assert data['changed'] == []
+    assert len(delta.data) * 50 < len(full.data)
+
+    resync = configured_client.get('/api/dashboard-data?since=1').get_json()
+    assert 'delta' not in resync
+    assert resync['organizations'][0]['groups'][0]['runners_data']['total_count'] == 500
+
+
+def test_ado_since_cursor_reports_changed_agents(configured_client, requests_mock):
+    """The ADO endpoint supports the same cursors, keyed by organization, pool and agent id."""
+    from app.models import AzureDevOpsConfig, MonitoredADOPool
+    from app.utils import encrypt_data
+    config = AzureDevOpsConfig(organization_name='ado-org', pat_token=encrypt_data('pat'))
+    db.session.add(config)
+    db.session.commit()
+    db.session.add(MonitoredADOPool(pool_id=9, pool_name='Pool', ado_config_id=config.id))
+    db.session.commit()
+    agents_url = 'https://dev.azure.com/ado-org/_apis/distributedtask/pools/9/agents'
+    requests_mock.get(agents_url, json={'value': [{'id': 1, 'name': 'agent-1', 'status': 'online', 'enabled': True}]})
+    requests_mock.get(f'{agents_url}/1', json={})
+    version = configured_client.get('/api/azure-devops/dashboard-data').get_json()['snapshot']['version']
+
+    requests_mock.get(f'{agents_url}/1', json={'assignedRequest': {'requestId': 5}})
+    poller.refresh('ado_dashboard')
+
+    data = configured_client.get(f'/api/azure-devops/dashboard-data?since={version}').get_json()
+    assert data['delta'] is True
+    assert [(entry['key'], entry['item']['busy']) for entry in data['changed']] == [([config.id, 9, 1], True)]
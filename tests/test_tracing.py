@@ -0,0 +1,105 @@
+# tests/test_tracing.py
+
+import threading
+import time
+
+import pytest
+
+from app import tracing
+from app.models import db, AzureDevOpsConfig, MonitoredADOPool
+from app.profiler import SamplingProfiler
+from app.tracing import request_tracer
+from app.utils import encrypt_data
+
+AGENTS_URL = 'https://dev.azure.com/ado-org/_apis/distributedtask/pools/9/agents'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def tracing_enabled(test_app):
+    """Request hooks can only be added before the first request of this module's app."""
+    test_app.config['TRACING_ENABLED'] = True
+    request_tracer.init_app(test_app)
+    yield
+    test_app.config['TRACING_ENABLED'] = False
+
+
+def _server_timing(response):
+    entries = {}
+    for entry in response.headers['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        entries[name] = dict(param.split('=', 1) for param in params)
+    return entries
+
+
+def test_ado_dashboard_reports_where_the_collection_time_went(configured_client, requests_mock):
+    config = AzureDevOpsConfig(organization_name='ado-org', pat_token=encrypt_data('pat'))
+    db.session.add(config)
+    db.session.commit()
+    db.session.add(MonitoredADOPool(pool_id=9, pool_name='Pool', ado_config_id=config.id))
+    db.session.commit()
+    requests_mock.get(AGENTS_URL, json={'value': [{'id': 1, 'name': 'agent-1', 'status': 'online', 'enabled': True},
+                                                  {'id': 2, 'name': 'agent-2', 'status': 'online', 'enabled': True}]})
+    requests_mock.get(f'{AGENTS_URL}/1', json={})
+    requests_mock.get(f'{AGENTS_URL}/2', json={})
+
+    timings = _server_timing(configured_client.get('/api/azure-devops/dashboard-data'))
+
+    assert {'total', 'collect-total', 'collect-db', 'collect-decrypt', 'collect-serialize'} <= set(timings)
+    # The agent list plus one detail call per agent, made from the fan-out threads
+    assert timings['collect-upstream']['desc'] == '"3 calls"'
+    assert float(timings['collect-total']['dur']) >= float(timings['collect-serialize']['dur'])
+
+
+def test_json_views_time_queries_and_serialisation(configured_client):
+    timings = _server_timing(configured_client.get('/api/events'))
+
+    assert {'db', 'serialize', 'total'} <= set(timings)
+
+
+def test_server_timing_is_only_sent_to_logged_in_users(test_app, configured_client):
+    """Anonymous clients do not learn how long the config, DB or upstream calls took."""
+    # A fresh app context, so flask_login does not reuse the user loaded into the test's `g`
+    with test_app.app_context():
+        anonymous = test_app.test_client()
+        assert 'Server-Timing' not in anonymous.get('/login').headers
+        assert 'Server-Timing' not in anonymous.get('/livez').headers
+    assert 'Server-Timing' in configured_client.get('/livez').headers
+
+def test_spans_are_free_without_a_trace():
+    assert tracing.current() is None
+    assert tracing.span('upstream') is tracing.span('db')
+
+    token = tracing.begin('job')
+    with tracing.span('work'):
+        time.sleep(0.01)
+    trace = tracing.finish(token)
+
+    assert trace.summary()['work']['count'] == 1
+    assert trace.summary()['work']['ms'] >= 10
+    assert tracing.current() is None
+
+
+def test_sampling_profiler_finds_the_hot_function(client):
+    profiler = SamplingProfiler()
+    stop = threading.Event()
+
+    def hot_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=hot_loop)
+    worker.start()
+    try:
+        for _ in range(20):
+            profiler.sample(skip=threading.get_ident())
+            time.sleep(0.001)
+    finally:
+        stop.set()
+        worker.join()
+
+    report = profiler.report()
+    assert report['samples'] == 20
+    assert any(entry['function'].endswith(':hot_loop') for entry in report['top_total'])
+    assert 'test_tracing.py:hot_loop' in report['collapsed']
+    # Disabled by default; no thread and no endpoint
+    assert client.get('/api/profile').status_code in (302, 404)
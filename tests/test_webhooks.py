@@ -0,0 +1,205 @@
+# tests/test_webhooks.py
+
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from app.models import db, Setting, MonitoredGroup, AzureDevOpsConfig, MonitoredADOPool, StatusSample, WebhookEvent
+from app.poller import poller
+from app.utils import encrypt_data
+from app.webhooks import webhook_ingestor
+
+RUNNERS_URL = 'https://api.github.com/orgs/test-org/actions/runner-groups/3/runners'
+SECRET = 'hook-secret'
+
+
+def _github_delivery(client, payload, delivery, secret=SECRET, event='workflow_job'):
+    body = json.dumps(payload).encode()
+    signature = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return client.post('/api/webhooks/github', data=body, content_type='application/json', headers={
+        'X-GitHub-Event': event, 'X-GitHub-Delivery': delivery, 'X-Hub-Signature-256': signature})
+
+
+def _workflow_job(action, runner_id, at, runner_name=None):
+    job = {'runner_id': runner_id, 'runner_name': runner_name or f'runner-{runner_id}', 'runner_group_id': 3,
+           'started_at': at, 'completed_at': at if action == 'completed' else None}
+    return {'action': action, 'workflow_job': job, 'organization': {'login': 'test-org'}}
+
+
+def _github_runners(client, requests_mock, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'GITHUB_WEBHOOK_SECRET', SECRET)
+    db.session.add(Setting(key='ORGANIZATION', value='test-org'))
+    db.session.add(MonitoredGroup(id=3, name='Linux'))
+    db.session.commit()
+    requests_mock.get(RUNNERS_URL, json={'total_count': 2, 'runners': [
+        {'id': 1, 'name': 'runner-1', 'status': 'online', 'busy': False},
+        {'id': 2, 'name': 'runner-2', 'status': 'online', 'busy': False}]})
+    return client.get('/api/dashboard-data').get_json()
+
+
+def _runners(body):
+    return {r['id']: r for r in body['organizations'][0]['groups'][0]['runners_data']['runners']}
+
+
+def test_github_webhook_requires_a_valid_signature(configured_client, requests_mock, monkeypatch):
+    initial = _github_runners(configured_client, requests_mock, monkeypatch)
+
+    response = _github_delivery(configured_client, _workflow_job('in_progress', 1, '2026-01-01T10:00:00Z'), 'd-1',
+                                secret='wrong')
+
+    assert response.status_code == 401
+    assert WebhookEvent.query.count() == 0
+    assert configured_client.get('/api/dashboard-data').get_json() == initial
+    monkeypatch.setitem(configured_client.application.config, 'GITHUB_WEBHOOK_SECRET', None)
+    assert _github_delivery(configured_client, {}, 'd-2').status_code == 404
+
+
+def test_workflow_jobs_update_runners_without_polling(configured_client, requests_mock, monkeypatch):
+    """Jobs flip the busy flag and add unknown runners; redeliveries and late events change nothing."""
+    initial = _github_runners(configured_client, requests_mock, monkeypatch)
+    upstream_calls = requests_mock.call_count
+
+    assert _github_delivery(configured_client, _workflow_job('in_progress', 1, '2026-01-01T10:00:00Z'), 'd-1').status_code == 202
+    assert _github_delivery(configured_client, _workflow_job('in_progress', 9, '2026-01-01T10:00:01Z'), 'd-2').status_code == 202
+    assert _github_delivery(configured_client, _workflow_job('completed', 1, '2026-01-01T10:05:00Z'), 'd-3').status_code == 202
+    assert _github_delivery(configured_client, _workflow_job('completed', 1, '2026-01-01T10:05:00Z'), 'd-3').status_code == 202
+    # Delivered after the completion it precedes
+    assert _github_delivery(configured_client, _workflow_job('in_progress', 1, '2026-01-01T10:00:00Z'), 'd-4').status_code == 202
+
+    body = configured_client.get('/api/dashboard-data').get_json()
+    runners = _runners(body)
+    assert runners[1]['busy'] is False
+    assert runners[9] == {'id': 9, 'name': 'runner-9', 'status': 'online', 'busy': True, 'type': 'self-hosted'}
+    assert body['organizations'][0]['groups'][0]['runners_data']['total_count'] == 3
+    assert body['snapshot']['version'] > initial['snapshot']['version']
+    # Patches keep the age of the collection they patch and are not sampled into the history
+    assert body['snapshot']['generated_at'] == initial['snapshot']['generated_at']
+    assert body['snapshot']['patched_at'] >= initial['snapshot']['generated_at']
+    assert {sample.samples for sample in StatusSample.query} == {1}
+    assert WebhookEvent.query.count() == 4
+    assert requests_mock.call_count == upstream_calls
+
+    delta = configured_client.get(f"/api/dashboard-data?since={initial['snapshot']['version']}").get_json()
+    assert delta['added'] == [{'key': [0, 3, 9], 'item': runners[9]}]
+    # Polls only reconcile while events arrive
+    monkeypatch.setitem(configured_client.application.config, 'WEBHOOK_RECONCILE_SECONDS', 300)
+    assert webhook_ingestor.reconcile_delay('github', 30) == 300
+    assert webhook_ingestor.reconcile_delay('ado', 30) == 30
+
+
+def test_a_burst_of_events_is_applied_as_one_snapshot(configured_client, requests_mock, monkeypatch):
+    """Events stored by any worker are applied in one batch: one new version, one delta for streaming clients."""
+    import time
+    from app.broadcast import broadcaster, EVENT_DELTA
+    _github_runners(configured_client, requests_mock, monkeypatch)
+    webhook_ingestor.apply_pending()
+    subscription = broadcaster.subscribe('github_dashboard')
+
+    db.session.add_all(WebhookEvent(source='github', delivery_id=f'd-{i}', event='workflow_job', received_at=time.time(),
+                                    payload=json.dumps(_workflow_job('in_progress' if i % 2 else 'completed', 1 + i % 2,
+                                                                     f'2026-01-01T10:{i // 60:02d}:{i % 60:02d}Z')))
+                       for i in range(200))
+    db.session.commit()
+    assert webhook_ingestor.apply_pending() == 200
+
+    event, body = subscription.get(timeout=0)
+    assert event == EVENT_DELTA
+    assert sorted(change['key'] for change in json.loads(body)['changed']) == [[0, 3, 2]]
+    assert subscription.get(timeout=0) is None
+    subscription.close()
+    runners = _runners(configured_client.get('/api/dashboard-data').get_json())
+    assert (runners[1]['busy'], runners[2]['busy']) == (False, True)
+
+
+def test_ado_service_hook_tracks_agent_jobs(configured_client, requests_mock, monkeypatch):
+    monkeypatch.setitem(configured_client.application.config, 'ADO_WEBHOOK_SECRET', SECRET)
+    config = AzureDevOpsConfig(organization_name='ado-org', pat_token=encrypt_data('pat'))
+    db.session.add(config)
+    db.session.commit()
+    db.session.add(MonitoredADOPool(ado_config_id=config.id, pool_id=7, pool_name='Linux'))
+    db.session.commit()
+    requests_mock.get('https://dev.azure.com/ado-org/_apis/distributedtask/pools/7/agents', json={'value': [
+        {'id': 11, 'name': 'agent-11', 'status': 'online', 'enabled': True, 'lastCompletedRequest': {'requestId': 1}}]})
+    configured_client.get('/api/azure-devops/dashboard-data')
+
+    def hook(request_id, finish_time=None):
+        job_request = {'requestId': request_id, 'poolId': 7, 'assignTime': '2026-01-01T10:00:00.1234567Z',
+                       'finishTime': finish_time, 'result': 'succeeded' if finish_time else None,
+                       'definition': {'name': 'build'}, 'reservedAgent': {'id': 11, 'name': 'agent-11'}}
+        return {'id': f'n-{request_id}-{finish_time}', 'eventType': 'ms.vss-distributed-task.job-request',
+                'resource': job_request, 'resourceContainers': {'account': {'baseUrl': 'https://dev.azure.com/ado-org/'}}}
+
+    assert configured_client.post('/api/webhooks/azure-devops', json=hook(2), auth=('', 'wrong')).status_code == 401
+    assert configured_client.post('/api/webhooks/azure-devops', json=hook(2), auth=('', SECRET)).status_code == 202
+    agent = configured_client.get('/api/azure-devops/dashboard-data').get_json()['organizations'][0]['pools'][0]['agents_data']['agents'][0]
+    assert agent['busy'] is True and agent['assigned_request']['id'] == 2
+
+    response = configured_client.post('/api/webhooks/azure-devops', json=hook(2, '2026-01-01T10:03:00Z'),
+                                      headers={'X-Webhook-Secret': SECRET})
+    assert response.status_code == 202
+    agent = configured_client.get('/api/azure-devops/dashboard-data').get_json()['organizations'][0]['pools'][0]['agents_data']['agents'][0]
+    assert agent['busy'] is False and agent['assigned_request'] is None
+    assert agent['last_completed_request']['result'] == 'succeeded'
+
+
+def _stored_event(event_id, delivery, payload):
+    import time
+    return WebhookEvent(id=event_id, source='github', delivery_id=delivery, event='workflow_job',
+                        received_at=time.time(), payload=json.dumps(payload))
+
+
+def test_events_committed_behind_the_cursor_are_still_applied(configured_client, requests_mock, monkeypatch):
+    """A batch that commits after a later one (ids are taken at insert on PostgreSQL) is not skipped."""
+    _github_runners(configured_client, requests_mock, monkeypatch)
+    webhook_ingestor.apply_pending()
+    cursor = webhook_ingestor._cursor
+
+    db.session.add(_stored_event(cursor + 2, 'd-late', _workflow_job('in_progress', 2, '2026-01-01T10:00:00Z')))
+    db.session.commit()
+    assert webhook_ingestor.apply_pending() == 1
+
+    db.session.add(_stored_event(cursor + 1, 'd-early', _workflow_job('in_progress', 1, '2026-01-01T10:00:00Z')))
+    db.session.commit()
+    assert webhook_ingestor.apply_pending() == 1
+    assert webhook_ingestor.apply_pending() == 0
+
+    runners = _runners(configured_client.get('/api/dashboard-data').get_json())
+    assert (runners[1]['busy'], runners[2]['busy']) == (True, True)
+
+    monkeypatch.setattr(webhook_ingestor, 'gap_seconds', 0)
+    db.session.add(_stored_event(cursor + 4, 'd-next', _workflow_job('completed', 2, '2026-01-01T10:05:00Z')))
+    db.session.commit()
+    webhook_ingestor.apply_pending()
+    assert webhook_ingestor._open_gaps() == []
+
+
+def test_failed_writes_are_retried_and_old_runner_times_are_evicted(configured_client, requests_mock, monkeypatch):
+    """A batch the database refused is written by the next flush; prune forgets runners not heard of for a while."""
+    import time
+    _github_runners(configured_client, requests_mock, monkeypatch)
+    write = webhook_ingestor._write
+
+    def failing_write(batch):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(webhook_ingestor, '_write', failing_write)
+    payload = json.dumps(_workflow_job('in_progress', 1, '2026-01-01T10:00:00Z'))
+    webhook_ingestor._queue.put(('github', 'd-1', 'workflow_job', payload, time.time()))
+    with pytest.raises(RuntimeError):
+        webhook_ingestor.flush()
+    assert WebhookEvent.query.count() == 0
+
+    monkeypatch.setattr(webhook_ingestor, '_write', write)
+    assert webhook_ingestor.flush() == 1
+    assert WebhookEvent.query.count() == 1
+
+    webhook_ingestor._cursor = 0
+    assert webhook_ingestor.apply_pending() == 1
+    assert len(webhook_ingestor._seen) == 1
+    webhook_ingestor.prune(now=time.time() + webhook_ingestor.retention_seconds - 1)
+    assert len(webhook_ingestor._seen) == 1
+    webhook_ingestor.prune(now=time.time() + webhook_ingestor.retention_seconds + 1)
+    assert webhook_ingestor._seen == {}
+    assert WebhookEvent.query.count() == 0